@@ -0,0 +1,6 @@
+# NOTE: The compiler is pure python, it doesn't depend on Kit or USD so it can be used by headless
+#       tools and by worker processes
+from .dtdl_models import *
+from .dtdl_model_compiler import *
+from .dtdl_model_bundle import *
+from .dtdl_usd_schema import *
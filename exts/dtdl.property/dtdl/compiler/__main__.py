@@ -0,0 +1,132 @@
+"""
+Headless DTDL compiler, compiles a folder with DTDL models into a single bundle file or into
+codeless USD applied API schemas (a USD plugin folder):
+
+    python -m dtdl.compiler bundle <dtdl folder> <output>.dtdlbundle [--workers N]
+    python -m dtdl.compiler schema <dtdl folder> <output folder> [--workers N]
+
+Run it with the extension folder on the python path (e.g. PYTHONPATH=exts/dtdl.property).
+"""
+import argparse
+import os
+import sys
+import time
+from .dtdl_model_compiler import DtdlCompileError, compile_dtdl_files, list_dtdl_files
+from .dtdl_model_bundle import BUNDLE_EXTENSION, write_dtdl_bundle
+from .dtdl_usd_schema import write_dtdl_usd_schema
+
+
+def _compile(args) -> tuple[list[str], dict]:
+    """
+    Compile the DTDL files of the source folder. Returns the file paths and the interfaces, or
+    None after printing the error, the output must not be replaced in that case.
+    """
+    if not os.path.isdir(args.source):
+        print("{} is not a folder".format(args.source), file=sys.stderr)
+        return None
+    file_paths = list_dtdl_files(args.source)
+    try:
+        interfaces = compile_dtdl_files(file_paths, args.workers)
+    except DtdlCompileError as e:
+        print(e, file=sys.stderr)
+        return None
+    if len(interfaces) == 0:
+        print(
+            "No DTDL interfaces found in {} ({} files)".format(
+                args.source, len(file_paths)
+            ),
+            file=sys.stderr,
+        )
+        return None
+    return (file_paths, interfaces)
+
+
+def _bundle(args) -> int:
+    if not args.output.lower().endswith(BUNDLE_EXTENSION):
+        print(
+            "The bundle file must have the {} extension".format(BUNDLE_EXTENSION),
+            file=sys.stderr,
+        )
+        return 1
+    start = time.perf_counter()
+    compiled = _compile(args)
+    if compiled is None:
+        return 1
+    (file_paths, interfaces) = compiled
+    version = write_dtdl_bundle(interfaces, args.output)
+    print(
+        "Compiled {} interfaces from {} files into {} (version {}) in {:.2f}s".format(
+            len(interfaces),
+            len(file_paths),
+            args.output,
+            version,
+            time.perf_counter() - start,
+        )
+    )
+    return 0
+
+
+def _schema(args) -> int:
+    start = time.perf_counter()
+    compiled = _compile(args)
+    if compiled is None:
+        return 1
+    (file_paths, interfaces) = compiled
+    try:
+        schema_names = write_dtdl_usd_schema(interfaces, args.output)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(
+        "Generated {} schemas from {} files into {} in {:.2f}s".format(
+            len(schema_names),
+            len(file_paths),
+            args.output,
+            time.perf_counter() - start,
+        )
+    )
+    return 0
+
+
+def _add_workers_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes to parse the files (default: 1, no worker processes)",
+    )
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m dtdl.compiler", description="Headless DTDL compiler"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bundle_parser = subparsers.add_parser(
+        "bundle", help="Compile a DTDL folder into a single bundle file"
+    )
+    bundle_parser.add_argument("source", help="Folder with the DTDL (json) files")
+    bundle_parser.add_argument(
+        "output", help="Bundle file to write ({})".format(BUNDLE_EXTENSION)
+    )
+    _add_workers_argument(bundle_parser)
+    bundle_parser.set_defaults(func=_bundle)
+
+    schema_parser = subparsers.add_parser(
+        "schema", help="Generate codeless USD applied API schemas from a DTDL folder"
+    )
+    schema_parser.add_argument("source", help="Folder with the DTDL (json) files")
+    schema_parser.add_argument(
+        "output",
+        help="Folder to write the USD plugin (generatedSchema.usda, plugInfo.json)",
+    )
+    _add_workers_argument(schema_parser)
+    schema_parser.set_defaults(func=_schema)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
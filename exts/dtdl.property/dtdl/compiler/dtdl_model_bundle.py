@@ -0,0 +1,195 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from typing import Iterator
+from .dtdl_model_compiler import get_flattened_parts, _encode_json, _encode_flattened
+
+# A bundle is a single file with all the flattened interfaces of a DTDL repository:
+#
+#   magic (8 bytes) | format version (uint32) | index length (uint32) | index | interfaces
+#
+# The index is JSON: {"version": "<content hash>", "interfaces": {"<model id>": [offset, length,
+# number of own contents, [all bases], {header}, "<interface hash>"]}}. The header is the compact
+# interface without contents, the interface hash covers the header and the own contents so an
+# interface can be compared between bundle versions without decoding it. Offsets are relative to
+# the start of the interfaces section, every interface is the flattened interface as JSON (see
+# flatten_dtdl_interface).
+BUNDLE_MAGIC = b"DTDLBNDL"
+BUNDLE_FORMAT_VERSION = 2
+BUNDLE_EXTENSION = ".dtdlbundle"
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def is_dtdl_bundle_path(path: str) -> bool:
+    """Checks if the given path (or url) refers to a DTDL model bundle"""
+    return isinstance(path, str) and path.lower().endswith(BUNDLE_EXTENSION)
+
+
+def write_dtdl_bundle(
+    interfaces: dict[str, tuple[str, list[str], bytes, bytes, int]], bundle_path: str
+) -> str:
+    """
+    Write the interfaces extracted by compile_dtdl_files to a bundle file. The file is written
+    next to the bundle and then renamed, so readers never see a partially written bundle.
+    Returns the content version of the bundle.
+    """
+    blobs: list[bytes] = []
+    entries: list[bytes] = []
+    offset = 0
+    for model_id in sorted(interfaces.keys()):
+        (_, _, header, own_contents, contents_count) = interfaces[model_id]
+        (bases, contents) = get_flattened_parts(model_id, interfaces)
+        encoded_bases = _encode_json(bases)
+        blob = _encode_flattened(header, encoded_bases, contents)
+        blobs.append(blob)
+        interface_hash = hashlib.sha256(header + b"\n" + own_contents).hexdigest()[:16]
+        entries.append(
+            b"".join(
+                (
+                    _encode_json(model_id),
+                    b":[",
+                    str(offset).encode(),
+                    b",",
+                    str(len(blob)).encode(),
+                    b",",
+                    str(contents_count).encode(),
+                    b",",
+                    encoded_bases,
+                    b",",
+                    header,
+                    b",",
+                    _encode_json(interface_hash),
+                    b"]",
+                )
+            )
+        )
+        offset += len(blob)
+    content = b"".join(blobs)
+    version = hashlib.sha256(content).hexdigest()[:16]
+    index = b"".join(
+        (
+            b'{"version":',
+            _encode_json(version),
+            b',"interfaces":{',
+            b",".join(entries),
+            b"}}",
+        )
+    )
+    tmp_path = bundle_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, len(index)))
+        f.write(index)
+        f.write(content)
+    os.replace(tmp_path, bundle_path)
+    return version
+
+
+class DtdlBundleModel(Mapping):
+    """
+    A compact interface in a bundle. The header (id, display name, extends, ...) is read from
+    the bundle index, the contents are only decoded when they are accessed.
+    """
+
+    __slots__ = ("bundle", "_header")
+
+    def __init__(self, bundle: "DtdlModelBundle", header: dict):
+        self.bundle = bundle
+        self._header = header
+
+    def __getitem__(self, key: str):
+        if key == "contents":
+            return self.bundle.get_own_contents(self._header["@id"])
+        return self._header[key]
+
+    def __contains__(self, key) -> bool:
+        return key == "contents" or key in self._header
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._header
+        yield "contents"
+
+    def __len__(self) -> int:
+        return len(self._header) + 1
+
+    @property
+    def interface_hash(self) -> str:
+        """Hash of the header and the own contents, see DtdlModelBundle.get_interface_hash"""
+        return self.bundle.get_interface_hash(self._header["@id"])
+
+
+class DtdlModelBundle(Mapping):
+    """
+    A loaded DTDL model bundle. Only the index is decoded when the bundle is loaded, interfaces
+    are decoded on demand. The bundle can be memory mapped from a local file or loaded from
+    bytes (e.g. read from Nucleus in a single request).
+    Maps the model ids to compact interfaces (see DtdlBundleModel), the flattened interfaces are
+    available through get_flattened.
+    NOTE: A memory mapped bundle keeps the file open until the bundle is closed or collected.
+    """
+
+    def __init__(self, data, source: str = None):
+        self.source = source
+        self._data = data
+        if len(data) < _PREAMBLE.size:
+            raise ValueError("Not a DTDL model bundle: {}".format(source))
+        (magic, format_version, index_length) = _PREAMBLE.unpack_from(data, 0)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError("Not a DTDL model bundle: {}".format(source))
+        if format_version != BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                "Unsupported DTDL model bundle format {}: {}".format(
+                    format_version, source
+                )
+            )
+        index_start = _PREAMBLE.size
+        self._content_start = index_start + index_length
+        index = json.loads(bytes(data[index_start : self._content_start]))
+        self.version: str = index["version"]
+        self._index: dict[str, list] = index["interfaces"]
+
+    @classmethod
+    def open(cls, bundle_path: str) -> "DtdlModelBundle":
+        """Memory map a local bundle file"""
+        with open(bundle_path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data, bundle_path)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def get_bases(self, model_id: str) -> list[str]:
+        """Get all (direct and indirect) bases of an interface, without decoding it"""
+        return self._index[model_id][3]
+
+    def get_interface_hash(self, model_id: str) -> str:
+        """
+        Get the hash of the header and the own contents of an interface. The hash is the same in
+        every bundle the interface is compiled into, as long as the interface doesn't change.
+        """
+        return self._index[model_id][5]
+
+    def get_flattened(self, model_id: str) -> object:
+        """Decode the flattened interface, see flatten_dtdl_interface"""
+        (offset, length) = self._index[model_id][0:2]
+        start = self._content_start + offset
+        return json.loads(bytes(self._data[start : start + length]))
+
+    def get_own_contents(self, model_id: str) -> list[object]:
+        """Decode the contents of the interface itself, without the contents of its bases"""
+        return self.get_flattened(model_id)["contents"][: self._index[model_id][2]]
+
+    def __getitem__(self, model_id: str) -> DtdlBundleModel:
+        return DtdlBundleModel(self, self._index[model_id][4])
+
+    def __contains__(self, model_id) -> bool:
+        return model_id in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
@@ -0,0 +1,216 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+from .dtdl_models import compact_dtdl_model, get_dtdl_interfaces, get_dtdl_model_bases
+
+# Compact JSON encoding, the encoded interfaces are concatenated without decoding them again
+_JSON_SEPARATORS = (",", ":")
+
+
+def _encode_json(obj: object) -> bytes:
+    return json.dumps(obj, separators=_JSON_SEPARATORS).encode("utf-8")
+
+
+def list_dtdl_files(folder: str) -> list[str]:
+    """Recursively list all the DTDL (json) files in a local folder, in a stable order"""
+    file_paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.endswith(".json"):
+                file_paths.append(os.path.join(root, file_name))
+    return file_paths
+
+
+class DtdlCompileError(ValueError):
+    """Raised when DTDL files can't be compiled, errors has the error of every invalid file"""
+
+    def __init__(self, errors: dict[str, str]):
+        super().__init__(
+            "Invalid DTDL files:\n{}".format(
+                "\n".join("  {}: {}".format(p, e) for (p, e) in errors.items())
+            )
+        )
+        self.errors = errors
+
+
+def extract_dtdl_interfaces(
+    file_paths: list[str],
+) -> list[tuple[str, list[str], bytes, bytes, int]]:
+    """
+    Parse the given DTDL files and extract their interfaces. This is the unit of work of the
+    worker processes, but it can also be called directly.
+    Every interface is returned as a tuple of its model id, the ids of its direct bases, its
+    compact header (the interface without contents) as JSON, its compact contents as JSON
+    array items without the brackets and the number of contents. The encoded parts are cheap to
+    send back to the parent process and can be concatenated into flattened interfaces without
+    decoding them again.
+    Raises DtdlCompileError with the error of every file that can't be read or parsed.
+    """
+    (interfaces, errors) = _extract_dtdl_interfaces_by_file(file_paths)
+    if len(errors) > 0:
+        raise DtdlCompileError(errors)
+    return [i for file_path in file_paths for i in interfaces[file_path]]
+
+
+def _extract_file_interfaces(
+    file_path: str,
+) -> list[tuple[str, list[str], bytes, bytes, int]]:
+    with open(file_path, "rb") as f:
+        model_json = json.loads(f.read())
+    interfaces = []
+    for model in get_dtdl_interfaces(model_json):
+        compact = compact_dtdl_model(model)
+        contents = compact.pop("contents", [])
+        interfaces.append(
+            (
+                compact["@id"],
+                get_dtdl_model_bases(compact),
+                _encode_json(compact),
+                _encode_json(contents)[1:-1],
+                len(contents),
+            )
+        )
+    return interfaces
+
+
+def _extract_dtdl_interfaces_by_file(
+    file_paths: list[str],
+) -> tuple[dict[str, list], dict[str, str]]:
+    """
+    Extract the interfaces of every file, by file path. A file that can't be read or parsed
+    doesn't stop the other files, its error is returned by file path instead.
+    """
+    interfaces: dict[str, list] = {}
+    errors: dict[str, str] = {}
+    for file_path in file_paths:
+        try:
+            interfaces[file_path] = _extract_file_interfaces(file_path)
+        except (OSError, ValueError) as e:
+            errors[file_path] = str(e)
+    return (interfaces, errors)
+
+
+def _shard_files(file_paths: list[str], shard_count: int) -> list[list[str]]:
+    """
+    Split the files in shards of about the same total size. The files are assigned largest
+    first to the smallest shard, so a few large files don't end up in the same worker.
+    """
+    shards: list[list[str]] = [[] for _ in range(shard_count)]
+    shard_sizes = [0] * shard_count
+    sizes = {p: os.path.getsize(p) for p in file_paths}
+    for file_path in sorted(file_paths, key=lambda p: sizes[p], reverse=True):
+        i = shard_sizes.index(min(shard_sizes))
+        shards[i].append(file_path)
+        shard_sizes[i] += sizes[file_path]
+    return [s for s in shards if len(s) > 0]
+
+
+def compile_dtdl_files(
+    file_paths: list[str], workers: int = 1
+) -> dict[str, tuple[str, list[str], bytes, bytes, int]]:
+    """
+    Extract the interfaces of the given DTDL files, by model id.
+    With workers > 1 the files are sharded over a pool of worker processes that parse the files
+    and extract the interfaces, the results are merged in this process. If an interface is
+    defined more than once, the one in the last file wins, like a sequential load.
+    Raises DtdlCompileError with the error of every file that can't be read or parsed.
+    NOTE: Only reading and parsing the files is spread over the workers, flattening the
+          interfaces and writing a bundle happen in this process
+    """
+    interfaces: dict[str, tuple[str, list[str], bytes, bytes, int]] = {}
+    if workers <= 1 or len(file_paths) < 2:
+        for interface in extract_dtdl_interfaces(file_paths):
+            interfaces[interface[0]] = interface
+        return interfaces
+
+    # More shards than workers, so a slow shard doesn't keep the other workers waiting
+    shards = _shard_files(file_paths, min(len(file_paths), workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shard_results = list(executor.map(_extract_dtdl_interfaces_by_file, shards))
+    # Merge in file order to resolve duplicate interfaces deterministically
+    by_file: dict[str, list] = {}
+    errors: dict[str, str] = {}
+    for shard_interfaces, shard_errors in shard_results:
+        by_file.update(shard_interfaces)
+        errors.update(shard_errors)
+    if len(errors) > 0:
+        raise DtdlCompileError({p: errors[p] for p in file_paths if p in errors})
+    for file_path in file_paths:
+        for interface in by_file[file_path]:
+            interfaces.pop(interface[0], None)
+            interfaces[interface[0]] = interface
+    return interfaces
+
+
+def get_flattened_parts(
+    model_id: str, interfaces: dict[str, tuple[str, list[str], bytes, bytes, int]]
+) -> tuple[list[str], list[bytes]]:
+    """
+    Get all (direct and indirect) bases of an interface and the encoded contents of the
+    interface and its bases, in the same order as DtdlExtendedModelData: depth first, every base
+    where it's first reached. The contents of a shared base are only included once.
+    """
+    bases: list[str] = []
+    contents: list[bytes] = []
+    pending = [model_id]
+    visited = set()
+    while len(pending) > 0:
+        current_id = pending.pop()
+        if current_id in visited:
+            continue
+        visited.add(current_id)
+        if current_id != model_id:
+            bases.append(current_id)
+        current = interfaces.get(current_id)
+        if current is None:
+            continue
+        if len(current[3]) > 0:
+            contents.append(current[3])
+        pending.extend(reversed(current[1]))
+    return (bases, contents)
+
+
+def _encode_flattened(header: bytes, bases: bytes, contents: list[bytes]) -> bytes:
+    """Add the encoded bases and contents to an encoded header"""
+    return b"".join(
+        (header[:-1], b',"bases":', bases, b',"contents":[', b",".join(contents), b"]}")
+    )
+
+
+def flatten_dtdl_interface(
+    model_id: str, interfaces: dict[str, tuple[str, list[str], bytes, bytes, int]]
+) -> bytes:
+    """
+    Flatten an interface into JSON. The flattened interface has a "bases" list with all its
+    (direct and indirect) bases and "contents" with its own contents followed by the contents of
+    its bases. Bases that are not in the repository are listed, but have no contents.
+    """
+    header = interfaces[model_id][2]
+    (bases, contents) = get_flattened_parts(model_id, interfaces)
+    return _encode_flattened(header, _encode_json(bases), contents)
+
+
+def flatten_dtdl_interfaces(
+    interfaces: dict[str, tuple[str, list[str], bytes, bytes, int]],
+    model_ids: Iterable[str] = None,
+) -> dict[str, bytes]:
+    """Flatten the given interfaces (all interfaces by default) into JSON, by model id"""
+    if model_ids is None:
+        model_ids = interfaces.keys()
+    return {m: flatten_dtdl_interface(m, interfaces) for m in model_ids}
+
+
+def decode_dtdl_interface(data: bytes) -> object:
+    """Decode an interface that was encoded by the compiler"""
+    return json.loads(data)
+
+
+def compile_dtdl_repository(folder: str, workers: int = 1) -> dict[str, bytes]:
+    """
+    Compile all the DTDL files in a local folder into flattened interfaces (as JSON), by model
+    id. Use decode_dtdl_interface to decode a flattened interface.
+    """
+    interfaces = compile_dtdl_files(list_dtdl_files(folder), workers)
+    return flatten_dtdl_interfaces(interfaces)
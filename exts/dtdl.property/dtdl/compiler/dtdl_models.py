@@ -0,0 +1,75 @@
+import re
+
+# Regular expression for a valid DTMI, see https://github.com/Azure/opendigitaltwins-dtdl
+DTMI_REGEX = re.compile(
+    r"^dtmi:[A-Za-z](?:[A-Za-z0-9_]*[A-Za-z0-9])?"
+    r"(?::[A-Za-z](?:[A-Za-z0-9_]*[A-Za-z0-9])?)*;[1-9][0-9]{0,8}$"
+)
+
+# Keys of an interface and of its contents that are needed to build the extended model data
+_MODEL_KEYS = ("@id", "@type", "displayName", "description", "extends", "contents")
+_CONTENT_KEYS = ("@type", "name", "displayName", "description", "schema")
+
+
+def is_valid_dtmi(dtmi: str) -> bool:
+    """Checks if the given string is a valid DTMI"""
+    return isinstance(dtmi, str) and DTMI_REGEX.match(dtmi) is not None
+
+
+def dtmi_to_path(dtmi: str) -> str:
+    """
+    Converts a DTMI to its relative path following the DTDL model repository convention,
+    e.g. dtmi:com:example:Room;1 -> dtmi/com/example/room-1.json
+    """
+    if not is_valid_dtmi(dtmi):
+        raise ValueError("Invalid DTMI: {}".format(dtmi))
+    return "{}.json".format(dtmi.lower().replace(":", "/").replace(";", "-"))
+
+
+def is_dtdl_interface(model: object) -> bool:
+    """Checks if the given JSON object is a DTDL interface"""
+    return (
+        isinstance(model, dict)
+        and "@context" in model
+        and "@id" in model
+        and "@type" in model
+        and model["@type"] == "Interface"
+    )
+
+
+def get_dtdl_interfaces(model_json: object) -> list[object]:
+    """
+    Get all DTDL interfaces from the contents of a DTDL file. A file can either contain a single
+    interface or an array of interfaces.
+    """
+    if isinstance(model_json, dict):
+        return [model_json] if is_dtdl_interface(model_json) else []
+    # if the json is an array, we need to iterate over the array
+    if isinstance(model_json, list):
+        return [model for model in model_json if is_dtdl_interface(model)]
+    return []
+
+
+def get_dtdl_model_bases(model: object) -> list[str]:
+    """Get the ids of the models that are directly extended by the given model"""
+    if "extends" not in model:
+        return []
+    if isinstance(model["extends"], list):
+        return model["extends"]
+    return [model["extends"]]
+
+
+def compact_dtdl_model(model: object) -> object:
+    """
+    Strip a raw DTDL interface down to the keys that are needed to build the extended model
+    data. Contents are always stored as a list.
+    """
+    compact = {k: model[k] for k in _MODEL_KEYS if k in model}
+    if "contents" in compact:
+        contents = compact["contents"]
+        if isinstance(contents, dict):
+            contents = [contents]
+        compact["contents"] = [
+            {k: c[k] for k in _CONTENT_KEYS if k in c} for c in contents
+        ]
+    return compact
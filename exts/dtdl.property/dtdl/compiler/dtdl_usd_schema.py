@@ -0,0 +1,199 @@
+import json
+import os
+from .dtdl_models import is_valid_dtmi
+
+# The schemas are written as text, the same way usdGenSchema writes codeless schemas
+
+# Name of the USD plugin with the generated schemas
+SCHEMA_PLUGIN_NAME = "dtdlSchema"
+SCHEMA_FILE_NAME = "generatedSchema.usda"
+PLUG_INFO_FILE_NAME = "plugInfo.json"
+# Prefix of the attributes and relationships of the DTDL contents, see DtdlContent.id
+SCHEMA_PROPERTY_PREFIX = "dtdl:"
+
+# USD type name and fallback value (as USD text) of the primitive DTDL schemas. Contents with other
+# schemas (e.g. enums or objects) are not added to the generated schemas.
+_USD_TYPES = {
+    "boolean": ("bool", "false"),
+    "integer": ("int", "0"),
+    "long": ("int64", "0"),
+    "float": ("float", "0"),
+    "double": ("double", "0"),
+    "string": ("string", '""'),
+    "date": ("string", '""'),
+    "dateTime": ("string", '""'),
+    "time": ("string", '""'),
+    "duration": ("string", '""'),
+}
+
+SCHEMA_NAME_PREFIX = "Dtdl_"
+SCHEMA_NAME_SUFFIX = "API"
+
+
+def get_dtdl_schema_name(model_id: str) -> str:
+    """
+    Get the name of the applied API schema of an interface, e.g. "dtmi:com:example:Room;1" is
+    Dtdl_com_example_Room_1API. The name is a lossless encoding of the model id: the segments
+    and the version are separated by a single underscore and the underscores within a segment
+    are doubled (a segment never starts or ends with one). Raises ValueError for invalid DTMIs.
+    """
+    if not is_valid_dtmi(model_id):
+        raise ValueError("Invalid DTMI: {}".format(model_id))
+    (path, _, version) = model_id.partition(";")
+    segments = [s.replace("_", "__") for s in path.split(":")[1:]]
+    return "{}{}_{}{}".format(
+        SCHEMA_NAME_PREFIX, "_".join(segments), version, SCHEMA_NAME_SUFFIX
+    )
+
+
+def is_dtdl_schema_name(schema_name: str) -> bool:
+    """Checks if the given applied API schema was generated for a DTDL interface"""
+    return schema_name.startswith(SCHEMA_NAME_PREFIX) and schema_name.endswith(
+        SCHEMA_NAME_SUFFIX
+    )
+
+
+def _get_text(value: object) -> str:
+    """Get the (english) text of a display name or description"""
+    if isinstance(value, dict):
+        return value.get("en", next(iter(value.values()), ""))
+    return str(value)
+
+
+def _encode_string(text: str) -> str:
+    return json.dumps(text, ensure_ascii=False)
+
+
+def _get_content_types(content: object) -> list[str]:
+    types = content["@type"]
+    return types if isinstance(types, list) else [types]
+
+
+def _write_property(lines: list[str], content: object):
+    """Add the attribute or relationship of a content to the schema class"""
+    types = _get_content_types(content)
+    name = SCHEMA_PROPERTY_PREFIX + content["name"]
+    metadata = []
+    if "description" in content:
+        metadata.append(
+            "doc = {}".format(_encode_string(_get_text(content["description"])))
+        )
+    if "displayName" in content:
+        metadata.append(
+            "displayName = {}".format(_encode_string(_get_text(content["displayName"])))
+        )
+    if "Relationship" in types:
+        declaration = "rel {}".format(name)
+    elif "Property" in types or "Telemetry" in types:
+        schema = content.get("schema")
+        usd_type = _USD_TYPES.get(schema) if isinstance(schema, str) else None
+        if usd_type is None:
+            return
+        metadata.append(
+            'displayGroup = "{}"'.format(
+                "Properties" if "Property" in types else "Telemetry"
+            )
+        )
+        declaration = "{} {} = {}".format(usd_type[0], name, usd_type[1])
+    else:
+        return
+    if len(metadata) == 0:
+        lines.append("    {}".format(declaration))
+        return
+    lines.append("    {} (".format(declaration))
+    lines.extend("        {}".format(m) for m in metadata)
+    lines.append("    )")
+
+
+def _write_schema_class(
+    lines: list[str],
+    model_id: str,
+    interface: tuple[str, list[str], bytes, bytes, int],
+    interfaces: dict[str, tuple[str, list[str], bytes, bytes, int]],
+):
+    """Add the applied API schema class of an interface to the schema file"""
+    (_, bases, header, contents, _) = interface
+    model = json.loads(header)
+    metadata = []
+    if "description" in model:
+        metadata.append(
+            "doc = {}".format(_encode_string(_get_text(model["description"])))
+        )
+    # Applying the schema of an interface also applies the schemas of its bases
+    base_schemas = [get_dtdl_schema_name(b) for b in bases if b in interfaces]
+    if len(base_schemas) > 0:
+        metadata.append(
+            "prepend apiSchemas = [{}]".format(
+                ", ".join(_encode_string(s) for s in base_schemas)
+            )
+        )
+    metadata.append(
+        "customData = {{\n        string dtdlModelId = {}\n    }}".format(
+            _encode_string(model_id)
+        )
+    )
+    lines.append("")
+    lines.append('class "{}" ('.format(get_dtdl_schema_name(model_id)))
+    lines.extend("    {}".format(m) for m in metadata)
+    lines.append(")")
+    lines.append("{")
+    for content in json.loads(b"[" + contents + b"]"):
+        _write_property(lines, content)
+    lines.append("}")
+
+
+def write_dtdl_usd_schema(
+    interfaces: dict[str, tuple[str, list[str], bytes, bytes, int]],
+    output_folder: str,
+) -> list[str]:
+    """
+    Write codeless applied API schemas for the interfaces extracted by compile_dtdl_files. Every
+    interface gets a single apply API schema (see get_dtdl_schema_name) with an attribute and a
+    fallback value for each property and telemetry with a primitive schema and a relationship for
+    each relationship. The schemas of the bases are included with apiSchemas, so the inheritance
+    is the same as in DTDL.
+    The output folder is a USD plugin (generatedSchema.usda and plugInfo.json) that can be
+    registered with the plugin registry. Returns the names of the schemas.
+    Raises ValueError if a model id isn't a valid DTMI, as it has no schema name.
+    """
+    invalid = [m for m in interfaces.keys() if not is_valid_dtmi(m)]
+    if len(invalid) > 0:
+        raise ValueError("Invalid DTMIs: {}".format(", ".join(sorted(invalid))))
+    os.makedirs(output_folder, exist_ok=True)
+    lines = [
+        "#usda 1.0",
+        "(",
+        '    "WARNING: THIS FILE IS GENERATED FROM DTDL MODELS.  DO NOT EDIT."',
+        ")",
+    ]
+    types = {}
+    for model_id in sorted(interfaces.keys()):
+        _write_schema_class(lines, model_id, interfaces[model_id], interfaces)
+        types[get_dtdl_schema_name(model_id)] = {
+            "alias": {"UsdSchemaBase": get_dtdl_schema_name(model_id)},
+            "autoGenerated": True,
+            "bases": ["UsdAPISchemaBase"],
+            "schemaKind": "singleApplyAPI",
+        }
+    plug_info = {
+        "Plugins": [
+            {
+                "Info": {"Types": types},
+                "LibraryPath": "",
+                "Name": SCHEMA_PLUGIN_NAME,
+                "ResourcePath": ".",
+                "Root": ".",
+                "Type": "resource",
+            }
+        ]
+    }
+    # Like bundles, the files are written next to the target and then renamed
+    for file_name, content in (
+        (SCHEMA_FILE_NAME, ("\n".join(lines) + "\n").encode("utf-8")),
+        (PLUG_INFO_FILE_NAME, json.dumps(plug_info, indent=4).encode("utf-8")),
+    ):
+        file_path = os.path.join(output_folder, file_name)
+        with open(file_path + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(file_path + ".tmp", file_path)
+    return list(types.keys())
@@ -0,0 +1 @@
+from .test_dtdl_compiler import *
@@ -0,0 +1,343 @@
+# NOTE:
+#   The compiler doesn't depend on Kit, so these are plain unittest test cases. They are discovered
+#   by omni.kit.test and can also be run headless:
+#
+#       python -m unittest dtdl.compiler.tests
+#
+#   with the extension folder on the python path (e.g. PYTHONPATH=exts/dtdl.property).
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+from dtdl.compiler import (
+    DtdlCompileError,
+    DtdlModelBundle,
+    compile_dtdl_files,
+    decode_dtdl_interface,
+    dtmi_to_path,
+    flatten_dtdl_interface,
+    flatten_dtdl_interfaces,
+    get_dtdl_schema_name,
+    get_flattened_parts,
+    is_dtdl_schema_name,
+    is_valid_dtmi,
+    list_dtdl_files,
+    write_dtdl_bundle,
+    write_dtdl_usd_schema,
+)
+from dtdl.compiler.__main__ import main
+
+_CONTEXT = "dtmi:dtdl:context;2"
+# Sample models of the extension
+_SAMPLE_FOLDER = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, os.pardir, "data", "dtdl"
+)
+
+
+def _interface(model_id: str, extends=None, contents=()) -> dict:
+    model = {"@context": _CONTEXT, "@id": model_id, "@type": "Interface"}
+    if extends is not None:
+        model["extends"] = extends
+    model["contents"] = [
+        {"@type": "Property", "name": name, "schema": "double"} for name in contents
+    ]
+    return model
+
+
+def _content_names(flattened: object) -> list[str]:
+    return [c["name"] for c in flattened["contents"]]
+
+
+class TestDtdlCompiler(unittest.TestCase):
+    def setUp(self):
+        self._folder = tempfile.mkdtemp(prefix="dtdl_compiler_test")
+
+    def tearDown(self):
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def _write(self, relative_path: str, model_json: object):
+        file_path = os.path.join(self._folder, relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as f:
+            json.dump(model_json, f)
+
+    def _write_repository(self):
+        """A repository with inheritance, files with arrays and a duplicate interface"""
+        self._write("base.json", _interface("dtmi:test:Base;1", contents=["id"]))
+        for i in range(16):
+            self._write(
+                "rooms/room{:02}.json".format(i),
+                [
+                    _interface(
+                        "dtmi:test:Room{};1".format(i),
+                        "dtmi:test:Base;1",
+                        ["temperature", "humidity{}".format(i)],
+                    ),
+                    {"@id": "dtmi:test:NotAnInterface;1", "@type": "Telemetry"},
+                ],
+            )
+        # The last file that defines an interface wins
+        self._write("zz/override.json", _interface("dtmi:test:Room3;1", contents=["x"]))
+
+    def test_parallel_compile_equals_sequential(self):
+        self._write_repository()
+        file_paths = list_dtdl_files(self._folder)
+        sequential = compile_dtdl_files(file_paths, workers=1)
+        parallel = compile_dtdl_files(file_paths, workers=3)
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(len(sequential), 17)
+        self.assertEqual(
+            flatten_dtdl_interfaces(sequential), flatten_dtdl_interfaces(parallel)
+        )
+        room = decode_dtdl_interface(
+            flatten_dtdl_interface("dtmi:test:Room3;1", parallel)
+        )
+        self.assertEqual(_content_names(room), ["x"])
+
+    def test_invalid_files(self):
+        self._write_repository()
+        with open(os.path.join(self._folder, "rooms", "broken.json"), "w") as f:
+            f.write('{"@id": "dtmi:test:Broken;1",')
+        with open(os.path.join(self._folder, "zz", "latin1.json"), "wb") as f:
+            f.write(b'{"displayName": "\xe9"}')
+        file_paths = list_dtdl_files(self._folder)
+        # All invalid files are reported, in file order, sequentially and by the workers
+        for workers in (1, 3):
+            with self.assertRaises(DtdlCompileError) as context:
+                compile_dtdl_files(file_paths, workers)
+            self.assertEqual(
+                list(context.exception.errors.keys()),
+                [
+                    os.path.join(self._folder, "rooms", "broken.json"),
+                    os.path.join(self._folder, "zz", "latin1.json"),
+                ],
+            )
+            self.assertIn("broken.json", str(context.exception))
+
+    def test_cli_keeps_output_on_error(self):
+        bundle_path = os.path.join(self._folder, "models.dtdlbundle")
+        with open(bundle_path, "wb") as f:
+            f.write(b"previous bundle")
+        empty_folder = os.path.join(self._folder, "empty")
+        os.makedirs(empty_folder)
+        self._write("empty/readme.json", {"@type": "Telemetry"})
+        # A missing source and a source without interfaces fail and keep the previous bundle
+        for source in (os.path.join(self._folder, "missing"), empty_folder):
+            for command in ("bundle", "schema"):
+                output = bundle_path if command == "bundle" else self._folder
+                with redirect_stderr(StringIO()) as stderr:
+                    result = main([command, source, output, "--workers", "1"])
+                self.assertEqual(result, 1)
+                self.assertIn(source, stderr.getvalue())
+        with open(bundle_path, "rb") as f:
+            self.assertEqual(f.read(), b"previous bundle")
+        self.assertFalse(os.path.exists(os.path.join(self._folder, "plugInfo.json")))
+
+    @unittest.skipIf((os.cpu_count() or 1) < 4, "Needs at least 4 cores")
+    def test_parallel_compile_scaling(self):
+        # Parsing the files is spread over the workers, so it scales with the number of cores.
+        # Flattening and writing the bundle happen in the parent process and aren't measured.
+        for i in range(200):
+            self._write(
+                "models/model{:03}.json".format(i),
+                [
+                    _interface(
+                        "dtmi:test:Model{}_{};1".format(i, j),
+                        contents=["property{}".format(p) for p in range(50)],
+                    )
+                    for j in range(50)
+                ],
+            )
+        file_paths = list_dtdl_files(self._folder)
+        durations = {}
+        for workers in (1, 4):
+            start = time.perf_counter()
+            interfaces = compile_dtdl_files(file_paths, workers)
+            durations[workers] = time.perf_counter() - start
+            self.assertEqual(len(interfaces), 200 * 50)
+        # Linear would be 4x, the worker processes have to start and send back their results
+        self.assertGreater(
+            durations[1] / durations[4],
+            2.0,
+            "1 worker {:.2f}s, 4 workers {:.2f}s".format(durations[1], durations[4]),
+        )
+
+    def test_flatten_order(self):
+        # Bases and contents are depth first: own contents, then every base with its own bases
+        self._write(
+            "models.json",
+            [
+                _interface("dtmi:test:Root;1", contents=["root"]),
+                _interface("dtmi:test:Left;1", "dtmi:test:Root;1", ["left"]),
+                _interface("dtmi:test:Right;1", "dtmi:test:Root;1", ["right"]),
+                _interface(
+                    "dtmi:test:Leaf;1",
+                    ["dtmi:test:Left;1", "dtmi:test:Right;1", "dtmi:test:Missing;1"],
+                    ["leaf"],
+                ),
+            ],
+        )
+        interfaces = compile_dtdl_files(list_dtdl_files(self._folder))
+        (bases, _) = get_flattened_parts("dtmi:test:Leaf;1", interfaces)
+        self.assertEqual(
+            bases,
+            [
+                "dtmi:test:Left;1",
+                "dtmi:test:Root;1",
+                "dtmi:test:Right;1",
+                "dtmi:test:Missing;1",
+            ],
+        )
+        leaf = decode_dtdl_interface(
+            flatten_dtdl_interface("dtmi:test:Leaf;1", interfaces)
+        )
+        self.assertEqual(leaf["@id"], "dtmi:test:Leaf;1")
+        self.assertEqual(leaf["bases"], bases)
+        # The shared base is only included once
+        self.assertEqual(_content_names(leaf), ["leaf", "left", "root", "right"])
+
+    def test_bundle_round_trip(self):
+        self._write_repository()
+        interfaces = compile_dtdl_files(list_dtdl_files(self._folder))
+        bundle_path = os.path.join(self._folder, "models.dtdlbundle")
+        version = write_dtdl_bundle(interfaces, bundle_path)
+        # The version only depends on the contents
+        self.assertEqual(write_dtdl_bundle(interfaces, bundle_path), version)
+        with open(bundle_path, "rb") as f:
+            data = f.read()
+        for bundle in (DtdlModelBundle.open(bundle_path), DtdlModelBundle(data)):
+            try:
+                self.assertEqual(bundle.version, version)
+                self.assertEqual(set(bundle.keys()), set(interfaces.keys()))
+                for model_id in interfaces:
+                    expected = decode_dtdl_interface(
+                        flatten_dtdl_interface(model_id, interfaces)
+                    )
+                    self.assertEqual(bundle.get_flattened(model_id), expected)
+                    self.assertEqual(bundle.get_bases(model_id), expected["bases"])
+                    model = bundle[model_id]
+                    self.assertEqual(model["@id"], model_id)
+                    self.assertEqual(
+                        model["contents"],
+                        json.loads(b"[" + interfaces[model_id][3] + b"]"),
+                    )
+            finally:
+                bundle.close()
+        # Bundles of another format have to be compiled again
+        old_format = struct.pack("<8sII", b"DTDLBNDL", 1, 2) + b"{}"
+        for data in (b"NOTABNDL" + bytes(8), b"DTDL", old_format):
+            with self.assertRaises(ValueError):
+                DtdlModelBundle(data)
+
+    def test_bundle_interface_hash(self):
+        self._write_repository()
+        interfaces = compile_dtdl_files(list_dtdl_files(self._folder))
+        old_path = os.path.join(self._folder, "old.dtdlbundle")
+        write_dtdl_bundle(interfaces, old_path)
+        # Change the contents of a base and of a single room
+        self._write(
+            "base.json", _interface("dtmi:test:Base;1", contents=["id", "name"])
+        )
+        self._write(
+            "rooms/room05.json",
+            _interface("dtmi:test:Room5;1", "dtmi:test:Base;1", ["temperature"]),
+        )
+        interfaces = compile_dtdl_files(list_dtdl_files(self._folder))
+        new_path = os.path.join(self._folder, "new.dtdlbundle")
+        write_dtdl_bundle(interfaces, new_path)
+        old_bundle = DtdlModelBundle.open(old_path)
+        new_bundle = DtdlModelBundle.open(new_path)
+        try:
+            self.assertNotEqual(old_bundle.version, new_bundle.version)
+            # The hash only covers the interface itself, not the contents of its bases
+            changed = set(
+                model_id
+                for model_id in new_bundle
+                if old_bundle[model_id].interface_hash
+                != new_bundle[model_id].interface_hash
+            )
+            self.assertEqual(changed, {"dtmi:test:Base;1", "dtmi:test:Room5;1"})
+        finally:
+            old_bundle.close()
+            new_bundle.close()
+
+    def test_usd_schema(self):
+        interfaces = compile_dtdl_files(list_dtdl_files(_SAMPLE_FOLDER))
+        schema_names = write_dtdl_usd_schema(interfaces, self._folder)
+        self.assertEqual(
+            schema_names,
+            [
+                "Dtdl_com_example_Building_1API",
+                "Dtdl_com_example_ConferenceRoom_1API",
+                "Dtdl_com_example_Room_1API",
+                "Dtdl_com_example_Thermostat_1API",
+            ],
+        )
+        with open(os.path.join(self._folder, "plugInfo.json")) as f:
+            types = json.load(f)["Plugins"][0]["Info"]["Types"]
+        self.assertEqual(list(types.keys()), schema_names)
+        for schema_name in schema_names:
+            self.assertEqual(types[schema_name]["schemaKind"], "singleApplyAPI")
+            self.assertEqual(types[schema_name]["bases"], ["UsdAPISchemaBase"])
+
+        # The body of every schema class, by schema name
+        with open(os.path.join(self._folder, "generatedSchema.usda")) as f:
+            classes = dict(c.split('"', 1) for c in f.read().split('\nclass "')[1:])
+        self.assertEqual(list(classes.keys()), schema_names)
+        # Only the schemas of interfaces with bases prepend other schemas
+        conference_room = classes["Dtdl_com_example_ConferenceRoom_1API"]
+        self.assertIn(
+            'prepend apiSchemas = ["Dtdl_com_example_Room_1API"]', conference_room
+        )
+        self.assertIn("int dtdl:capacity = 0 (", conference_room)
+        self.assertNotIn("dtdl:occupied", conference_room)
+        room = classes["Dtdl_com_example_Room_1API"]
+        self.assertNotIn("apiSchemas", room)
+        self.assertIn('string dtdlModelId = "dtmi:com:example:Room;1"', room)
+        self.assertIn("bool dtdl:occupied = false (", room)
+        building = classes["Dtdl_com_example_Building_1API"]
+        self.assertIn('string dtdl:name = "" (', building)
+        self.assertIn("rel dtdl:contains", building)
+        thermostat = classes["Dtdl_com_example_Thermostat_1API"]
+        self.assertIn("double dtdl:temp = 0 (", thermostat)
+        self.assertIn("double dtdl:setPointTemp = 0 (", thermostat)
+
+    def test_dtmi_to_path(self):
+        self.assertEqual(
+            dtmi_to_path("dtmi:com:example:Room;1"), "dtmi/com/example/room-1.json"
+        )
+        self.assertEqual(
+            dtmi_to_path("dtmi:com:example:my_Thermostat;12"),
+            "dtmi/com/example/my_thermostat-12.json",
+        )
+        for dtmi in ("dtmi:com:example:Room", "dtmi:com:1example:Room;1", "Room;1"):
+            self.assertFalse(is_valid_dtmi(dtmi))
+            with self.assertRaises(ValueError):
+                dtmi_to_path(dtmi)
+
+    def test_schema_name(self):
+        self.assertEqual(
+            get_dtdl_schema_name("dtmi:com:example:Room;1"),
+            "Dtdl_com_example_Room_1API",
+        )
+        # Model ids that only differ in case or underscores have different schemas
+        model_ids = [
+            "dtmi:com:my_co:Room;1",
+            "dtmi:com:myCo:Room;1",
+            "dtmi:com:my:co:Room;1",
+            "dtmi:com:my__co:Room;1",
+            "dtmi:com:example:room;1",
+            "dtmi:com:example:Room;1",
+            "dtmi:com:example:Room;11",
+            "dtmi:com:example:Room1;1",
+        ]
+        schema_names = [get_dtdl_schema_name(m) for m in model_ids]
+        self.assertEqual(len(set(schema_names)), len(model_ids))
+        self.assertTrue(all(is_dtdl_schema_name(s) for s in schema_names))
+        with self.assertRaises(ValueError):
+            get_dtdl_schema_name("not a dtmi")
@@ -1 +1,3 @@
 from .dtdl_property_extension import *
+from .dtdl_usd_schema import *
+from .dtdl_bulk_query import *
@@ -1,19 +1,36 @@
-import json
-import time
+import asyncio
+import itertools
 import threading
-from os import path
+from concurrent.futures import ThreadPoolExecutor
 import carb
 import carb.settings
-import omni.client
 import omni.kit.app
+import omni.kit.commands
+import omni.kit.undo
+import omni.ui as ui
 import omni.usd
 from omni.kit.property.usd.usd_property_widget import (
     UsdPropertiesWidget,
     UsdPropertyUiEntry,
 )
-from pxr import Usd, Sdf, Vt, UsdGeom, Trace
-from .dtdl_model_modelrepo import DtdlExtendedModelData, DtdlContent
-from .dtdl_property_extension import DTDL_PATH_SETTING, MODEL_ID_ATTR_NAME
+from pxr import Usd, Sdf, UsdGeom, Trace
+from dtdl.compiler import DtdlModelBundle, is_dtdl_bundle_path
+from .dtdl_commands import ALLOWED_TOKENS_KEY
+from .dtdl_model_modelrepo import DtdlContent
+from .dtdl_model_cache import DtdlModelCache
+from .dtdl_model_picker import DtdlModelPickerWindow
+from .dtdl_model_snapshot import DtdlRepoDiff, DtdlRepoSnapshot
+from .dtdl_twin_index import DtdlTwinIndex
+from .dtdl_model_resolver import DtdlModelResolver
+from .dtdl_model_root import DtdlModelRoot, get_dtdl_root_paths
+from .dtdl_property_extension import (
+    DTDL_PATH_SETTING,
+    DTDL_ROOTS_SETTING,
+    DTDL_LAZY_RESOLVE_SETTING,
+    DTDL_MODEL_CACHE_SIZE_SETTING,
+    DTDL_MODEL_CACHE_CONTENTS_SETTING,
+    MODEL_ID_ATTR_NAME,
+)
 
 
 class DtdlAttributeWidget(UsdPropertiesWidget):
@@ -22,203 +39,400 @@ class DtdlAttributeWidget(UsdPropertiesWidget):
     def __init__(self):
         super().__init__(title="DTDL", collapsed=False)
         self._dtdl_path: str = None
-        self._subscribe_settings()
+        self._dtdl_root_paths: list[str] = []
+        self._lazy_resolve: bool = False
+        self._model_cache_size: int = 0
+        self._model_cache_contents: int = 0
         self._read_settings()
 
-        self._dtdl_model_repo: dict[str, DtdlExtendedModelData] = {}
+        # The model repository is published as an immutable snapshot. The watcher thread builds a
+        # new snapshot and swaps the reference, USD is updated on the main thread afterwards.
+        self._main_loop = asyncio.get_event_loop()
+        self._snapshot_versions = itertools.count()
+        self._dtdl_snapshot = DtdlRepoSnapshot(
+            next(self._snapshot_versions), self._create_model_cache()
+        )
+        # The search index of the model picker is built on this thread for every published
+        # snapshot, building it for a large repository would freeze the main thread. The index of
+        # the last indexed snapshot is reused if the models didn't change since then.
+        self._index_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="dtdl.property search index"
+        )
+        self._dtdl_snapshot.build_search_index()
+        self._indexed_snapshot = self._dtdl_snapshot
+        # Diff of the snapshots that were published since the last indexed snapshot
+        self._unindexed_diff: DtdlRepoDiff = None
         self._dtdl_contents_list: list[DtdlContent] = []
+        # Model ids of the selected prims and the snapshot version the contents list is built from
+        self._selected_model_ids: set[str] = set()
+        self._contents_snapshot_version = -1
+        # Diff of the snapshots that were published, but not handled yet on the main thread
+        self._pending_diff: DtdlRepoDiff = None
+        # Model bundles of the published snapshots by id, closed once no snapshot uses them
+        self._open_bundles: dict[int, DtdlModelBundle] = {}
+        # Index of the twins in the stage by model id, follows the stage of the usd context
+        self._twin_index = DtdlTwinIndex()
+        usd_context = omni.usd.get_context()
+        self._twin_index.attach(usd_context.get_stage())
+        self._stage_event_sub = (
+            usd_context.get_stage_event_stream().create_subscription_to_pop(
+                self._on_stage_event, name="dtdl.property twin index"
+            )
+        )
+        # Created when the model picker is opened for the first time
+        self._model_picker: DtdlModelPickerWindow = None
         # self._noplaceholder_list: dict[str, bool] = {}
 
-        # holds the file entries, but not the absolute path
-        # self._dtdl_file_list: list[omni.client.ListEntry] = []
-        # holds the absolute path to the files
-        # self._dtdl_file_urls: list[str] = []
-        (self._dtdl_file_list, self._dtdl_file_urls) = self._get_dtdl_file_list()
-        self._load_dtdl_model_repo()
-
+        # The repository is loaded, reloaded or resolved by one thread at a time
+        self._repo_lock = threading.Lock()
         self._stop_event = threading.Event()
-        # Start the dtdl folder watcher in a separate thread
-        self._dtdl_watcher_thread = threading.Thread(target=self._watch_dtdl_path)
-        self._dtdl_watcher_thread.start()
-        # Settings subscription
-        self._setting_sub
+        self._model_roots: list[DtdlModelRoot] = []
+        self._dtdl_resolver: DtdlModelResolver = None
+        self._resolver_executor: ThreadPoolExecutor = None
+        self._resolver_thread: threading.Thread = None
+        # The model repository is loaded on this thread, and restarted when the settings change,
+        # one change at a time. The widget shows the empty snapshot until the models are loaded.
+        self._reload_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="dtdl.property reload"
+        )
+        self._load_future = self._reload_executor.submit(
+            self._start_model_repo, self._get_stage_model_ids()
+        )
+        self._subscribe_settings()
 
     def __del__(self):
+        self._release()
+
+    def clean(self):
+        """Called when the widget is unregistered, stops the watcher thread"""
+        self._release()
+        super().clean()
+
+    def _release(self):
         self._stop_watching()
+        if self._model_picker:
+            self._model_picker.destroy()
+            self._model_picker = None
+        self._stage_event_sub = None
+        self._twin_index.detach()
 
     def _subscribe_settings(self):
-        """Subscribe to settings changes to reload the DTDL models when the path changes"""
+        """Subscribe to settings changes to reload the DTDL models when the roots change"""
 
-        def on_change():
+        def on_change(item, event_type):
             self._on_settings_change()
 
-        self._setting_sub = (
-            carb.settings.get_settings().subscribe_to_node_change_events(
-                DTDL_PATH_SETTING, on_change
+        settings = carb.settings.get_settings()
+        self._setting_subs = [
+            settings.subscribe_to_node_change_events(setting, on_change)
+            for setting in (
+                DTDL_PATH_SETTING,
+                DTDL_ROOTS_SETTING,
+                DTDL_LAZY_RESOLVE_SETTING,
+                DTDL_MODEL_CACHE_SIZE_SETTING,
+                DTDL_MODEL_CACHE_CONTENTS_SETTING,
             )
+        ]
+
+    def _get_settings(self) -> tuple:
+        """The settings that were read last, to compare them after a change"""
+        return (
+            self._dtdl_path,
+            self._dtdl_root_paths,
+            self._lazy_resolve,
+            self._model_cache_size,
+            self._model_cache_contents,
         )
-        # self._dtdl_path = omni.kit.app.SettingChangeSubscription(
-        #     DTDL_PATH_SETTING,
-        #     self._on_settings_change,
-        # )
-        # TODO: This isn't triggering ... figure out why
 
     def _read_settings(self):
-        """Read the settings to get the path to the DTDL models"""
+        """Read the settings to get the roots of the DTDL models and how they are loaded"""
         settings = carb.settings.get_settings()
         self._dtdl_path = settings.get(DTDL_PATH_SETTING)
+        self._dtdl_root_paths = get_dtdl_root_paths(
+            self._dtdl_path, settings.get(DTDL_ROOTS_SETTING)
+        )
+        self._lazy_resolve = bool(settings.get(DTDL_LAZY_RESOLVE_SETTING))
+        self._model_cache_size = settings.get_as_int(DTDL_MODEL_CACHE_SIZE_SETTING)
+        self._model_cache_contents = settings.get_as_int(
+            DTDL_MODEL_CACHE_CONTENTS_SETTING
+        )
+
+    def _create_model_cache(self) -> DtdlModelCache:
+        """Create an empty model cache with the bounds of the settings"""
+        return DtdlModelCache(self._model_cache_size, self._model_cache_contents)
 
     def _on_settings_change(self):
-        """Called when the settings change"""
+        """
+        Called when the settings change. The model repository is restarted on the reload thread,
+        stopping the watchers and loading the models can take a while.
+        """
+        previous_settings = self._get_settings()
         self._read_settings()
-        self.request_rebuild()
+        if self._get_settings() == previous_settings or self._reload_executor is None:
+            return
+        self._reload_executor.submit(
+            self._restart_model_repo, self._get_stage_model_ids()
+        )
+
+    @property
+    def twin_index(self) -> DtdlTwinIndex:
+        """Index of the twins in the current stage by model id"""
+        return self._twin_index
+
+    @property
+    def snapshot(self) -> DtdlRepoSnapshot:
+        """The current snapshot of the model repository"""
+        return self._dtdl_snapshot
+
+    def _on_stage_event(self, event):
+        """Keep the twin index attached to the current stage"""
+        if event.type == int(omni.usd.StageEventType.OPENED):
+            self._twin_index.attach(omni.usd.get_context().get_stage())
+            self._resolve_dtdl_models(self._get_stage_model_ids())
+        elif event.type == int(omni.usd.StageEventType.CLOSING):
+            self._twin_index.detach()
+
+    def _start_model_repo(self, stage_model_ids: set[str]):
+        """
+        Create the model roots or the resolver for the current settings and load the models, the
+        models are published in a new snapshot that doesn't share anything with the previous one.
+        Called on the reload thread.
+        """
+        self._stop_event = threading.Event()
+        models = self._create_model_cache()
+        # A bundle is loaded with a single read and decoded lazily, so roots with a bundle are
+        # never resolved lazily
+        if self._lazy_resolve and not any(
+            is_dtdl_bundle_path(p) for p in self._dtdl_root_paths
+        ):
+            # Only the models used in the stage are resolved, the rest is resolved on demand. The
+            # resolver searches the roots in the same precedence order as the loaded roots.
+            # Models are resolved on a worker thread, the resolved models are watched by a thread
+            # that reads them again when their files change and retries the missing models.
+            self._model_roots = []
+            self._dtdl_resolver = DtdlModelResolver(self._dtdl_root_paths)
+            with self._repo_lock:
+                self._publish_snapshot(models)
+            self._resolver_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="dtdl.property resolver"
+            )
+            self._resolver_thread = threading.Thread(
+                target=self._watch_resolved_models,
+                name="dtdl.property resolver watcher",
+            )
+            self._resolver_thread.start()
+            self._resolve_dtdl_models(stage_model_ids)
+        else:
+            # Every root has its own listing, models and watcher thread
+            self._model_roots = [DtdlModelRoot(p) for p in self._dtdl_root_paths]
+            self._dtdl_resolver = None
+            self._load_dtdl_model_repo(models)
+            for model_root in self._model_roots:
+                model_root.start_watching(self._on_model_root_changed, self._stop_event)
+
+    def _restart_model_repo(self, stage_model_ids: set[str]):
+        """Called on the reload thread after the settings changed"""
+        self._stop_model_repo()
+        self._start_model_repo(stage_model_ids)
 
     def _stop_watching(self):
-        """Stop the dtdl folder watcher thread"""
+        """Stop the settings change subscriptions and the threads of the model repository"""
+        settings = carb.settings.get_settings()
+        for sub in self._setting_subs:
+            settings.unsubscribe_to_change_events(sub)
+        self._setting_subs = []
+        if self._reload_executor is not None:
+            # A restart that is still running is finished first, so its threads are stopped too
+            self._reload_executor.shutdown(wait=True, cancel_futures=True)
+            self._reload_executor = None
+        self._stop_model_repo()
+        if self._index_executor is not None:
+            # An index that is being built isn't used anymore, so it isn't waited for
+            self._index_executor.shutdown(wait=False, cancel_futures=True)
+            self._index_executor = None
+
+    def _stop_model_repo(self):
+        """Stop the watcher threads of the model roots and the resolver threads"""
         self._stop_event.set()
-        self._dtdl_watcher_thread.join()
-        """Stop the settings change subscription"""
-        carb.settings.get_settings().unsubscribe_to_change_events(self._setting_sub)
-
-    def _get_dtdl_file_list(self):
-        # the file entries, but not the absolute path
-        dtdl_file_list: list[omni.client.ListEntry] = []
-        # the absolute path to the files
-        dtdl_file_urls: list[str] = []
-
-        def recursive_list_files(folder):
-            (result, file_list) = omni.client.list(folder)
-            for list_entry in file_list:
-                if (list_entry.flags & omni.client.ItemFlags.READABLE_FILE) and (
-                    list_entry.relative_path.endswith(".json")
-                ):
-                    dtdl_file_list.append(list_entry)
-                    dtdl_file_urls.append(path.join(folder, list_entry.relative_path))
-                elif list_entry.flags & omni.client.ItemFlags.CAN_HAVE_CHILDREN:
-                    recursive_list_files(path.join(folder, list_entry.relative_path))
-
-        recursive_list_files(self._dtdl_path)
-
-        return (dtdl_file_list, dtdl_file_urls)
-
-    def _watch_dtdl_path(self):
-        """
-        Watch the DTDL path for changes by periodically checking the filtered list
-        of files and their updated timestamps in the folder
-        """
-        while not self._stop_event.is_set():
-            # (result, full_file_list) = omni.client.list(self._dtdl_path)
-            # file_list = [
-            #     entry for entry in full_file_list if ".json" in entry.relative_path
-            # ]
-            (file_list, file_urls) = self._get_dtdl_file_list()
-            if len(self._dtdl_file_list) == 0:
-                self._dtdl_file_list = file_list
-                self._dtdl_file_urls = file_urls
-                self._load_dtdl_model_repo()
-                time.sleep(20)
-                continue
-            new_files = [
-                list_entry
-                for list_entry in file_list
-                if list_entry.relative_path
-                not in [entry.relative_path for entry in self._dtdl_file_list]
-            ]
-            deleted_files = [
-                entry
-                for entry in self._dtdl_file_list
-                if entry.relative_path
-                not in [list_entry.relative_path for list_entry in file_list]
-            ]
-            if len(new_files) > 0 or len(deleted_files) > 0:
-                self._dtdl_file_list = file_list
-                self._dtdl_file_urls = file_urls
-                self._load_dtdl_model_repo()
-                time.sleep(20)
-                continue
-            for list_entry in new_files:
-                modified_time = list_entry.modified_time
-                existing_entry = next(
-                    entry
-                    for entry in self._dtdl_file_list
-                    if entry.relative_path == list_entry.relative_path
+        for model_root in self._model_roots:
+            model_root.stop_watching()
+        if self._resolver_executor is not None:
+            # At most one resolve is still running, the queued ones are dropped
+            self._resolver_executor.shutdown(wait=True, cancel_futures=True)
+            self._resolver_executor = None
+        if self._resolver_thread is not None:
+            self._resolver_thread.join()
+            self._resolver_thread = None
+
+    def _publish_snapshot(self, models: DtdlModelCache) -> DtdlRepoSnapshot:
+        """
+        Publish a new snapshot of the model repository. Can be called from any thread, the USD
+        updates for the new snapshot are scheduled on the main thread.
+        """
+        snapshot = DtdlRepoSnapshot(next(self._snapshot_versions), models)
+        diff = DtdlRepoDiff.compute(self._dtdl_snapshot, snapshot)
+        carb.log_info("DTDL model repository changed: {}".format(diff))
+        # The stats are shared by the copies of a cache, so they cover the previous snapshots too
+        carb.log_info("DTDL model cache stats: {}".format(models.stats))
+        # Swapping the reference is atomic, readers either see the old or the new snapshot
+        self._dtdl_snapshot = snapshot
+        self._main_loop.call_soon_threadsafe(
+            self._on_snapshot_published, snapshot, diff
+        )
+        # Called with the repository lock held, so the snapshots are indexed in publish order
+        executor = self._index_executor
+        if executor is not None:
+            try:
+                executor.submit(self._build_search_index, snapshot, diff)
+            except RuntimeError:
+                # The executor was shut down in the meantime
+                pass
+        return snapshot
+
+    def _build_search_index(self, snapshot: DtdlRepoSnapshot, diff: DtdlRepoDiff):
+        """
+        Build the search index of a published snapshot on the index thread. Only the current
+        snapshot is indexed, a snapshot that was already replaced is skipped.
+        """
+        if self._unindexed_diff is not None:
+            diff = self._unindexed_diff.merge(diff)
+        if snapshot is not self._dtdl_snapshot:
+            self._unindexed_diff = diff
+            return
+        self._unindexed_diff = None
+        # The index only has the model ids and display names, it's the same if no model changed
+        previous_index = self._indexed_snapshot.search_index
+        snapshot.build_search_index(previous_index if diff.is_empty() else None)
+        self._indexed_snapshot = snapshot
+        self._main_loop.call_soon_threadsafe(self._on_search_index_built, snapshot)
+
+    def _on_search_index_built(self, snapshot: DtdlRepoSnapshot):
+        """Called on the main thread when the search index of a snapshot is built"""
+        if self._model_picker is not None:
+            self._model_picker.on_search_index_built(snapshot)
+
+    def _on_snapshot_published(self, snapshot: DtdlRepoSnapshot, diff: DtdlRepoDiff):
+        """
+        Called on the main thread after a new snapshot has been published. The widget is only
+        rebuilt if the diff affects a model of the selected prims.
+        """
+        self._pending_diff = (
+            diff if self._pending_diff is None else self._pending_diff.merge(diff)
+        )
+        self._open_bundles.update((id(b), b) for b in _get_bundles(snapshot))
+        # A newer snapshot has been published in the meantime, it will be handled separately
+        if snapshot is not self._dtdl_snapshot:
+            return
+        self._close_replaced_bundles(snapshot)
+        diff = self._pending_diff
+        self._pending_diff = None
+        if diff.is_empty():
+            return
+        self._twin_index.set_subtypes(snapshot.subtypes)
+        # The contents list is already up to date if it was built from this snapshot
+        if self._contents_snapshot_version >= snapshot.version:
+            return
+        if self._selected_model_ids.isdisjoint(diff.affected):
+            return
+        self._build_dtdl_contents_list(self._get_valid_prims())
+        self.request_rebuild()
+
+    def _close_replaced_bundles(self, snapshot: DtdlRepoSnapshot):
+        """
+        Close the bundles that were replaced by the bundles of the current snapshot, e.g. after a
+        bundle was compiled again. Memory mapped bundles keep their file open until they are
+        closed.
+        NOTE: Called on the main thread, older snapshots aren't read anymore once a snapshot is
+              handled
+        """
+        used_bundles = set(id(b) for b in _get_bundles(snapshot))
+        for bundle_id in list(self._open_bundles.keys()):
+            if bundle_id not in used_bundles:
+                self._open_bundles.pop(bundle_id).close()
+
+    def _load_dtdl_model_repo(self, models: DtdlModelCache = None):
+        """
+        (Re)load the DTDL models of all model roots. The roots are loaded concurrently and only
+        read the files that changed since their last load. The roots are the sources of the model
+        cache, in the order of their precedence: if a model is defined in more than one root, the
+        first root wins. The extended model data, which also includes the properties of the super
+        classes, is computed on demand and kept in a bounded LRU cache.
+        The loaded models are published as a new snapshot once they are all read. The cached model
+        data of the current snapshot is reused, unless another (e.g. empty) cache is given.
+        """
+        with self._repo_lock:
+            with ThreadPoolExecutor(max_workers=max(1, len(self._model_roots))) as pool:
+                changed_ids = set().union(
+                    *pool.map(lambda model_root: model_root.load(), self._model_roots)
                 )
-                if modified_time > existing_entry.modified_time:
-                    self._dtdl_file_list = file_list
-                    self._dtdl_file_urls = file_urls
-                    self._load_dtdl_model_repo()
-                    time.sleep(20)
-                    continue
-            time.sleep(10)
-
-    def _set_modelid_allowed_tokens(self):
-        """
-        When the model repo changes, we need to traverse all prims that have the dtdm:modelId attribute
-        and update the allowed tokens for the attribute
-        """
-        # Prepare allowed tokens Tuple
-        allowed_tokens = Vt.TokenArray(
-            len(self._dtdl_model_repo) + 1,
-            ("", *self._dtdl_model_repo.keys()),
+            return self._publish_model_roots(changed_ids, models)
+
+    def _on_model_root_changed(self, model_root: DtdlModelRoot):
+        """
+        Called by the watcher thread of a root when its files changed. Only the changed root is
+        reloaded, and only the cached model data of the changed interfaces and the interfaces that
+        extend them is dropped.
+        """
+        with self._repo_lock:
+            changed_ids = model_root.load()
+            return self._publish_model_roots(changed_ids)
+
+    def _publish_model_roots(
+        self, changed_ids: set[str], models: DtdlModelCache = None
+    ) -> DtdlRepoSnapshot:
+        # The UI is only rebuilt on the main thread if the models of the selected prims changed
+        if models is None:
+            models = self._dtdl_snapshot.models
+        model_repo = models.with_sources(
+            [model_root.models for model_root in self._model_roots], changed_ids
         )
-        # Get current stage
-        usd_context = omni.usd.get_context()
-        stage = usd_context.get_stage()
-        # Traverse all prims in the stage
-        for prim in stage.Traverse():
-            # Get the model id attribute
-            model_id_attr = prim.GetAttribute(MODEL_ID_ATTR_NAME)
-            current_allowed_tokens = model_id_attr.GetMetadata("allowedTokens")
-            if current_allowed_tokens is not None:
-                model_id_attr.SetMetadata("allowedTokens", allowed_tokens)
-                # v = model_id_attr.Get()
-                # allowed_tokens = model_id_attr.GetMetadata("allowedTokens")
-                # # n = model_id_attr.GetAllMetadata()
-                # # o = model_id_attr.GetCustomData()
-                # # Set the allowed tokens
-                # model_id_attr.Get()
-
-    def _load_dtdl_model_repo(self):
-        """
-        Load all the DTDL models from the specified folder. All (extended) models are stored in a dictionary
-        with the model id as the key. The extended model data also includes the properties of the super classes.
-        """
-        self._dtdl_model_repo = {}
-        models = []
-
-        for file_url in self._dtdl_file_urls:
-            (result, version, content) = omni.client.read_file(file_url)
-            model_json = json.loads(memoryview(content).tobytes())
-            if isinstance(model_json, dict):
-                if (
-                    "@context" in model_json
-                    and "@id" in model_json
-                    and "@type" in model_json
-                    and model_json["@type"] == "Interface"
-                ):
-                    models.append(model_json)
-            # if the json is an array, we need to iterate over the array
-            elif isinstance(model_json, list):
-                for model in model_json:
-                    if (
-                        "@context" in model
-                        and "@id" in model
-                        and "@type" in model
-                        and model["@type"] == "Interface"
-                    ):
-                        models.append(model)
-        # Generate all extended model data and store it in a dictionary
-        for model in models:
-            self._dtdl_model_repo[model["@id"]] = DtdlExtendedModelData(model, models)
-        # Rebuild the UI
-        # prims = self._get_valid_prims()
-        # self._build_dtdl_contents_list(prims)
-        # self.request_rebuild()
-
-        # Update the allowed tokens for the model id attribute in each prim
-        self._set_modelid_allowed_tokens()
-
-        return self._dtdl_model_repo
+        return self._publish_snapshot(model_repo)
+
+    def _get_stage_model_ids(self) -> set[str]:
+        """
+        Get the model ids of all prims in the current stage that have the dtdl:modelId attribute
+        """
+        return set(model_id for model_id in self._twin_index.model_ids if model_id)
+
+    def _resolve_dtdl_models(self, model_ids):
+        """
+        Lazily resolve the given model ids (and the models they extend) on the resolver thread.
+        A new snapshot that includes the newly resolved models is published once they are read,
+        the selected prims are updated when it is handled on the main thread.
+        """
+        # The resolver is replaced when the model repository is restarted on the reload thread
+        (executor, resolver) = (self._resolver_executor, self._dtdl_resolver)
+        if executor is None or resolver is None or self._stop_event.is_set():
+            return
+        missing = [m for m in model_ids if m not in self._dtdl_snapshot.models]
+        if len(missing) == 0:
+            return
+        try:
+            executor.submit(self._publish_resolved_models, resolver.resolve, missing)
+        except RuntimeError:
+            # The executor was shut down in the meantime
+            pass
+
+    def _watch_resolved_models(self):
+        """Periodically read the changed files of the resolved models and retry missing models"""
+        while not self._stop_event.wait(10):
+            self._publish_resolved_models(self._dtdl_resolver.refresh)
+
+    def _publish_resolved_models(self, resolve_fn, *args):
+        """Resolve models with the resolver and publish them, called on a resolver thread"""
+        with self._repo_lock:
+            if self._stop_event.is_set():
+                return
+            try:
+                resolved = resolve_fn(*args)
+            except Exception as e:
+                carb.log_error("Failed to resolve DTDL models: {}".format(e))
+                return
+            if len(resolved) == 0:
+                return
+            model_repo = self._dtdl_snapshot.models.copy()
+            model_repo.add_models(resolved)
+            self._publish_snapshot(model_repo)
 
     def _get_valid_prims(self):
         """
@@ -238,24 +452,31 @@ class DtdlAttributeWidget(UsdPropertiesWidget):
         Build a list of DTDL properties for the selected prims
         """
         self._dtdl_contents_list = []
+        model_ids = []
         for prim in prims:
             model_id_attr = prim.GetAttribute(MODEL_ID_ATTR_NAME)
             if model_id_attr:
                 model_id = model_id_attr.Get()
                 if model_id:
-                    if model_id in self._dtdl_model_repo:
-                        model_data = self._dtdl_model_repo[model_id]
-                        for prop in model_data.properties:
-                            if prop.id not in [p.id for p in self._dtdl_contents_list]:
-                                self._dtdl_contents_list.append(prop)
-                        for telemetry in model_data.telemetries:
-                            if telemetry.id not in [
-                                p.id for p in self._dtdl_contents_list
-                            ]:
-                                self._dtdl_contents_list.append(telemetry)
-                        for rel in model_data.relationships:
-                            if rel.id not in [p.id for p in self._dtdl_contents_list]:
-                                self._dtdl_contents_list.append(rel)
+                    model_ids.append(str(model_id))
+        self._resolve_dtdl_models(model_ids)
+        # Read the snapshot once, a new one can be published while the list is being built
+        snapshot = self._dtdl_snapshot
+        models = snapshot.models
+        self._selected_model_ids = set(model_ids)
+        self._contents_snapshot_version = snapshot.version
+        for model_id in model_ids:
+            if model_id in models:
+                model_data = models[model_id]
+                for prop in model_data.properties:
+                    if prop.id not in [p.id for p in self._dtdl_contents_list]:
+                        self._dtdl_contents_list.append(prop)
+                for telemetry in model_data.telemetries:
+                    if telemetry.id not in [p.id for p in self._dtdl_contents_list]:
+                        self._dtdl_contents_list.append(telemetry)
+                for rel in model_data.relationships:
+                    if rel.id not in [p.id for p in self._dtdl_contents_list]:
+                        self._dtdl_contents_list.append(rel)
 
         return self._dtdl_contents_list
 
@@ -287,7 +508,7 @@ class DtdlAttributeWidget(UsdPropertiesWidget):
         prims = self._get_valid_prims()
 
         # if model repo not loaded, don't show
-        if self._dtdl_model_repo is None:
+        if self._dtdl_snapshot is None:
             return False
 
         self._build_dtdl_contents_list(prims)
@@ -329,16 +550,15 @@ class DtdlAttributeWidget(UsdPropertiesWidget):
 
         # Add the model Id attribute placeholder if it doesn't exist yet
         # if MODEL_ID_ATTR_NAME not in self._noplaceholder_list:
+        # NOTE: No allowedTokens are added, the model is selected with the model picker instead of
+        #       a combo box with every model id in the repository. Tokens that older versions wrote
+        #       to the attribute are cleared when the model id is set (see _set_model_id).
         ui_entries.append(
             UsdPropertyUiEntry(
                 MODEL_ID_ATTR_NAME,
                 "Model",
                 {
                     Sdf.PrimSpec.TypeNameKey: "token",
-                    "allowedTokens": Vt.TokenArray(
-                        len(self._dtdl_model_repo) + 1,
-                        ("", *self._dtdl_model_repo.keys()),
-                    ),
                     "customData": {"default": ""},
                 },
                 Usd.Attribute,
@@ -361,12 +581,113 @@ class DtdlAttributeWidget(UsdPropertiesWidget):
         # custom UI attributes
         frame = CustomLayoutFrame(hide_extra=False)
         with frame:
-            CustomLayoutProperty(MODEL_ID_ATTR_NAME, "Model")
+            CustomLayoutProperty(
+                MODEL_ID_ATTR_NAME, "Model", build_fn=self._build_model_id_widget
+            )
             for prop in self._dtdl_contents_list:
                 prop.to_custom_layout_property()
 
         return frame.apply(ui_entries)
 
+    def _build_model_id_widget(
+        self,
+        stage,
+        attr_name,
+        metadata,
+        property_type,
+        prim_paths: list[Sdf.Path],
+        additional_label_kwargs=None,
+        additional_widget_kwargs=None,
+    ):
+        """
+        Build the widget for the model id: a field to enter a model id and a button to open the
+        model picker
+        """
+        from omni.kit.property.usd.usd_property_widget_builder import (
+            UsdPropertiesWidgetBuilder,
+        )
+
+        model_ids = set()
+        for prim_path in prim_paths:
+            model_id_attr = stage.GetAttributeAtPath(
+                prim_path.AppendProperty(MODEL_ID_ATTR_NAME)
+            )
+            model_ids.add(str(model_id_attr.Get() or "") if model_id_attr else "")
+        mixed = len(model_ids) > 1
+        value = model_ids.pop() if len(model_ids) == 1 else ""
+
+        def on_end_edit(model):
+            model_id = model.get_value_as_string().strip()
+            # Leaving the field without editing it must not clear or create the model ids
+            if model_id == value:
+                return
+            self._set_model_id(stage, prim_paths, model_id)
+
+        with ui.HStack(spacing=4):
+            UsdPropertiesWidgetBuilder._create_label(
+                attr_name, metadata, additional_label_kwargs
+            )
+            model = ui.SimpleStringModel(value)
+            model.add_end_edit_fn(on_end_edit)
+            ui.StringField(model=model, tooltip="Mixed" if mixed else "")
+            ui.Button(
+                "...",
+                width=24,
+                tooltip="Select model",
+                clicked_fn=lambda: self._show_model_picker(stage, prim_paths),
+            )
+        return model
+
+    def _show_model_picker(self, stage, prim_paths: list[Sdf.Path]):
+        """Open the model picker to select the model for the given prims"""
+        if self._model_picker is None:
+            self._model_picker = DtdlModelPickerWindow()
+        self._model_picker.show(
+            self._dtdl_snapshot,
+            lambda model_id: self._set_model_id(stage, prim_paths, model_id),
+            resolved_only=self._dtdl_resolver is not None,
+        )
+
+    def _set_model_id(self, stage, prim_paths: list[Sdf.Path], model_id: str):
+        """
+        Set the model id of the given prims, the attribute is created if needed. Setting the model
+        id of all prims is a single undo step, together with clearing the stale allowedTokens.
+        """
+        with omni.kit.undo.group():
+            for prim_path in prim_paths:
+                self._set_prim_model_id(stage, prim_path, model_id)
+
+    def _set_prim_model_id(self, stage, prim_path: Sdf.Path, model_id: str):
+        prim = stage.GetPrimAtPath(prim_path)
+        if not prim:
+            return
+        model_id_attr = prim.GetAttribute(MODEL_ID_ATTR_NAME)
+        # Unchanged model ids aren't set again, and no empty model id is created
+        current_model_id = model_id_attr.Get() if model_id_attr else None
+        if str(current_model_id or "") == model_id:
+            return
+        if not model_id_attr:
+            # Undoing the command removes the attribute again, so no empty model id is left
+            omni.kit.commands.execute(
+                "CreateUsdAttributeOnPath",
+                attr_path=prim_path.AppendProperty(MODEL_ID_ATTR_NAME),
+                attr_type=Sdf.ValueTypeNames.Token,
+                attr_value=model_id,
+            )
+            return
+        # The model ids of the combo box of older versions aren't valid anymore, the tokens would
+        # also limit the values in other property widgets
+        if model_id_attr.HasAuthoredMetadata(ALLOWED_TOKENS_KEY):
+            omni.kit.commands.execute(
+                "ClearDtdlAllowedTokens", attr_path=model_id_attr.GetPath()
+            )
+        omni.kit.commands.execute(
+            "ChangeProperty",
+            prop_path=model_id_attr.GetPath(),
+            value=model_id,
+            prev=model_id_attr.Get(),
+        )
+
     @Trace.TraceFunction
     def _on_usd_changed(self, notice, stage):
         """
@@ -385,3 +706,12 @@ class DtdlAttributeWidget(UsdPropertiesWidget):
             prims = self._get_valid_prims()
             self._build_dtdl_contents_list(prims)
             self.request_rebuild()
+
+
+def _get_bundles(snapshot: DtdlRepoSnapshot) -> list[DtdlModelBundle]:
+    """Get the model bundles that are sources of the models of a snapshot"""
+    return [
+        source
+        for source in snapshot.models.raw_index.maps
+        if isinstance(source, DtdlModelBundle)
+    ]
@@ -0,0 +1,309 @@
+import ctypes
+from typing import Iterable
+import carb
+import numpy as np
+import omni.usd
+from pxr import Usd, Sdf
+from .dtdl_property_extension import get_twin_index
+from .dtdl_twin_index import DtdlTwinIndex
+
+# USDRT reads the values from Fabric, without USD composition. It's optional, without it the
+# values are read from USD.
+try:
+    from usdrt import Usd as RtUsd, Sdf as RtSdf
+except ImportError:
+    RtUsd = None
+    RtSdf = None
+
+# USDRT value type and NumPy dtype of the attributes that are gathered from the Fabric arrays, by
+# USD type name. The values of other attributes are read per twin.
+_FABRIC_TYPES = {
+    "bool": ("Bool", np.bool_),
+    "int": ("Int", np.int32),
+    "int64": ("Int64", np.int64),
+    "float": ("Float", np.float32),
+    "double": ("Double", np.float64),
+}
+
+# Reductions supported by aggregate_dtdl_values
+REDUCTIONS = ("min", "max", "mean", "sum", "count")
+
+
+class DtdlBulkQueryResult:
+    """
+    Values of a DTDL property or telemetry for a set of twins. values is a NumPy array with a value
+    for every path, valid is False for the twins that have no value (the value is NaN for numeric
+    attributes and None otherwise). path_strings holds the paths as a NumPy string array.
+    """
+
+    __slots__ = ("attr_name", "paths", "path_strings", "values", "valid")
+
+    def __init__(
+        self,
+        attr_name: str,
+        paths: list[Sdf.Path],
+        path_strings: np.ndarray,
+        values: np.ndarray,
+        valid: np.ndarray,
+    ):
+        self.attr_name = attr_name
+        self.paths = paths
+        self.path_strings = path_strings
+        self.values = values
+        self.valid = valid
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __repr__(self):
+        return "{}: {} twins, {} values".format(
+            self.attr_name, len(self.paths), int(np.count_nonzero(self.valid))
+        )
+
+
+def query_dtdl_values(
+    stage: Usd.Stage,
+    model_id: str,
+    name: str,
+    include_subtypes: bool = True,
+    twin_index: DtdlTwinIndex = None,
+) -> DtdlBulkQueryResult:
+    """
+    Read a DTDL property or telemetry (e.g. "temperature" or "dtdl:temperature") of all twins of a
+    model into a NumPy array. If include_subtypes is True, the twins of the models that extend the
+    model are included as well. The twins are selected with the twin index of the extension, so
+    the stage isn't traversed.
+    Numeric and boolean values are returned as float64, other values as objects.
+    """
+    attr_name = name if name.startswith("dtdl:") else "dtdl:" + name
+    if twin_index is None:
+        twin_index = get_twin_index()
+    if twin_index is None:
+        # Without the extension there's no repository, so subtypes can't be included
+        twin_index = DtdlTwinIndex()
+        twin_index.attach(stage)
+        paths = sorted(twin_index.find_twins(model_id, include_subtypes=False))
+        twin_index.detach()
+    else:
+        paths = sorted(twin_index.find_twins(model_id, include_subtypes))
+    path_strings = _to_path_strings(paths)
+    rt_stage = _get_rt_stage(stage)
+    arrays = None
+    if rt_stage is not None:
+        arrays = _gather_fabric_values(rt_stage, stage, paths, path_strings, attr_name)
+    if arrays is None:
+        arrays = _to_array(_read_values(rt_stage, stage, paths, attr_name))
+    return DtdlBulkQueryResult(attr_name, paths, path_strings, *arrays)
+
+
+def _to_path_strings(paths: Iterable[Sdf.Path]) -> np.ndarray:
+    return np.array([str(p) for p in paths], dtype=str)
+
+
+def _gather_fabric_values(
+    rt_stage,
+    stage: Usd.Stage,
+    paths: list[Sdf.Path],
+    twin_paths: np.ndarray,
+    attr_name: str,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Gather the values of a numeric or boolean attribute from Fabric in bulk. The prims with the
+    attribute are selected with USDRT, their values are copied from the Fabric arrays of every
+    bucket and matched to the twins by path. Twins that aren't in the selection (e.g. prims that
+    aren't in Fabric yet) are read one by one. Returns None if the attribute can't be gathered,
+    the values have to be read per twin then.
+    """
+    fabric_type = _FABRIC_TYPES.get(_get_type_name(stage, paths, attr_name))
+    if fabric_type is None:
+        return None
+    (rt_type_name, dtype) = fabric_type
+    try:
+        selection = rt_stage.SelectPrims(
+            require_attrs=[
+                (
+                    getattr(RtSdf.ValueTypeNames, rt_type_name),
+                    attr_name,
+                    RtUsd.Access.Read,
+                )
+            ],
+            device="cpu",
+        )
+        attrib = selection.__fabric_arrays_interface__["attribs"][attr_name]
+        selected_paths = _to_path_strings(selection.GetPaths())
+        selected_values = np.concatenate(
+            [np.empty(0, dtype=np.float64)]
+            + [
+                _read_fabric_array(pointer, count, dtype)
+                for (pointer, count) in zip(attrib["pointers"], attrib["counts"])
+            ]
+        )
+    except Exception as e:
+        carb.log_warn("Can't select {} in Fabric: {}".format(attr_name, e))
+        return None
+    if len(selected_values) != len(selected_paths):
+        carb.log_warn("The Fabric selection of {} is inconsistent".format(attr_name))
+        return None
+
+    # The selection holds every prim with the attribute, in bucket order
+    values = np.full(len(paths), np.nan, dtype=np.float64)
+    valid = np.zeros(len(paths), dtype=bool)
+    order = np.argsort(selected_paths)
+    positions = np.searchsorted(selected_paths[order], twin_paths)
+    positions[positions == len(order)] = 0
+    if len(order) > 0:
+        valid = selected_paths[order[positions]] == twin_paths
+        values[valid] = selected_values[order[positions[valid]]]
+    missing = np.flatnonzero(~valid)
+    if len(missing) > 0:
+        (missing_values, missing_valid) = _to_array(
+            _read_values(rt_stage, stage, [paths[i] for i in missing], attr_name)
+        )
+        if missing_values.dtype != np.float64:
+            return None
+        values[missing] = missing_values
+        valid[missing] = missing_valid
+    return (values, valid)
+
+
+def _read_fabric_array(pointer: int, count: int, dtype) -> np.ndarray:
+    """Copy the values of a Fabric bucket, the array is only valid until Fabric changes"""
+    if count == 0:
+        return np.empty(0, dtype=np.float64)
+    size = count * np.dtype(dtype).itemsize
+    buffer = (ctypes.c_char * size).from_address(pointer)
+    return np.frombuffer(buffer, dtype=dtype, count=count).astype(np.float64)
+
+
+def _get_type_name(stage: Usd.Stage, paths: list[Sdf.Path], attr_name: str) -> str:
+    """Get the USD type name of the attribute, from the first twin that has it"""
+    get_attr = stage.GetAttributeAtPath
+    for prim_path in paths:
+        attr = get_attr(prim_path.AppendProperty(attr_name))
+        if attr:
+            return str(attr.GetTypeName())
+    return None
+
+
+def _read_values(
+    rt_stage, stage: Usd.Stage, paths: list[Sdf.Path], attr_name: str
+) -> list:
+    """
+    Read the attribute of every path, None if the prim doesn't have a value. The values are read
+    from Fabric if there's a USDRT stage, otherwise from USD.
+
+    NOTE: This loops over the twins in Python, one attribute lookup per twin. The attribute paths
+          are resolved directly, without getting the prims first.
+    """
+    if rt_stage is not None:
+        get_rt_attr = rt_stage.GetAttributeAtPath
+        suffix = "." + attr_name
+        values = []
+        for prim_path in paths:
+            attr = get_rt_attr(str(prim_path) + suffix)
+            values.append(attr.Get() if attr and attr.HasValue() else None)
+        return values
+    get_attr = stage.GetAttributeAtPath
+    values = []
+    for prim_path in paths:
+        attr = get_attr(prim_path.AppendProperty(attr_name))
+        values.append(attr.Get() if attr else None)
+    return values
+
+
+def _get_rt_stage(stage: Usd.Stage):
+    """Get the USDRT stage of the stage, only the stage of the USD context is in Fabric"""
+    if RtUsd is None:
+        return None
+    usd_context = omni.usd.get_context()
+    if stage != usd_context.get_stage():
+        return None
+    try:
+        return RtUsd.Stage.Attach(usd_context.get_stage_id())
+    except Exception as e:
+        carb.log_warn("Can't attach USDRT to the stage, reading from USD: {}".format(e))
+        return None
+
+
+def _to_array(raw_values: list) -> tuple[np.ndarray, np.ndarray]:
+    valid = np.fromiter(
+        (v is not None for v in raw_values), dtype=bool, count=len(raw_values)
+    )
+    numeric = all(
+        isinstance(v, (bool, int, float)) for v in raw_values if v is not None
+    )
+    if numeric:
+        values = np.fromiter(
+            (np.nan if v is None else v for v in raw_values),
+            dtype=np.float64,
+            count=len(raw_values),
+        )
+    else:
+        values = np.empty(len(raw_values), dtype=object)
+        values[:] = raw_values
+    return (values, valid)
+
+
+def group_by_ancestor(paths: Iterable[Sdf.Path], depth: int) -> np.ndarray:
+    """
+    Group keys for aggregate_dtdl_values: the path of the ancestor of every prim at the given
+    depth, e.g. with depth 2 the twins under /World/Floor1 are grouped by "/World/Floor1". Prims
+    that aren't as deep are their own group. paths is a NumPy string array (e.g. the path_strings
+    of a query result) or a list of paths.
+    """
+    if depth < 1:
+        raise ValueError("The depth of the ancestors has to be at least 1")
+    if not isinstance(paths, np.ndarray) or paths.dtype.kind != "U":
+        paths = _to_path_strings(paths)
+    if len(paths) == 0:
+        return paths
+    # Cut every path at its (depth + 1)th "/" on a character array of all paths, the characters
+    # after the end of a path are empty, so shorter paths are left as they are
+    chars = np.ascontiguousarray(paths).view("U1").reshape(len(paths), -1).copy()
+    chars[np.cumsum(chars == "/", axis=1, dtype=np.int32) > depth] = ""
+    return chars.view(paths.dtype).reshape(len(paths))
+
+
+def aggregate_dtdl_values(
+    result: DtdlBulkQueryResult,
+    group_keys: np.ndarray = None,
+    reductions: Iterable[str] = ("min", "max", "mean", "count"),
+) -> dict[str, np.ndarray]:
+    """
+    Reduce the numeric values of a query per group. group_keys has a key for every path of the
+    result (e.g. from group_by_ancestor), without keys all values are in a single group.
+    Twins without a value are skipped. Returns the sorted groups as "group" and an array with a
+    value per group for every reduction.
+    """
+    reductions = list(reductions)
+    unsupported = [r for r in reductions if r not in REDUCTIONS]
+    if len(unsupported) > 0:
+        raise ValueError("Unsupported reductions: {}".format(", ".join(unsupported)))
+    if result.values.dtype != np.float64:
+        raise ValueError("{} isn't a numeric attribute".format(result.attr_name))
+    values = result.values[result.valid]
+    if group_keys is None:
+        group_keys = np.zeros(len(result), dtype=np.int64)
+    (groups, inverse) = np.unique(
+        np.asarray(group_keys)[result.valid], return_inverse=True
+    )
+    count = np.bincount(inverse, minlength=len(groups))
+    aggregates = {"group": groups}
+    if len(values) > 0 and ("min" in reductions or "max" in reductions):
+        # Sort the values by group, every group is a contiguous slice that reduceat can reduce
+        order = np.argsort(inverse, kind="stable")
+        sorted_values = values[order]
+        starts = np.concatenate(([0], np.cumsum(count)[:-1]))
+    for reduction in reductions:
+        if reduction == "count":
+            aggregates["count"] = count
+        elif reduction == "sum" or reduction == "mean":
+            total = np.bincount(inverse, weights=values, minlength=len(groups))
+            aggregates[reduction] = total if reduction == "sum" else total / count
+        elif len(values) == 0:
+            aggregates[reduction] = np.empty(0, dtype=np.float64)
+        elif reduction == "min":
+            aggregates["min"] = np.minimum.reduceat(sorted_values, starts)
+        elif reduction == "max":
+            aggregates["max"] = np.maximum.reduceat(sorted_values, starts)
+    return aggregates
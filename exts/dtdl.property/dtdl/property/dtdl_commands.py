@@ -0,0 +1,42 @@
+import omni.kit.commands
+import omni.usd
+from pxr import Sdf
+
+ALLOWED_TOKENS_KEY = "allowedTokens"
+
+
+class ClearDtdlAllowedTokensCommand(omni.kit.commands.Command):
+    """
+    Clear the allowedTokens metadata of an attribute, e.g. the model ids that older versions of the
+    widget wrote to the model id attribute. Undo restores the tokens.
+
+    Args:
+        attr_path (Sdf.Path): Path of the attribute.
+        usd_context_name (str): Name of the usd context, the default context if empty.
+    """
+
+    def __init__(self, attr_path: Sdf.Path, usd_context_name: str = ""):
+        self._attr_path = Sdf.Path(attr_path)
+        self._usd_context_name = usd_context_name
+        self._previous_tokens = None
+
+    def _get_attribute(self):
+        stage = omni.usd.get_context(self._usd_context_name).get_stage()
+        return stage.GetAttributeAtPath(self._attr_path) if stage else None
+
+    def do(self):
+        attr = self._get_attribute()
+        if not attr or not attr.HasAuthoredMetadata(ALLOWED_TOKENS_KEY):
+            return
+        self._previous_tokens = attr.GetMetadata(ALLOWED_TOKENS_KEY)
+        attr.ClearMetadata(ALLOWED_TOKENS_KEY)
+
+    def undo(self):
+        attr = self._get_attribute()
+        if not attr or self._previous_tokens is None:
+            return
+        attr.SetMetadata(ALLOWED_TOKENS_KEY, self._previous_tokens)
+        self._previous_tokens = None
+
+
+omni.kit.commands.register_all_commands_in_module(__name__)
@@ -0,0 +1,240 @@
+import threading
+from collections import ChainMap, OrderedDict
+from collections.abc import Mapping
+from typing import Iterable, Iterator
+from dtdl.compiler import DtdlBundleModel, compact_dtdl_model, get_dtdl_model_bases
+from .dtdl_model_modelrepo import DtdlExtendedModelData
+
+
+class DtdlModelCacheStats:
+    """
+    Hit, miss and eviction counters of a DtdlModelCache. The counters are shared by the copies of
+    a cache, which can be used on different threads, so they have their own lock.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def count(self, hits: int = 0, misses: int = 0, evictions: int = 0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def __repr__(self):
+        with self._lock:
+            (hits, misses, evictions) = (self.hits, self.misses, self.evictions)
+        lookups = hits + misses
+        return "hits={} misses={} evictions={} hit_rate={:.2f}".format(
+            hits, misses, evictions, hits / lookups if lookups > 0 else 0.0
+        )
+
+
+class DtdlModelCache(Mapping):
+    """
+    Model repository that keeps a compact index of the raw interfaces and a bounded LRU cache of
+    the extended (flattened) model data. Extended model data is computed from the raw index on a
+    cache miss. The cache is bounded by the number of entries and, optionally, by the total
+    number of flattened contents. A bound of 0 means unbounded.
+    Read-only sources of interfaces, e.g. model bundles, can be passed as well. Models that are
+    added to the cache take precedence over the sources, and earlier sources take precedence over
+    later ones. Interfaces of a bundle use the pre-flattened interface when none of their bases
+    are overridden.
+    The LRU state is guarded by a lock, so a cache can be read on the main thread while it is
+    copied on another thread (e.g. to build the next snapshot). The cache of a published snapshot
+    is read-only (see set_read_only), its copies are not.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_contents: int = 0,
+        sources: list[Mapping] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_contents = max_contents
+        self.stats = DtdlModelCacheStats()
+        # Compact raw interfaces, by model id. Added models go in the first map.
+        self._raw_index = ChainMap({}, *(sources or []))
+        # Extended model data in least to most recently used order
+        self._cache: OrderedDict[str, DtdlExtendedModelData] = OrderedDict()
+        self._cached_contents = 0
+        # Guards the cached model data and the contents count
+        self._lock = threading.Lock()
+        self._read_only = False
+
+    @property
+    def raw_index(self) -> Mapping[str, object]:
+        """The compact raw interfaces, by model id"""
+        return self._raw_index
+
+    def set_read_only(self):
+        """Don't allow adding models anymore, e.g. once the cache is published in a snapshot"""
+        self._read_only = True
+
+    def add_models(self, models: Iterable[object]):
+        """
+        Add (or replace) raw interfaces in the index. Cached model data that depends on any of
+        the added models is invalidated. Raises TypeError if the cache is read-only.
+        """
+        if self._read_only:
+            raise TypeError("The model cache is read-only, add the models to a copy")
+        model_ids = set()
+        for model in models:
+            self._raw_index[model["@id"]] = compact_dtdl_model(model)
+            model_ids.add(model["@id"])
+        self._invalidate(model_ids)
+
+    def copy(self) -> "DtdlModelCache":
+        """
+        Create a new cache with the same raw index and cached model data. Adding models to the
+        copy doesn't affect the original.
+        """
+        model_cache = DtdlModelCache(self.max_entries, self.max_contents)
+        model_cache.stats = self.stats
+        model_cache._raw_index = ChainMap(
+            dict(self._raw_index.maps[0]), *self._raw_index.maps[1:]
+        )
+        # The cached model data and its contents count are copied together
+        with self._lock:
+            model_cache._cache = OrderedDict(self._cache)
+            model_cache._cached_contents = self._cached_contents
+        return model_cache
+
+    def with_sources(
+        self, sources: list[Mapping], model_ids: Iterable[str]
+    ) -> "DtdlModelCache":
+        """
+        Create a copy of the cache with other sources, e.g. after one of the sources was reloaded.
+        model_ids are the interfaces that can be different in the new sources (e.g. the interfaces
+        of the reloaded source before and after the reload). Only the cached model data of the
+        interfaces that resolve to another interface and of the interfaces that extend them is
+        dropped, the rest is shared with this cache.
+        """
+        model_cache = self.copy()
+        model_cache._raw_index = ChainMap(model_cache._raw_index.maps[0], *sources)
+        changed = set(
+            model_id
+            for model_id in model_ids
+            if not _is_same_model(
+                self._raw_index.get(model_id), model_cache._raw_index.get(model_id)
+            )
+        )
+        model_cache._invalidate(changed)
+        return model_cache
+
+    def get_bases(self, model_id: str) -> list[str]:
+        """Get the ids of the models directly extended by the given model, without flattening it"""
+        return get_dtdl_model_bases(self._raw_index[model_id])
+
+    def __getitem__(self, model_id: str) -> DtdlExtendedModelData:
+        with self._lock:
+            model_data = self._cache.get(model_id)
+            if model_data is not None:
+                self._cache.move_to_end(model_id)
+        if model_data is not None:
+            self.stats.count(hits=1)
+            return model_data
+        # Raises KeyError for unknown models, like a regular dict
+        model = self._raw_index[model_id]
+        # The model data is computed without holding the lock
+        if self._can_use_flattened(model):
+            model_data = DtdlExtendedModelData.from_flattened(
+                model.bundle.get_flattened(model_id)
+            )
+        else:
+            model_data = DtdlExtendedModelData(model, self._raw_index)
+        self.stats.count(misses=1)
+        with self._lock:
+            if model_id not in self._cache:
+                self._cache[model_id] = model_data
+                self._cached_contents += _get_contents_count(model_data)
+                self._enforce_bounds()
+        return model_data
+
+    def __contains__(self, model_id) -> bool:
+        return model_id in self._raw_index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._raw_index)
+
+    def __len__(self) -> int:
+        return len(self._raw_index)
+
+    def _can_use_flattened(self, model: object) -> bool:
+        """
+        Checks if the pre-flattened interface of a bundle model can be used, i.e. all of its bases
+        still resolve to the same bundle
+        """
+        if not isinstance(model, DtdlBundleModel):
+            return False
+        bundle = model.bundle
+        for base in bundle.get_bases(model["@id"]):
+            resolved = self._raw_index.get(base)
+            if base in bundle:
+                if (
+                    not isinstance(resolved, DtdlBundleModel)
+                    or resolved.bundle is not bundle
+                ):
+                    return False
+            elif resolved is not None:
+                return False
+        return True
+
+    def _enforce_bounds(self):
+        """
+        Evict the least recently used entries until the cache is within its bounds, the lock
+        has to be held
+        """
+        # The most recently used entry is always kept
+        while len(self._cache) > 1 and (
+            (self.max_entries > 0 and len(self._cache) > self.max_entries)
+            or (self.max_contents > 0 and self._cached_contents > self.max_contents)
+        ):
+            self._evict(next(iter(self._cache)))
+            self.stats.count(evictions=1)
+
+    def _invalidate(self, model_ids: set[str]):
+        """Drop the cached model data of the given models and of the models that extend them"""
+        if len(model_ids) == 0:
+            return
+        with self._lock:
+            for model_id in list(self._cache.keys()):
+                model_data = self._cache[model_id]
+                if model_id in model_ids or not model_ids.isdisjoint(model_data.bases):
+                    self._evict(model_id)
+
+    def _evict(self, model_id: str):
+        model_data = self._cache.pop(model_id)
+        self._cached_contents -= _get_contents_count(model_data)
+
+
+def _is_same_model(old_model: object, new_model: object) -> bool:
+    """Checks if two raw interfaces are the same, bundle interfaces are created on every access"""
+    if old_model is new_model:
+        return True
+    return (
+        isinstance(old_model, DtdlBundleModel)
+        and isinstance(new_model, DtdlBundleModel)
+        and old_model["@id"] == new_model["@id"]
+        and (
+            old_model.bundle.version == new_model.bundle.version
+            or old_model.interface_hash == new_model.interface_hash
+        )
+    )
+
+
+def _get_contents_count(model_data: DtdlExtendedModelData) -> int:
+    return (
+        len(model_data.properties)
+        + len(model_data.telemetries)
+        + len(model_data.relationships)
+    )
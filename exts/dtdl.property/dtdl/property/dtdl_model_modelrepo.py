@@ -2,6 +2,7 @@ from abc import abstractmethod
 from pxr import Usd, Sdf
 from omni.kit.property.usd.custom_layout_helper import CustomLayoutProperty
 from omni.kit.property.usd.usd_property_widget import UsdPropertyUiEntry
+from dtdl.compiler import get_dtdl_model_bases
 
 
 class DtdlContent:
@@ -151,7 +152,7 @@ class DtdlExtendedModelData:
     properties (including those of the base models), telationships, ...
     """
 
-    def __init__(self, model: object, all_models: list[object]):
+    def __init__(self, model: object, all_models: dict[str, object]):
         self.model = model
         self.bases: list[str] = []
         self.properties: list[DtdlProperty] = []
@@ -159,29 +160,44 @@ class DtdlExtendedModelData:
         self.relationships: list[DtdlRelationship] = []
         self._add_model_contents_recursive(model["@id"], all_models)
 
+    @classmethod
+    def from_flattened(cls, flattened: object) -> "DtdlExtendedModelData":
+        """
+        Create the extended model data from an interface that was already flattened by the
+        compiler (e.g. from a model bundle), so the base models don't need to be visited
+        """
+        model_data = cls.__new__(cls)
+        model_data.model = flattened
+        model_data.bases = list(flattened["bases"])
+        model_data.properties = []
+        model_data.telemetries = []
+        model_data.relationships = []
+        model_data._add_contents(flattened["contents"])
+        return model_data
+
+    def _add_contents(self, contents: list[object]):
+        for c in contents:
+            if c["@type"] == "Property" or "Property" in c["@type"]:
+                self.properties.append(DtdlProperty(c))
+        for c in contents:
+            if c["@type"] == "Telemetry" or "Telemetry" in c["@type"]:
+                self.telemetries.append(DtdlTelemetry(c))
+        for c in contents:
+            if c["@type"] == "Relationship" or "Relationship" in c["@type"]:
+                self.relationships.append(DtdlRelationship(c))
+
     def _add_model_contents_recursive(
-        self, model_id: str, all_models: list[DtdlProperty]
+        self, model_id: str, all_models: dict[str, object]
     ):
-        model = next(m for m in all_models if m["@id"] == model_id)
+        # Bases that are not (yet) part of the repository are skipped
+        model = all_models.get(model_id)
+        if model is None:
+            return
         if "contents" in model:
-            if model["contents"] is object:
+            if isinstance(model["contents"], dict):
                 model["contents"] = [model["contents"]]
-            for c in model["contents"]:
-                if c["@type"] == "Property" or "Property" in c["@type"]:
-                    self.properties.append(DtdlProperty(c))
-            for c in model["contents"]:
-                if c["@type"] == "Telemetry" or "Telemetry" in c["@type"]:
-                    self.telemetries.append(DtdlTelemetry(c))
-            for c in model["contents"]:
-                if c["@type"] == "Relationship" or "Relationship" in c["@type"]:
-                    self.relationships.append(DtdlRelationship(c))
-        if "extends" in model:
-            if isinstance(model["extends"], list):
-                for base in model["extends"]:
-                    if base not in self.bases:
-                        self.bases.append(base)
-                    self._add_model_contents_recursive(base, all_models)
-            else:
-                if model["extends"] not in self.bases:
-                    self.bases.append(model["extends"])
-                self._add_model_contents_recursive(model["extends"], all_models)
+            self._add_contents(model["contents"])
+        for base in get_dtdl_model_bases(model):
+            if base not in self.bases:
+                self.bases.append(base)
+            self._add_model_contents_recursive(base, all_models)
@@ -0,0 +1,158 @@
+from typing import Callable
+import omni.ui as ui
+from .dtdl_model_snapshot import DtdlRepoSnapshot
+
+ROW_HEIGHT = 22
+# Number of rows that are built above and below the visible rows
+OVERSCAN_ROWS = 5
+
+
+class DtdlModelPickerWindow(ui.Window):
+    """
+    Window to pick a DTDL model. The models are searched by (part of) their model id or display
+    name and can be filtered to the subtypes of a model. The result list is virtualized: only the
+    rows that are visible in the scrolling frame are built, so picking a model stays fast with
+    very large repositories. The search index is built off the main thread, the picker shows
+    that it's indexing until the index of its snapshot is ready.
+    """
+
+    def __init__(self, title: str = "Select DTDL Model"):
+        super().__init__(title, width=600, height=400, visible=False)
+        self._snapshot: DtdlRepoSnapshot = None
+        self._on_pick_fn: Callable[[str], None] = None
+        # Only the resolved models are in the snapshot when the models are resolved lazily
+        self._resolved_only = False
+        self._results: list[int] = []
+        self._first_row = 0
+        self._search_model = ui.SimpleStringModel()
+        self._search_model.add_value_changed_fn(lambda _: self._update_results())
+        self._extends_model = ui.SimpleStringModel()
+        self._extends_model.add_value_changed_fn(lambda _: self._update_results())
+        self._count_label: ui.Label = None
+        self._scrolling_frame: ui.ScrollingFrame = None
+        self._rows_frame: ui.Frame = None
+        self.frame.set_build_fn(self._build_ui)
+
+    def destroy(self):
+        self._on_pick_fn = None
+        self._snapshot = None
+        super().destroy()
+
+    def show(
+        self,
+        snapshot: DtdlRepoSnapshot,
+        on_pick_fn: Callable[[str], None],
+        extends: str = "",
+        resolved_only: bool = False,
+    ):
+        """
+        Show the picker for the models in the given snapshot. on_pick_fn is called with the model
+        id of the picked model. If extends is set, only that model and its subtypes are shown.
+        resolved_only tells the user that the snapshot only has the models that were resolved so
+        far, other models are resolved by typing their DTMI in the model id field.
+        """
+        self._snapshot = snapshot
+        self._on_pick_fn = on_pick_fn
+        self._resolved_only = resolved_only
+        self._extends_model.set_value(extends)
+        self._update_results()
+        self.visible = True
+        self.focus()
+
+    def on_search_index_built(self, snapshot: DtdlRepoSnapshot):
+        """
+        Called when the search index of a snapshot is built. The picker switches to that
+        snapshot if it's newer than the snapshot it shows.
+        """
+        if self._snapshot is None or snapshot.version < self._snapshot.version:
+            return
+        self._snapshot = snapshot
+        if self.visible:
+            self._update_results()
+
+    def _build_ui(self):
+        with ui.VStack(spacing=4):
+            with ui.HStack(height=0, spacing=4):
+                ui.Label("Search", width=50)
+                ui.StringField(model=self._search_model)
+            with ui.HStack(height=0, spacing=4):
+                ui.Label("Extends", width=50)
+                ui.StringField(model=self._extends_model)
+            self._count_label = ui.Label("", height=0)
+            self._scrolling_frame = ui.ScrollingFrame(
+                horizontal_scrollbar_policy=ui.ScrollBarPolicy.SCROLLBAR_ALWAYS_OFF,
+                vertical_scrollbar_policy=ui.ScrollBarPolicy.SCROLLBAR_ALWAYS_ON,
+            )
+            self._scrolling_frame.set_scroll_y_changed_fn(self._on_scroll)
+            with self._scrolling_frame:
+                self._rows_frame = ui.Frame(build_fn=self._build_rows)
+        self._update_results()
+
+    def _update_results(self):
+        """Search the models and rebuild the visible rows"""
+        search_index = self._snapshot.search_index if self._snapshot else None
+        if search_index is None:
+            self._results = []
+        else:
+            extends = self._extends_model.get_value_as_string().strip()
+            model_ids = (
+                self._snapshot.subtypes.get(extends, frozenset())
+                if extends != ""
+                else None
+            )
+            self._results = search_index.search(
+                self._search_model.get_value_as_string(), model_ids
+            )
+        if self._count_label is None:
+            return
+        if search_index is None:
+            # The index of a new snapshot is still being built on a worker thread
+            self._count_label.text = "Indexing models..."
+        else:
+            self._count_label.text = (
+                "{} resolved models; type a DTMI in the model id field to resolve other models"
+                if self._resolved_only
+                else "{} models"
+            ).format(len(self._results))
+        self._first_row = 0
+        self._scrolling_frame.scroll_y = 0
+        self._rows_frame.height = ui.Pixel(len(self._results) * ROW_HEIGHT)
+        self._rows_frame.rebuild()
+
+    def _get_visible_range(self) -> tuple[int, int]:
+        # The frame has no size yet before the first layout, the window height is an upper bound
+        height = self._scrolling_frame.computed_height or self.height
+        visible_rows = int(height / ROW_HEIGHT) + 1
+        first = max(0, self._first_row - OVERSCAN_ROWS)
+        last = min(len(self._results), self._first_row + visible_rows + OVERSCAN_ROWS)
+        return (first, last)
+
+    def _on_scroll(self, scroll_y: float):
+        first_row = int(scroll_y / ROW_HEIGHT)
+        # Only rebuild when rows outside of the overscan come into view
+        if abs(first_row - self._first_row) < OVERSCAN_ROWS:
+            return
+        self._first_row = first_row
+        self._rows_frame.rebuild()
+
+    def _build_rows(self):
+        """Build the visible rows, the rows before them are replaced by a single spacer"""
+        (first, last) = self._get_visible_range()
+        search_index = self._snapshot.search_index if self._snapshot else None
+        entries = search_index.entries if search_index is not None else []
+        with ui.VStack():
+            ui.Spacer(height=ui.Pixel(first * ROW_HEIGHT))
+            for i in self._results[first:last]:
+                (model_id, display_name) = entries[i]
+                ui.Button(
+                    "{}  ({})".format(display_name, model_id),
+                    height=ROW_HEIGHT,
+                    alignment=ui.Alignment.LEFT_CENTER,
+                    clicked_fn=lambda m=model_id: self._pick(m),
+                )
+            ui.Spacer()
+
+    def _pick(self, model_id: str):
+        self.visible = False
+        if self._on_pick_fn:
+            self._on_pick_fn(model_id)
@@ -0,0 +1,141 @@
+import json
+import time
+from os import path
+from typing import Iterable
+import carb
+import omni.client
+from dtdl.compiler import (
+    dtmi_to_path,
+    get_dtdl_interfaces,
+    get_dtdl_model_bases,
+    is_valid_dtmi,
+)
+from .dtdl_model_root import get_file_version
+
+# Seconds before a model id that could not be found is looked up again
+MISSING_MODEL_TTL = 30.0
+
+
+class DtdlModelResolver:
+    """
+    Resolves DTDL models on demand from folders that follow the DTDL model repository convention.
+    The folders are searched in precedence order, a model is read from the first folder that has
+    its file. Only the requested models and the models they extend are fetched. The resolver
+    keeps track of the resolved model ids and the version of their files, so each model is only
+    read again when its file changes (see refresh). Model ids that could not be found are retried
+    once they expire, but only reported once. The resolved models themselves are cached by the
+    model repository (see DtdlModelCache).
+    NOTE: The resolver reads from the repository synchronously, so it should not be called from
+          the main thread. Once a model is resolved, only its own file is watched: a file that is
+          added for it to a folder with a higher precedence is only read after a reload.
+    """
+
+    def __init__(self, repo_paths: list[str], missing_ttl: float = MISSING_MODEL_TTL):
+        self._repo_paths = repo_paths
+        self._missing_ttl = missing_ttl
+        # Model ids that have been resolved so far
+        self._resolved: set[str] = set()
+        # Version of every file that has been read, by file url
+        self._file_versions: dict[str, tuple] = {}
+        # Model ids that could not be found in the repository, with the time of the lookup
+        self._missing: dict[str, float] = {}
+        # Model ids that have been reported as missing, the retries aren't reported again
+        self._reported_missing: set[str] = set()
+
+    def clear(self):
+        """Forget the resolved models so they are fetched again on the next resolve"""
+        self._resolved = set()
+        self._file_versions = {}
+        self._missing = {}
+        self._reported_missing = set()
+
+    def resolve(self, model_ids: Iterable[str]) -> list[object]:
+        """
+        Resolve the given model ids and the closure of the models they extend. Returns the raw
+        interfaces that were newly fetched from the repository.
+        """
+        resolved: list[object] = []
+        pending = list(model_ids)
+        while len(pending) > 0:
+            model_id = pending.pop()
+            if model_id in self._resolved or self._is_missing(model_id):
+                continue
+            for model in self._fetch(model_id):
+                if model["@id"] in self._resolved:
+                    continue
+                self._resolved.add(model["@id"])
+                resolved.append(model)
+                pending.extend(get_dtdl_model_bases(model))
+            if model_id not in self._resolved:
+                self._missing[model_id] = time.monotonic()
+                self._reported_missing.add(model_id)
+            else:
+                self._reported_missing.discard(model_id)
+        return resolved
+
+    def refresh(self) -> list[object]:
+        """
+        Read the files of the resolved models again if they changed, and retry the model ids that
+        could not be found before and have expired. Returns the raw interfaces that were fetched,
+        including the models they extend that weren't resolved yet.
+        """
+        refreshed: list[object] = []
+        for file_url, version in list(self._file_versions.items()):
+            (result, list_entry) = omni.client.stat(file_url)
+            # Models of removed files are kept, they can still be used by the stage
+            if (
+                result != omni.client.Result.OK
+                or get_file_version(list_entry) == version
+            ):
+                continue
+            self._file_versions[file_url] = get_file_version(list_entry)
+            for model in self._read_file(file_url):
+                self._resolved.add(model["@id"])
+                refreshed.append(model)
+        pending = [b for model in refreshed for b in get_dtdl_model_bases(model)]
+        pending.extend(m for m in list(self._missing.keys()) if not self._is_missing(m))
+        return refreshed + self.resolve(pending)
+
+    def _is_missing(self, model_id: str) -> bool:
+        """Checks if the model id could not be found recently"""
+        missing_time = self._missing.get(model_id)
+        if missing_time is None:
+            return False
+        if time.monotonic() - missing_time < self._missing_ttl:
+            return True
+        del self._missing[model_id]
+        return False
+
+    def _fetch(self, model_id: str) -> list[object]:
+        """Fetch the interfaces defined in the file of the given model id"""
+        if not is_valid_dtmi(model_id):
+            return []
+        # A missing model is only reported once, its retries are logged at info level
+        log_fn = carb.log_info if model_id in self._reported_missing else carb.log_warn
+        model_path = dtmi_to_path(model_id)
+        for repo_path in self._repo_paths:
+            file_url = path.join(repo_path, model_path)
+            # The version is read first, a change during the read is picked up by the next refresh
+            (result, list_entry) = omni.client.stat(file_url)
+            if result == omni.client.Result.OK:
+                self._file_versions[file_url] = get_file_version(list_entry)
+                return self._read_file(file_url, log_fn)
+        log_fn(
+            "Could not resolve DTDL model {} at {} in {}".format(
+                model_id, model_path, ", ".join(self._repo_paths)
+            )
+        )
+        return []
+
+    def _read_file(self, file_url: str, log_fn=carb.log_warn) -> list[object]:
+        """Read the interfaces of a file, its version has to be tracked by the caller"""
+        (result, version, content) = omni.client.read_file(file_url)
+        if result != omni.client.Result.OK:
+            log_fn("Could not read DTDL model file {}: {}".format(file_url, result))
+            return []
+        try:
+            model_json = json.loads(memoryview(content).tobytes())
+        except ValueError:
+            log_fn("Invalid DTDL model file {}".format(file_url))
+            return []
+        return get_dtdl_interfaces(model_json)
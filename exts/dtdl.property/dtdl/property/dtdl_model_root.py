@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+from collections.abc import Mapping
+from os import path
+from typing import Callable
+import carb
+import omni.client
+from dtdl.compiler import (
+    DtdlModelBundle,
+    compact_dtdl_model,
+    get_dtdl_interfaces,
+    is_dtdl_bundle_path,
+)
+
+# Separator of the model roots in the roots setting
+ROOTS_SEPARATOR = ";"
+
+
+def get_dtdl_root_paths(dtdl_path: str, additional_roots: str) -> list[str]:
+    """
+    Get the paths of all model roots, from the highest to the lowest precedence: the DTDL path
+    first, followed by the additional roots (separated by ;) in the order they are listed
+    """
+    root_paths = []
+    for root_path in [dtdl_path or ""] + (additional_roots or "").split(
+        ROOTS_SEPARATOR
+    ):
+        root_path = root_path.strip()
+        if root_path != "" and root_path not in root_paths:
+            root_paths.append(root_path)
+    return root_paths
+
+
+class DtdlModelRoot:
+    """
+    A root with DTDL models: a folder (local or on Nucleus) or a model bundle. Every root has its
+    own file listing and keeps the compact interfaces of every file, so reloading a root only
+    reads the files that changed. The interfaces of the root are published as a new mapping on
+    every load (see models), which is used as a source of the model cache.
+    """
+
+    def __init__(self, root_path: str):
+        self.path = root_path
+        # Compact interfaces by model id, replaced (not modified) on every load
+        self.models: Mapping[str, object] = {}
+        # The file entries and the absolute paths to the files
+        self._file_list: list[omni.client.ListEntry] = []
+        self._file_urls: list[str] = []
+        # Compact interfaces of every file, with the version of the file they were read from
+        self._file_models: dict[str, tuple[tuple, list[object]]] = {}
+        self._watcher_thread: threading.Thread = None
+
+    def load(self) -> set[str]:
+        """
+        Load the models of the root, only the files that changed since the last load are read.
+        Returns the ids of the interfaces that can be different: the interfaces of the root before
+        and after the load.
+        """
+        (file_list, file_urls) = self._list_files()
+        previous_model_ids = set(self.models.keys())
+        if is_dtdl_bundle_path(self.path):
+            self.models = self._load_bundle(file_urls[0]) if file_urls else {}
+        else:
+            file_models = {}
+            models = {}
+            for list_entry, file_url in zip(file_list, file_urls):
+                version = get_file_version(list_entry)
+                cached = self._file_models.get(file_url)
+                if cached is None or cached[0] != version:
+                    cached = (version, self._read_file(file_url))
+                file_models[file_url] = cached
+                for model in cached[1]:
+                    models[model["@id"]] = model
+            self._file_models = file_models
+            self.models = models
+        (self._file_list, self._file_urls) = (file_list, file_urls)
+        return previous_model_ids | self.models.keys()
+
+    def has_changed(self) -> bool:
+        """Checks if files were added, removed or modified since the last load"""
+        (file_list, file_urls) = self._list_files()
+        # Files are compared by url, relative paths are only unique within their folder
+        previous_files = dict(zip(self._file_urls, self._file_list))
+        return set(file_urls) != previous_files.keys() or any(
+            get_file_version(list_entry) != get_file_version(previous_files[file_url])
+            for (file_url, list_entry) in zip(file_urls, file_list)
+        )
+
+    def start_watching(
+        self,
+        on_change_fn: Callable[["DtdlModelRoot"], None],
+        stop_event: threading.Event,
+    ):
+        """
+        Watch the root for changes by periodically listing its files in a separate thread.
+        on_change_fn is called on the watcher thread when the root changed.
+        """
+
+        def watch():
+            while not stop_event.wait(10):
+                # An error must not stop watching the root, the next change can fix it
+                try:
+                    if self.has_changed():
+                        on_change_fn(self)
+                except Exception as e:
+                    carb.log_error(
+                        "Failed to reload DTDL models from {}: {}".format(self.path, e)
+                    )
+
+        self._watcher_thread = threading.Thread(
+            target=watch, name="dtdl.property watcher {}".format(self.path)
+        )
+        self._watcher_thread.start()
+
+    def stop_watching(self):
+        """Wait for the watcher thread, the stop event has to be set first"""
+        if self._watcher_thread is not None and self._watcher_thread.is_alive():
+            self._watcher_thread.join()
+        self._watcher_thread = None
+
+    def _list_files(self) -> tuple[list[omni.client.ListEntry], list[str]]:
+        file_list: list[omni.client.ListEntry] = []
+        file_urls: list[str] = []
+
+        # The root can also be a single model bundle instead of a folder
+        if is_dtdl_bundle_path(self.path):
+            (result, list_entry) = omni.client.stat(self.path)
+            if result == omni.client.Result.OK:
+                file_list.append(list_entry)
+                file_urls.append(self.path)
+            return (file_list, file_urls)
+
+        def recursive_list_files(folder):
+            (result, entries) = omni.client.list(folder)
+            for list_entry in entries:
+                if (list_entry.flags & omni.client.ItemFlags.READABLE_FILE) and (
+                    list_entry.relative_path.endswith(".json")
+                ):
+                    file_list.append(list_entry)
+                    file_urls.append(path.join(folder, list_entry.relative_path))
+                elif list_entry.flags & omni.client.ItemFlags.CAN_HAVE_CHILDREN:
+                    recursive_list_files(path.join(folder, list_entry.relative_path))
+
+        recursive_list_files(self.path)
+        return (file_list, file_urls)
+
+    def _read_file(self, file_url: str) -> list[object]:
+        """Read the compact interfaces of a DTDL file, invalid files are skipped"""
+        (result, version, content) = omni.client.read_file(file_url)
+        if result != omni.client.Result.OK:
+            carb.log_warn("Can't read DTDL file {}: {}".format(file_url, result))
+            return []
+        try:
+            model_json = json.loads(memoryview(content).tobytes())
+        except ValueError as e:
+            carb.log_error("Invalid DTDL file {}: {}".format(file_url, e))
+            return []
+        return [compact_dtdl_model(m) for m in get_dtdl_interfaces(model_json)]
+
+    def _load_bundle(self, bundle_url: str) -> Mapping[str, object]:
+        """
+        Load a model bundle. Local bundles are memory mapped, other bundles (e.g. on Nucleus) are
+        read in a single request. Only the index is decoded, interfaces are decoded on demand.
+        NOTE: A mapped file can't be replaced on Windows, so bundles are always read there. This
+              way the compiler can still update a bundle that is loaded.
+        """
+        try:
+            if path.isfile(bundle_url) and os.name != "nt":
+                return DtdlModelBundle.open(bundle_url)
+            (result, version, content) = omni.client.read_file(bundle_url)
+            if result != omni.client.Result.OK:
+                carb.log_warn(
+                    "Can't read DTDL model bundle {}: {}".format(bundle_url, result)
+                )
+                return {}
+            return DtdlModelBundle(memoryview(content), bundle_url)
+        except (OSError, ValueError) as e:
+            carb.log_error("Invalid DTDL model bundle {}: {}".format(bundle_url, e))
+            return {}
+
+
+def get_file_version(list_entry: omni.client.ListEntry) -> tuple:
+    """Get the version of a listed file, to check if it changed since it was read"""
+    # The size catches changes within the resolution of the modified time
+    return (list_entry.modified_time, list_entry.size)
@@ -0,0 +1,93 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+
+def get_dtdl_model_display_name(model: object) -> str:
+    """Get the (english) display name of a raw DTDL interface, the model id if it has none"""
+    if "displayName" not in model:
+        return model["@id"]
+    display_name = model["displayName"]
+    if isinstance(display_name, dict):
+        return display_name["en"] if "en" in display_name else model["@id"]
+    return display_name
+
+
+def _get_trigrams(text: str) -> set[str]:
+    return set(text[i : i + 3] for i in range(len(text) - 2))
+
+
+class DtdlModelSearchIndex:
+    """
+    Search index over the model ids and display names of a model repository. Prefix matches are
+    found with a binary search over the sorted keys, substring matches through a trigram index.
+    The index is built once per repository snapshot, so searching doesn't depend on the number
+    of models in the repository but on the number of matches.
+    """
+
+    def __init__(self, raw_index: Mapping[str, object]):
+        # (model id, display name) of every model, sorted by model id
+        self.entries: list[tuple[str, str]] = sorted(
+            (model_id, get_dtdl_model_display_name(model))
+            for (model_id, model) in raw_index.items()
+        )
+        # Lower case text that is searched for every entry
+        self._texts: list[str] = []
+        # Sorted (lower case key, entry index) pairs for prefix search
+        self._keys: list[tuple[str, int]] = []
+        # Entry indices by trigram for substring search
+        self._trigrams: dict[str, array] = {}
+        for i, (model_id, display_name) in enumerate(self.entries):
+            keys = (model_id.lower(), display_name.lower())
+            text = "\n".join(keys)
+            self._texts.append(text)
+            for key in set(keys):
+                self._keys.append((key, i))
+            for trigram in _get_trigrams(text):
+                self._trigrams.setdefault(trigram, array("I")).append(i)
+        self._keys.sort()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, query: str, model_ids: frozenset[str] = None) -> list[int]:
+        """
+        Search the entries that contain the query in their model id or display name. Prefix
+        matches come first, followed by the other substring matches in model id order. Queries
+        shorter than 3 characters only return the prefix matches.
+        If model_ids is given, only those models are returned (e.g. the subtypes of a model).
+        Returns the indices of the matching entries.
+        """
+        query = query.strip().lower()
+        if query == "":
+            matches = range(len(self.entries))
+            if model_ids is None:
+                return list(matches)
+            return [i for i in matches if self.entries[i][0] in model_ids]
+
+        prefix_matches: list[int] = []
+        seen: set[int] = set()
+        start = bisect_left(self._keys, (query, -1))
+        for key, i in self._keys[start:]:
+            if not key.startswith(query):
+                break
+            if i not in seen:
+                seen.add(i)
+                prefix_matches.append(i)
+
+        # A query without trigrams would have to test every entry, it only matches prefixes
+        trigrams = _get_trigrams(query)
+        substring_matches: list[int] = []
+        if len(trigrams) > 0:
+            # Every match contains all trigrams of the query, so the shortest list is enough
+            candidates = min(
+                (self._trigrams.get(t, array("I")) for t in trigrams), key=len
+            )
+            substring_matches = [
+                i for i in candidates if i not in seen and query in self._texts[i]
+            ]
+
+        matches = prefix_matches + substring_matches
+        if model_ids is None:
+            return matches
+        return [i for i in matches if self.entries[i][0] in model_ids]
@@ -0,0 +1,183 @@
+from dtdl.compiler import DtdlBundleModel
+from .dtdl_model_cache import DtdlModelCache
+from .dtdl_model_search import DtdlModelSearchIndex
+
+
+class DtdlRepoSnapshot:
+    """
+    Immutable, versioned snapshot of the compiled model repository. A snapshot is built completely
+    before it is published, and its models are never added or removed afterwards. Publishing a new
+    snapshot is a single reference swap, so readers never block and never see a partially built
+    repository. The models of a snapshot are read-only: adding models raises TypeError, add them
+    to a copy of the models instead.
+
+    NOTE: The extended model data is still computed on demand by the model cache. The cache guards
+          its LRU state with a lock, so the next snapshot can be built from a published snapshot
+          on another thread while the main thread reads it.
+    """
+
+    __slots__ = (
+        "version",
+        "models",
+        "subtypes",
+        "_search_index",
+    )
+
+    def __init__(self, version: int, models: DtdlModelCache):
+        self.version = version
+        # Read-only, the next snapshot adds models to a copy (see DtdlModelCache.copy)
+        models.set_read_only()
+        self.models = models
+        # The model itself and all models that (directly or indirectly) extend it, by model id
+        self.subtypes: dict[str, frozenset[str]] = _get_subtype_closures(models)
+        # Built on a worker thread after the snapshot is published, see build_search_index
+        self._search_index: DtdlModelSearchIndex = None
+
+    @property
+    def search_index(self) -> DtdlModelSearchIndex:
+        """
+        Index to search models by model id or display name, used by the model picker. None until
+        the index is built.
+        """
+        return self._search_index
+
+    def build_search_index(self, reuse: DtdlModelSearchIndex = None):
+        """
+        Build the search index of the snapshot. This takes seconds for a large repository, so it
+        shouldn't be called on the main thread. The index of a previous snapshot can be reused
+        when the snapshots have the same models.
+        """
+        if self._search_index is not None:
+            return
+        search_index = (
+            reuse if reuse is not None else DtdlModelSearchIndex(self.models.raw_index)
+        )
+        object.__setattr__(self, "_search_index", search_index)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("DtdlRepoSnapshot is immutable")
+        super().__setattr__(name, value)
+
+
+class DtdlRepoDiff:
+    """
+    Difference between two snapshots of the model repository. Besides the added, removed and
+    changed interfaces, the diff has the affected interfaces: all interfaces whose extended model
+    data can be different, i.e. including the interfaces that extend a changed interface.
+    """
+
+    def __init__(
+        self,
+        added: frozenset[str] = frozenset(),
+        removed: frozenset[str] = frozenset(),
+        changed: dict[str, frozenset[str]] = None,
+        affected: frozenset[str] = frozenset(),
+    ):
+        self.added = added
+        self.removed = removed
+        # Changed interfaces with the names of their own contents that were added, removed or changed
+        self.changed: dict[str, frozenset[str]] = changed or {}
+        self.affected = affected
+
+    @classmethod
+    def compute(
+        cls, old: "DtdlRepoSnapshot", new: "DtdlRepoSnapshot"
+    ) -> "DtdlRepoDiff":
+        """Compute the difference between two snapshots"""
+        old_index = old.models.raw_index
+        new_index = new.models.raw_index
+        added = frozenset(m for m in new_index if m not in old_index)
+        removed = frozenset(m for m in old_index if m not in new_index)
+        changed = {}
+        for model_id in new_index:
+            if model_id in added:
+                continue
+            old_model = old_index[model_id]
+            new_model = new_index[model_id]
+            # Models are shared between snapshots when they didn't change
+            if old_model is new_model or _is_same_bundle_model(old_model, new_model):
+                continue
+            changed_contents = _get_changed_contents(old_model, new_model)
+            if changed_contents is not None:
+                changed[model_id] = changed_contents
+        affected = set()
+        for model_id in added | removed | changed.keys():
+            affected.update(old.subtypes.get(model_id, (model_id,)))
+            affected.update(new.subtypes.get(model_id, (model_id,)))
+        return cls(added, removed, changed, frozenset(affected))
+
+    def is_empty(self) -> bool:
+        return len(self.affected) == 0
+
+    def merge(self, other: "DtdlRepoDiff") -> "DtdlRepoDiff":
+        """Combine this diff with the diff of the next snapshot"""
+        changed = dict(self.changed)
+        for model_id, contents in other.changed.items():
+            changed[model_id] = changed.get(model_id, frozenset()) | contents
+        return DtdlRepoDiff(
+            self.added | other.added,
+            self.removed | other.removed,
+            changed,
+            self.affected | other.affected,
+        )
+
+    def __repr__(self):
+        return "added={} removed={} changed={} affected={}".format(
+            len(self.added), len(self.removed), len(self.changed), len(self.affected)
+        )
+
+
+def _is_same_bundle_model(old_model: object, new_model: object) -> bool:
+    """
+    Interfaces from the same version of a bundle, or with the same interface hash in a recompiled
+    bundle, are the same without decoding them
+    """
+    return (
+        isinstance(old_model, DtdlBundleModel)
+        and isinstance(new_model, DtdlBundleModel)
+        and (
+            old_model.bundle.version == new_model.bundle.version
+            or old_model.interface_hash == new_model.interface_hash
+        )
+    )
+
+
+def _get_changed_contents(old_model: object, new_model: object) -> frozenset[str]:
+    """
+    Get the names of the own contents that differ between two versions of an interface. Returns
+    None if the interfaces are the same.
+    """
+    old_contents = {c["name"]: c for c in old_model.get("contents", [])}
+    new_contents = {c["name"]: c for c in new_model.get("contents", [])}
+    changed_contents = frozenset(
+        name
+        for name in old_contents.keys() | new_contents.keys()
+        if old_contents.get(name) != new_contents.get(name)
+    )
+    if len(changed_contents) > 0:
+        return changed_contents
+    # Compare the rest of the interface (display name, extends, ...)
+    old_header = {k: old_model[k] for k in old_model if k != "contents"}
+    new_header = {k: new_model[k] for k in new_model if k != "contents"}
+    return None if old_header == new_header else frozenset()
+
+
+def _get_subtype_closures(models: DtdlModelCache) -> dict[str, frozenset[str]]:
+    """
+    Compute the subtype closure of every model, based on the bases in the raw index so no model
+    needs to be flattened
+    """
+    subtypes: dict[str, set[str]] = {model_id: {model_id} for model_id in models}
+    for model_id in models:
+        pending = list(models.get_bases(model_id))
+        visited = set()
+        while len(pending) > 0:
+            base = pending.pop()
+            if base in visited:
+                continue
+            visited.add(base)
+            subtypes.setdefault(base, {base}).add(model_id)
+            if base in models:
+                pending.extend(models.get_bases(base))
+    return {model_id: frozenset(ids) for (model_id, ids) in subtypes.items()}
@@ -1,3 +1,6 @@
+import asyncio
+from os import path
+import carb.settings
 import omni.ext
 import omni.kit.app
 from omni.kit.window.preferences import PERSISTENT_SETTINGS_PREFIX
@@ -8,17 +11,107 @@ DTDL_PATH_SETTING_ID = "dtdl_path"
 DTDL_PATH_SETTING = (
     PERSISTENT_SETTINGS_PREFIX + "/exts/dtdl.property/" + DTDL_PATH_SETTING_ID
 )
+DTDL_ROOTS_SETTING_ID = "dtdl_roots"
+DTDL_ROOTS_SETTING = (
+    PERSISTENT_SETTINGS_PREFIX + "/exts/dtdl.property/" + DTDL_ROOTS_SETTING_ID
+)
+DTDL_LAZY_RESOLVE_SETTING_ID = "dtdl_lazy_resolve"
+DTDL_LAZY_RESOLVE_SETTING = (
+    PERSISTENT_SETTINGS_PREFIX + "/exts/dtdl.property/" + DTDL_LAZY_RESOLVE_SETTING_ID
+)
+DTDL_MODEL_CACHE_SIZE_SETTING_ID = "dtdl_model_cache_size"
+DTDL_MODEL_CACHE_SIZE_SETTING = (
+    PERSISTENT_SETTINGS_PREFIX
+    + "/exts/dtdl.property/"
+    + DTDL_MODEL_CACHE_SIZE_SETTING_ID
+)
+DTDL_MODEL_CACHE_CONTENTS_SETTING_ID = "dtdl_model_cache_contents"
+DTDL_MODEL_CACHE_CONTENTS_SETTING = (
+    PERSISTENT_SETTINGS_PREFIX
+    + "/exts/dtdl.property/"
+    + DTDL_MODEL_CACHE_CONTENTS_SETTING_ID
+)
+DTDL_SYNC_ENABLED_SETTING_ID = "dtdl_sync_enabled"
+DTDL_SYNC_ENABLED_SETTING = (
+    PERSISTENT_SETTINGS_PREFIX + "/exts/dtdl.property/" + DTDL_SYNC_ENABLED_SETTING_ID
+)
+DTDL_SYNC_ENDPOINT_SETTING_ID = "dtdl_sync_endpoint"
+DTDL_SYNC_ENDPOINT_SETTING = (
+    PERSISTENT_SETTINGS_PREFIX + "/exts/dtdl.property/" + DTDL_SYNC_ENDPOINT_SETTING_ID
+)
+DTDL_SYNC_FLUSH_INTERVAL_SETTING_ID = "dtdl_sync_flush_interval"
+DTDL_SYNC_FLUSH_INTERVAL_SETTING = (
+    PERSISTENT_SETTINGS_PREFIX
+    + "/exts/dtdl.property/"
+    + DTDL_SYNC_FLUSH_INTERVAL_SETTING_ID
+)
+# Seconds the twin sync settings have to stay unchanged before they are applied, e.g. while the
+# endpoint is typed in the preferences
+SYNC_SETTINGS_DELAY = 1.0
+
+_extension_instance = None
+
+
+def get_twin_index():
+    """
+    Get the index of the twins in the current stage by model id (see DtdlTwinIndex), e.g. to find
+    all twins of a model including the twins of the models that extend it:
+
+        dtdl.property.get_twin_index().find_twins("dtmi:com:example:Room;1")
+
+    Returns None if the DTDL property widget isn't registered.
+    """
+    if _extension_instance is None or _extension_instance._widget is None:
+        return None
+    return _extension_instance._widget.twin_index
+
+
+def get_repo_snapshot():
+    """
+    Get the current snapshot of the model repository (see DtdlRepoSnapshot). The snapshot and its
+    models are read-only, use snapshot.models.copy() to get models that can be changed. Returns
+    None if the DTDL property widget isn't registered.
+    """
+    if _extension_instance is None or _extension_instance._widget is None:
+        return None
+    return _extension_instance._widget.snapshot
+
+
+def _get_sync_endpoint() -> str:
+    """Get the endpoint of the twin service, None if the twin sync isn't enabled"""
+    settings = carb.settings.get_settings()
+    endpoint = settings.get(DTDL_SYNC_ENDPOINT_SETTING)
+    if not settings.get(DTDL_SYNC_ENABLED_SETTING) or not endpoint:
+        return None
+    return endpoint
+
+
+def _get_sync_flush_interval() -> float:
+    return carb.settings.get_settings().get(DTDL_SYNC_FLUSH_INTERVAL_SETTING) or 0.5
 
 
 class DtdlPropertyExtension(omni.ext.IExt):
     def __init__(self):
         super().__init__()
         self._registered = False
+        self._widget = None
+        self._twin_sync = None
+        self._sync_setting_subs = []
+        self._sync_settings_task: asyncio.Future = None
+        self._main_loop: asyncio.AbstractEventLoop = None
         # self._menu_items = []
         self._model_repo: dict[str, DtdlExtendedModelData] = {}
 
     def on_startup(self, ext_id):
+        global _extension_instance
+        _extension_instance = self
+        # The defaults are needed by the widget, the preferences page is registered later
+        self._set_default_settings()
         self._register_widget()
+        # The settings can change on any thread, the twin sync settings are applied on this loop
+        self._main_loop = asyncio.get_event_loop()
+        self._subscribe_sync_settings()
+        self._start_twin_sync()
         # self._register_add_menus()
 
         self._preferences = None
@@ -35,12 +128,103 @@ class DtdlPropertyExtension(omni.ext.IExt):
         )
 
     def on_shutdown(self):
+        global _extension_instance
+        _extension_instance = None
         # self._unregister_add_menus()
         self._hooks = None
+        settings = carb.settings.get_settings()
+        for sub in self._sync_setting_subs:
+            settings.unsubscribe_to_change_events(sub)
+        self._sync_setting_subs = []
+        if self._sync_settings_task is not None:
+            self._sync_settings_task.cancel()
+            self._sync_settings_task = None
+        self._stop_twin_sync()
         if self._registered:
             self._unregister_widget()
         self._unregister_preferences()
 
+    def _set_default_settings(self):
+        """Setup default value for the extension settings"""
+        settings = carb.settings.get_settings()
+        manager = omni.kit.app.get_app().get_extension_manager()
+        ext_path = path.normpath(manager.get_extension_path_by_module("dtdl.property"))
+        dtdl_path = path.join(ext_path, "data")
+        settings.set_default_string(DTDL_PATH_SETTING, dtdl_path)
+        settings.set_default_string(DTDL_ROOTS_SETTING, "")
+        settings.set_default_bool(DTDL_LAZY_RESOLVE_SETTING, False)
+        settings.set_default_int(DTDL_MODEL_CACHE_SIZE_SETTING, 1000)
+        settings.set_default_int(DTDL_MODEL_CACHE_CONTENTS_SETTING, 0)
+        settings.set_default_bool(DTDL_SYNC_ENABLED_SETTING, False)
+        settings.set_default_string(DTDL_SYNC_ENDPOINT_SETTING, "")
+        settings.set_default_float(DTDL_SYNC_FLUSH_INTERVAL_SETTING, 0.5)
+
+        current_dtdl_path = settings.get_as_string(DTDL_PATH_SETTING)
+        if current_dtdl_path is not None and current_dtdl_path != "":
+            return
+        settings.set_string(DTDL_PATH_SETTING, dtdl_path)
+
+    def _subscribe_sync_settings(self):
+        """Apply the twin sync settings once they stop changing, see _apply_sync_settings"""
+
+        def on_change(item, event_type):
+            self._main_loop.call_soon_threadsafe(self._schedule_sync_settings)
+
+        settings = carb.settings.get_settings()
+        self._sync_setting_subs = [
+            settings.subscribe_to_node_change_events(setting, on_change)
+            for setting in (
+                DTDL_SYNC_ENABLED_SETTING,
+                DTDL_SYNC_ENDPOINT_SETTING,
+                DTDL_SYNC_FLUSH_INTERVAL_SETTING,
+            )
+        ]
+
+    def _schedule_sync_settings(self):
+        """Called on the main loop after a change, restarts the delay of the pending change"""
+        if self._sync_settings_task is not None:
+            self._sync_settings_task.cancel()
+            self._sync_settings_task = None
+        # The extension was shut down after the change
+        if len(self._sync_setting_subs) == 0:
+            return
+        self._sync_settings_task = self._main_loop.create_task(
+            self._apply_sync_settings_later()
+        )
+
+    async def _apply_sync_settings_later(self):
+        await asyncio.sleep(SYNC_SETTINGS_DELAY)
+        self._sync_settings_task = None
+        self._apply_sync_settings()
+
+    def _apply_sync_settings(self):
+        """
+        Restart the twin sync when it's enabled, disabled or its endpoint changes. Stopping waits
+        for the pending patches, so a new flush interval is applied to the running sync instead.
+        """
+        endpoint = _get_sync_endpoint()
+        current_endpoint = self._twin_sync.endpoint if self._twin_sync else None
+        if endpoint != current_endpoint:
+            self._stop_twin_sync()
+            self._start_twin_sync()
+        elif self._twin_sync is not None:
+            self._twin_sync.set_flush_interval(_get_sync_flush_interval())
+
+    def _start_twin_sync(self):
+        """Start writing DTDL property edits back to the twin service, if it is enabled"""
+        from .dtdl_twin_sync import DtdlTwinSync
+
+        endpoint = _get_sync_endpoint()
+        if endpoint is None:
+            return
+        self._twin_sync = DtdlTwinSync(endpoint, _get_sync_flush_interval())
+        self._twin_sync.start()
+
+    def _stop_twin_sync(self):
+        if self._twin_sync is not None:
+            self._twin_sync.stop()
+            self._twin_sync = None
+
     def _register_widget(self):
         """Register property widget with property window."""
         import omni.kit.window.property as property_window_ext
@@ -49,9 +233,8 @@ class DtdlPropertyExtension(omni.ext.IExt):
         property_window = property_window_ext.get_window()
         if property_window:
             # register DtdlAttributeWidget class with property window.
-            property_window.register_widget(
-                "prim", "dtdl_properties", DtdlAttributeWidget()
-            )
+            self._widget = DtdlAttributeWidget()
+            property_window.register_widget("prim", "dtdl_properties", self._widget)
             self._registered = True
             # ordering of property widget is controlled by omni.kit.property.bundle
 
@@ -63,6 +246,7 @@ class DtdlPropertyExtension(omni.ext.IExt):
         if property_window:
             # remove ExampleAttributeWidget class with property window
             property_window.unregister_widget("prim", "dtdl_properties")
+            self._widget = None
             self._registered = False
 
     def _register_preferences(self):
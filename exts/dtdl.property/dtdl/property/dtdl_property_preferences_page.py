@@ -1,10 +1,27 @@
 from typing import Callable
 import carb.settings
 import omni.ui as ui
-import omni.kit.app
 from os import path
 from omni.kit.window.preferences import PreferenceBuilder, SettingType
-from .dtdl_property_extension import DTDL_PATH_SETTING, DTDL_PATH_SETTING_ID
+from dtdl.compiler import BUNDLE_EXTENSION, is_dtdl_bundle_path
+from .dtdl_property_extension import (
+    DTDL_PATH_SETTING,
+    DTDL_PATH_SETTING_ID,
+    DTDL_ROOTS_SETTING,
+    DTDL_ROOTS_SETTING_ID,
+    DTDL_LAZY_RESOLVE_SETTING,
+    DTDL_LAZY_RESOLVE_SETTING_ID,
+    DTDL_MODEL_CACHE_SIZE_SETTING,
+    DTDL_MODEL_CACHE_SIZE_SETTING_ID,
+    DTDL_MODEL_CACHE_CONTENTS_SETTING,
+    DTDL_MODEL_CACHE_CONTENTS_SETTING_ID,
+    DTDL_SYNC_ENABLED_SETTING,
+    DTDL_SYNC_ENABLED_SETTING_ID,
+    DTDL_SYNC_ENDPOINT_SETTING,
+    DTDL_SYNC_ENDPOINT_SETTING_ID,
+    DTDL_SYNC_FLUSH_INTERVAL_SETTING,
+    DTDL_SYNC_FLUSH_INTERVAL_SETTING_ID,
+)
 
 
 class DtdlPropertyPreferences(PreferenceBuilder):
@@ -13,7 +30,6 @@ class DtdlPropertyPreferences(PreferenceBuilder):
     def __init__(self):
         super().__init__("Property Widgets")
         self._settings = carb.settings.get_settings()
-        self._set_default_settings()
         self._dtdl_path_setting_widget = None
 
     def build(self):
@@ -22,25 +38,60 @@ class DtdlPropertyPreferences(PreferenceBuilder):
             with self.add_frame("DTDL Properties"):
                 with ui.VStack():
                     self._dtdl_path_setting_widget = self.create_setting_widget(
-                        "Path to DTDL models\n\n",
+                        "Path to DTDL models (folder or .dtdlbundle)\n\n",
                         DTDL_PATH_SETTING,
                         SettingType.STRING,
                         clicked_fn=self._on_browse_button_fn,
                     )
                     self._dtdl_path_setting_widget.identifier = DTDL_PATH_SETTING_ID
-
-    def _set_default_settings(self):
-        """Setup default value for the extension settings"""
-        manager = omni.kit.app.get_app().get_extension_manager()
-        manager.get_extension_dict
-        ext_path = path.normpath(manager.get_extension_path_by_module("dtdl.property"))
-        self.dtdl_path = path.join(ext_path, "data")
-        self._settings.set_default_string(DTDL_PATH_SETTING, self.dtdl_path)
-
-        current_dtdl_path = self._settings.get_as_string(DTDL_PATH_SETTING)
-        if current_dtdl_path is not None and current_dtdl_path != "":
-            return
-        self._settings.set_string(DTDL_PATH_SETTING, self.dtdl_path)
+                    roots_widget = self.create_setting_widget(
+                        "Additional model roots, lower precedence (separated by ;)",
+                        DTDL_ROOTS_SETTING,
+                        SettingType.STRING,
+                    )
+                    roots_widget.identifier = DTDL_ROOTS_SETTING_ID
+                    lazy_resolve_widget = self.create_setting_widget(
+                        "Resolve models lazily from all roots (model repository layout, no bundles)",
+                        DTDL_LAZY_RESOLVE_SETTING,
+                        SettingType.BOOL,
+                    )
+                    lazy_resolve_widget.identifier = DTDL_LAZY_RESOLVE_SETTING_ID
+                    cache_size_widget = self.create_setting_widget(
+                        "Cached models (0 = unbounded)",
+                        DTDL_MODEL_CACHE_SIZE_SETTING,
+                        SettingType.INT,
+                    )
+                    cache_size_widget.identifier = DTDL_MODEL_CACHE_SIZE_SETTING_ID
+                    cache_contents_widget = self.create_setting_widget(
+                        "Cached model contents (0 = unbounded)",
+                        DTDL_MODEL_CACHE_CONTENTS_SETTING,
+                        SettingType.INT,
+                    )
+                    cache_contents_widget.identifier = (
+                        DTDL_MODEL_CACHE_CONTENTS_SETTING_ID
+                    )
+            with self.add_frame("DTDL Twin Sync"):
+                with ui.VStack():
+                    sync_enabled_widget = self.create_setting_widget(
+                        "Write property edits to the twin service",
+                        DTDL_SYNC_ENABLED_SETTING,
+                        SettingType.BOOL,
+                    )
+                    sync_enabled_widget.identifier = DTDL_SYNC_ENABLED_SETTING_ID
+                    sync_endpoint_widget = self.create_setting_widget(
+                        "Twin service endpoint (e.g. http://localhost:8080)",
+                        DTDL_SYNC_ENDPOINT_SETTING,
+                        SettingType.STRING,
+                    )
+                    sync_endpoint_widget.identifier = DTDL_SYNC_ENDPOINT_SETTING_ID
+                    flush_interval_widget = self.create_setting_widget(
+                        "Send edits every (seconds)",
+                        DTDL_SYNC_FLUSH_INTERVAL_SETTING,
+                        SettingType.FLOAT,
+                    )
+                    flush_interval_widget.identifier = (
+                        DTDL_SYNC_FLUSH_INTERVAL_SETTING_ID
+                    )
 
     def _on_browse_button_fn(self, owner):
         """Called when the user picks the Browse button."""
@@ -53,19 +104,25 @@ class DtdlPropertyPreferences(PreferenceBuilder):
             dirname = dirname.strip()
             if dirname and not dirname.endswith("/"):
                 dirname += "/"
+            # Either a folder or a model bundle can be selected
             fullpath = f"{dirname}"
+            if is_dtdl_bundle_path(filename):
+                fullpath += filename
             if click_fn:
                 click_fn(fullpath)
 
         file_importer = get_file_importer()
         if file_importer:
             file_importer.show_window(
-                title="Select Folder",
+                title="Select Folder or Model Bundle",
                 import_button_label="Select",
                 import_handler=partial(on_import, self._on_file_pick),
                 filename_url=path,
-                file_extension_types=[("All Folders(*)", "")],
-                show_only_folders=True,
+                file_extension_types=[
+                    ("*" + BUNDLE_EXTENSION, "DTDL model bundles"),
+                    ("All Folders(*)", ""),
+                ],
+                show_only_folders=False,
             )
 
     def _on_file_pick(self, full_path):
@@ -0,0 +1,174 @@
+from typing import Iterable
+from pxr import Usd, Sdf, Tf
+from .dtdl_property_extension import MODEL_ID_ATTR_NAME
+
+
+class DtdlTwinIndex:
+    """
+    Index of the prims (twins) in a stage that have the dtdl:modelId attribute, by model id.
+    Combined with the subtype closure of every model, this allows finding all twins of a model,
+    including the twins of the models that extend it, without traversing the stage.
+    The index is kept up to date with USD notices and with the subtypes of new repository
+    snapshots.
+    """
+
+    def __init__(self):
+        self._stage: Usd.Stage = None
+        self._listener = None
+        self._paths_by_model: dict[str, set[Sdf.Path]] = {}
+        self._model_by_path: dict[Sdf.Path, str] = {}
+        # Child paths that lead to twins by parent path, so the twins of a subtree are found
+        # without scanning the whole index
+        self._children: dict[Sdf.Path, set[Sdf.Path]] = {}
+        self._subtypes: dict[str, frozenset[str]] = {}
+        # Results of find_twins, cleared whenever the index or the subtypes change
+        self._query_cache: dict[tuple[str, bool], frozenset[Sdf.Path]] = {}
+
+    def attach(self, stage: Usd.Stage):
+        """Index all twins in the stage and keep the index up to date with its changes"""
+        self.detach()
+        if not stage:
+            return
+        self._stage = stage
+        self._index_subtree(stage.GetPseudoRoot())
+        self._listener = Tf.Notice.Register(
+            Usd.Notice.ObjectsChanged, self._on_objects_changed, stage
+        )
+
+    def detach(self):
+        """Stop listening to the stage and clear the index"""
+        if self._listener:
+            self._listener.Revoke()
+            self._listener = None
+        self._stage = None
+        self._paths_by_model = {}
+        self._model_by_path = {}
+        self._children = {}
+        self._query_cache = {}
+
+    def set_subtypes(self, subtypes: dict[str, frozenset[str]]):
+        """Set the subtype closure of every model, e.g. when a new snapshot is published"""
+        self._subtypes = subtypes
+        self._query_cache = {}
+
+    @property
+    def model_ids(self) -> Iterable[str]:
+        """All model ids that are used by at least one twin"""
+        return self._paths_by_model.keys()
+
+    @property
+    def paths(self) -> Iterable[Sdf.Path]:
+        """The paths of all twins"""
+        return self._model_by_path.keys()
+
+    def get_model_id(self, path: Sdf.Path) -> str:
+        """Get the model id of the twin at the given path, None if the prim isn't a twin"""
+        return self._model_by_path.get(path)
+
+    def find_twins(
+        self, model_id: str, include_subtypes: bool = True
+    ) -> frozenset[Sdf.Path]:
+        """
+        Find the paths of all twins of the given model. If include_subtypes is True, the twins of
+        all models that extend the given model are included as well.
+        """
+        key = (model_id, include_subtypes)
+        twins = self._query_cache.get(key)
+        if twins is not None:
+            return twins
+        model_ids = (
+            self._subtypes.get(model_id, (model_id,))
+            if include_subtypes
+            else (model_id,)
+        )
+        twins = frozenset().union(*(self._paths_by_model.get(m, ()) for m in model_ids))
+        self._query_cache[key] = twins
+        return twins
+
+    def _on_objects_changed(self, notice, stage):
+        """
+        Update the index for the changed prims
+        NOTE: This is a Tf.Notice.Register(Usd.Notice.ObjectsChanged) callback, so keep it light
+        """
+        if stage != self._stage:
+            return
+        for path in notice.GetResyncedPaths():
+            if path.IsPropertyPath():
+                if path.name == MODEL_ID_ATTR_NAME:
+                    self._index_prim(stage.GetPrimAtPath(path.GetPrimPath()))
+            else:
+                self._remove_subtree(path)
+                prim = stage.GetPrimAtPath(path)
+                if prim:
+                    self._index_subtree(prim)
+        for path in notice.GetChangedInfoOnlyPaths():
+            if path.IsPropertyPath() and path.name == MODEL_ID_ATTR_NAME:
+                self._index_prim(stage.GetPrimAtPath(path.GetPrimPath()))
+
+    def _index_subtree(self, root: Usd.Prim):
+        for prim in Usd.PrimRange(root):
+            self._index_prim(prim)
+
+    def _index_prim(self, prim: Usd.Prim):
+        """Add, update or remove a single prim in the index"""
+        if not prim:
+            return
+        path = prim.GetPath()
+        model_id_attr = prim.GetAttribute(MODEL_ID_ATTR_NAME)
+        model_id = str(model_id_attr.Get() or "") if model_id_attr else None
+        previous_model_id = self._model_by_path.get(path)
+        if model_id == previous_model_id:
+            return
+        if previous_model_id is not None:
+            self._remove_path(path)
+        if model_id is not None:
+            self._model_by_path[path] = model_id
+            self._paths_by_model.setdefault(model_id, set()).add(path)
+            self._link_path(path)
+        self._query_cache = {}
+
+    def _remove_subtree(self, root_path: Sdf.Path):
+        # Most resynced prims (e.g. pasted prims) have no twins in the index yet
+        if root_path not in self._model_by_path and root_path not in self._children:
+            return
+        removed = []
+        pending = [root_path]
+        while len(pending) > 0:
+            path = pending.pop()
+            if path in self._model_by_path:
+                removed.append(path)
+            pending.extend(self._children.get(path, ()))
+        for path in removed:
+            self._remove_path(path)
+        if len(removed) > 0:
+            self._query_cache = {}
+
+    def _link_path(self, path: Sdf.Path):
+        """Add the path of a twin to the children of its ancestors"""
+        parent = path.GetParentPath()
+        while not parent.isEmpty:
+            children = self._children.setdefault(parent, set())
+            if path in children:
+                return
+            children.add(path)
+            (path, parent) = (parent, parent.GetParentPath())
+
+    def _unlink_path(self, path: Sdf.Path):
+        """Remove the path of a removed twin, and its ancestors that don't lead to twins anymore"""
+        while (
+            path not in self._model_by_path and len(self._children.get(path, ())) == 0
+        ):
+            self._children.pop(path, None)
+            parent = path.GetParentPath()
+            if parent.isEmpty:
+                return
+            self._children[parent].discard(path)
+            path = parent
+
+    def _remove_path(self, path: Sdf.Path):
+        model_id = self._model_by_path.pop(path)
+        paths = self._paths_by_model[model_id]
+        paths.discard(path)
+        if len(paths) == 0:
+            del self._paths_by_model[model_id]
+        self._unlink_path(path)
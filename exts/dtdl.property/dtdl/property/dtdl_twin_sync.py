@@ -0,0 +1,388 @@
+import asyncio
+import http.client
+import json
+import queue
+import threading
+import time
+from typing import Callable
+from urllib.parse import quote, urlsplit
+import carb
+import omni.usd
+from pxr import Usd, Sdf, Tf
+from .dtdl_property_extension import MODEL_ID_ATTR_NAME, get_repo_snapshot
+
+JSON_PATCH_CONTENT_TYPE = "application/json-patch+json"
+# Path of the twins in the twin service, relative to the endpoint
+TWINS_PATH = "/digitaltwins/"
+# Custom data of a prim with the id of its twin in the twin service, the prim name by default
+TWIN_ID_CUSTOM_DATA_KEY = "dtdl:twinId"
+# Responses that are retried, all other errors are not
+_RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+_REQUEST_TIMEOUT = 10.0
+_RETRY_DELAY = 0.5
+_MAX_RETRY_DELAY = 30.0
+# Seconds the queued patches are still sent after a stop, the rest is dropped
+_STOP_TIMEOUT = 2.0
+# Marks an attribute that has no authored value anymore
+_REMOVED = object()
+
+
+def get_twin_id(prim: Usd.Prim) -> str:
+    """Get the id of the twin of a prim in the twin service"""
+    twin_id = prim.GetCustomDataByKey(TWIN_ID_CUSTOM_DATA_KEY)
+    return str(twin_id) if twin_id else prim.GetName()
+
+
+def _to_json_value(value: object) -> object:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    # Tokens, asset paths, ... are sent as text
+    return str(value)
+
+
+class _DtdlTwinSender(threading.Thread):
+    """
+    Sends the JSON patches of its queue to the twin service over a single keep-alive connection.
+    Every twin is always sent by the same sender, so the patches of a twin stay in order.
+    The queue has (twin id, operations, context) items, the context of a patch that can't be sent
+    is passed to on_failed.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        max_queued: int,
+        max_retries: int,
+        stop_event: threading.Event,
+        on_failed: Callable[[object], None],
+    ):
+        super().__init__(name="dtdl.property twin sync", daemon=True)
+        # The queue is bounded, a full queue pushes back on the flushes
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        url = urlsplit(endpoint)
+        self._connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self._netloc = url.netloc
+        self._base_path = url.path.rstrip("/")
+        self._max_retries = max_retries
+        self._stop_event = stop_event
+        self._on_failed = on_failed
+        # Time (see time.monotonic) until which the queued patches are sent after a stop
+        self.stop_deadline = 0.0
+        self._connection: http.client.HTTPConnection = None
+
+    def run(self):
+        # The queued patches are still sent after a stop until the stop deadline, but they are no
+        # longer retried
+        while True:
+            try:
+                (twin_id, operations, context) = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+                continue
+            if self._stop_event.is_set() and time.monotonic() > self.stop_deadline:
+                carb.log_warn(
+                    "Dropped {} DTDL twin patches, the twin service didn't respond in time".format(
+                        1 + self.queue.qsize()
+                    )
+                )
+                break
+            if not self._send(twin_id, operations):
+                self._on_failed(context)
+        self._close()
+
+    def _send(self, twin_id: str, operations: list[dict]) -> bool:
+        """
+        Send a patch, connection errors and transient errors are retried with backoff. Returns
+        False if the patch wasn't sent.
+        """
+        path = self._base_path + TWINS_PATH + quote(twin_id, safe="")
+        body = json.dumps(operations).encode("utf-8")
+        delay = _RETRY_DELAY
+        for attempt in range(self._max_retries + 1):
+            if attempt > 0:
+                if self._stop_event.wait(delay):
+                    break
+                delay = min(delay * 2, _MAX_RETRY_DELAY)
+            try:
+                status = self._request("PATCH", path, body)
+            except (OSError, http.client.HTTPException) as e:
+                # The connection can't be reused after an error
+                self._close()
+                error = str(e)
+                continue
+            if 200 <= status < 300:
+                return True
+            error = "HTTP {}".format(status)
+            if status not in _RETRY_STATUS:
+                break
+        carb.log_error("Failed to sync DTDL twin {}: {}".format(twin_id, error))
+        return False
+
+    def _request(self, method: str, path: str, body: bytes) -> int:
+        if self._connection is None:
+            self._connection = self._connection_class(
+                self._netloc, timeout=_REQUEST_TIMEOUT
+            )
+        self._connection.request(
+            method, path, body, {"Content-Type": JSON_PATCH_CONTENT_TYPE}
+        )
+        response = self._connection.getresponse()
+        # The response has to be read completely before the connection can be reused
+        response.read()
+        if response.will_close:
+            self._close()
+        return response.status
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class DtdlTwinSync:
+    """
+    Writes the edits of DTDL properties in the stage back to a digital twin service. Edited
+    attributes are collected from USD notices and flushed periodically on the main thread: the
+    edits of a twin are coalesced into a single JSON patch with the latest values, so dragging a
+    slider only sends the value at every flush. The patches are sent by a pool of sender threads
+    with keep-alive connections and are retried with backoff. When the senders fall behind, the
+    edits stay pending and are coalesced with the next edits.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        flush_interval: float = 0.5,
+        connections: int = 4,
+        max_queued: int = 1000,
+        max_retries: int = 5,
+    ):
+        self._endpoint = endpoint
+        self._flush_interval = flush_interval
+        self._connections = max(1, connections)
+        self._max_queued = max_queued
+        self._max_retries = max_retries
+        self._main_loop = asyncio.get_event_loop()
+        self._stage: Usd.Stage = None
+        self._listener = None
+        self._stage_event_sub = None
+        self._flush_task: asyncio.Future = None
+        self._stop_event = threading.Event()
+        self._senders: list[_DtdlTwinSender] = []
+        # Edited attribute names by prim path, since the last flush
+        self._dirty: dict[Sdf.Path, set[str]] = {}
+        # Last value that was queued for every attribute, unchanged values aren't sent again. The
+        # values of a patch that fails are removed again, see _on_patch_failed.
+        self._sent: dict[tuple[Sdf.Path, str], object] = {}
+
+    @property
+    def endpoint(self) -> str:
+        return self._endpoint
+
+    def set_flush_interval(self, flush_interval: float):
+        """Change the interval of the periodic flushes, it applies from the next flush"""
+        self._flush_interval = flush_interval
+
+    def start(self):
+        """Start syncing the stage of the USD context"""
+        # Senders of a previous start can still be running, they keep their own stop event
+        self._stop_event = threading.Event()
+        self._senders = [
+            _DtdlTwinSender(
+                self._endpoint,
+                self._max_queued,
+                self._max_retries,
+                self._stop_event,
+                self._on_sender_failed,
+            )
+            for _ in range(self._connections)
+        ]
+        for sender in self._senders:
+            sender.start()
+        usd_context = omni.usd.get_context()
+        self._attach(usd_context.get_stage())
+        self._stage_event_sub = (
+            usd_context.get_stage_event_stream().create_subscription_to_pop(
+                self._on_stage_event, name="dtdl.property twin sync"
+            )
+        )
+        self._flush_task = asyncio.ensure_future(self._flush_periodically())
+
+    def stop(self):
+        """
+        Send the pending edits and stop syncing. Called on the main thread, so it doesn't wait
+        longer than the stop timeout for the twin service: the patches that aren't sent by then
+        are dropped. The senders are daemon threads, a sender that is still waiting for a
+        response is left behind.
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._stage_event_sub = None
+        self.flush()
+        self._detach()
+        deadline = time.monotonic() + _STOP_TIMEOUT
+        for sender in self._senders:
+            sender.stop_deadline = deadline
+        self._stop_event.set()
+        for sender in self._senders:
+            sender.join(max(0.0, deadline - time.monotonic()))
+        self._senders = []
+
+    def flush(self) -> int:
+        """
+        Queue a JSON patch for every twin with edited attributes. Returns the number of patches.
+        NOTE: Called on the main thread, the values are read from the stage.
+        """
+        if len(self._dirty) == 0 or self._stage is None or len(self._senders) == 0:
+            return 0
+        (dirty, self._dirty) = (self._dirty, {})
+        snapshot = get_repo_snapshot()
+        # Ids of the DTDL properties of every model, see _get_property_ids
+        property_ids_by_model: dict[str, frozenset[str]] = {}
+        patch_count = 0
+        for prim_path, attr_names in dirty.items():
+            prim = self._stage.GetPrimAtPath(prim_path)
+            # Removing prims doesn't remove twins from the twin service
+            if not prim:
+                continue
+            property_ids = _get_property_ids(prim, snapshot, property_ids_by_model)
+            values = {}
+            for attr_name in attr_names:
+                # Only properties are part of a twin, telemetry and relationships aren't
+                if attr_name not in property_ids:
+                    continue
+                attr = prim.GetAttribute(attr_name)
+                value = (
+                    _to_json_value(attr.Get())
+                    if attr and attr.HasAuthoredValue()
+                    else _REMOVED
+                )
+                # An attribute that was never sent counts as removed
+                previous = self._sent.get((prim_path, attr_name), _REMOVED)
+                if value is not previous and value != previous:
+                    values[attr_name] = value
+            if len(values) == 0:
+                continue
+            twin_id = get_twin_id(prim)
+            sender = self._senders[hash(twin_id) % len(self._senders)]
+            try:
+                sender.queue.put_nowait(
+                    (
+                        twin_id,
+                        _get_patch_operations(values),
+                        (self._stage, prim_path, values),
+                    )
+                )
+            except queue.Full:
+                # The edits are sent with the next flush, coalesced with the edits until then
+                self._dirty.setdefault(prim_path, set()).update(attr_names)
+                continue
+            for attr_name, value in values.items():
+                self._sent[(prim_path, attr_name)] = value
+            patch_count += 1
+        return patch_count
+
+    def _on_sender_failed(self, context: tuple):
+        """Called on a sender thread when a patch can't be sent"""
+        self._main_loop.call_soon_threadsafe(self._on_patch_failed, *context)
+
+    def _on_patch_failed(
+        self, stage: Usd.Stage, prim_path: Sdf.Path, values: dict[str, object]
+    ):
+        """
+        Forget the values of a patch that wasn't sent, so the next edit of the attributes is sent
+        even if it sets the same values again
+        """
+        if stage != self._stage:
+            return
+        for attr_name, value in values.items():
+            key = (prim_path, attr_name)
+            # A later patch can have queued another value in the meantime
+            if key in self._sent and self._sent[key] is value:
+                del self._sent[key]
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            self.flush()
+
+    def _attach(self, stage: Usd.Stage):
+        self._detach()
+        if not stage:
+            return
+        self._stage = stage
+        self._listener = Tf.Notice.Register(
+            Usd.Notice.ObjectsChanged, self._on_objects_changed, stage
+        )
+
+    def _detach(self):
+        if self._listener:
+            self._listener.Revoke()
+            self._listener = None
+        self._stage = None
+        self._dirty = {}
+        self._sent = {}
+
+    def _on_stage_event(self, event):
+        """Follow the stage of the USD context, the pending edits of a closed stage are sent"""
+        if event.type == int(omni.usd.StageEventType.OPENED):
+            self._attach(omni.usd.get_context().get_stage())
+        elif event.type == int(omni.usd.StageEventType.CLOSING):
+            self.flush()
+            self._detach()
+
+    def _on_objects_changed(self, notice, stage):
+        """
+        Mark the edited DTDL attributes as dirty, the attributes that aren't DTDL properties are
+        skipped when the edits are flushed
+        NOTE: This is a Tf.Notice.Register(Usd.Notice.ObjectsChanged) callback, so keep it light
+        """
+        if stage != self._stage:
+            return
+        for paths in (notice.GetChangedInfoOnlyPaths(), notice.GetResyncedPaths()):
+            for path in paths:
+                if (
+                    path.IsPropertyPath()
+                    and path.name.startswith("dtdl:")
+                    and path.name != MODEL_ID_ATTR_NAME
+                ):
+                    self._dirty.setdefault(path.GetPrimPath(), set()).add(path.name)
+
+
+def _get_property_ids(
+    prim: Usd.Prim, snapshot, property_ids_by_model: dict[str, frozenset[str]]
+) -> frozenset[str]:
+    """
+    Get the attribute names of the DTDL properties of the model of a prim, including the
+    properties of its bases. Without the model in the repository, no attribute is a property.
+    """
+    model_id_attr = prim.GetAttribute(MODEL_ID_ATTR_NAME)
+    model_id = str(model_id_attr.Get() or "") if model_id_attr else ""
+    property_ids = property_ids_by_model.get(model_id)
+    if property_ids is None:
+        property_ids = (
+            frozenset(p.id for p in snapshot.models[model_id].properties)
+            if snapshot is not None and model_id in snapshot.models
+            else frozenset()
+        )
+        property_ids_by_model[model_id] = property_ids
+    return property_ids
+
+
+def _get_patch_operations(values: dict[str, object]) -> list[dict]:
+    """Get the JSON patch operations for the edited attributes, e.g. dtdl:temp is /temp"""
+    operations = []
+    for attr_name in sorted(values.keys()):
+        path = "/" + attr_name[len("dtdl:") :]
+        value = values[attr_name]
+        if value is _REMOVED:
+            operations.append({"op": "remove", "path": path})
+        else:
+            operations.append({"op": "add", "path": path, "value": value})
+    return operations
@@ -0,0 +1,54 @@
+from pxr import Usd, Sdf
+from dtdl.compiler import get_dtdl_schema_name, is_dtdl_schema_name, is_valid_dtmi
+from .dtdl_property_extension import MODEL_ID_ATTR_NAME
+
+# NOTE: The USD schema registry only reads the schemas of the plugins that are registered when it
+#       is initialized, which happens before the extension starts. The generated schemas (python
+#       -m dtdl.compiler schema) are therefore found through PXR_PLUGINPATH_NAME when Kit starts.
+
+
+def is_dtdl_schema_registered(model_id: str) -> bool:
+    """Checks if the schema of the given model is available in the USD schema registry"""
+    if not is_valid_dtmi(model_id):
+        return False
+    schema_name = get_dtdl_schema_name(model_id)
+    return Usd.SchemaRegistry().FindAppliedAPIPrimDefinition(schema_name) is not None
+
+
+def apply_dtdl_schema(prim: Usd.Prim) -> bool:
+    """
+    Apply the generated schema of the model of a twin (the dtdl:modelId attribute of the prim).
+    The schemas of other models that were applied before are removed. The schemas of the bases
+    are included by the schema, so they don't need to be applied.
+    Returns True if the schema of the model is applied.
+    """
+    model_id_attr = prim.GetAttribute(MODEL_ID_ATTR_NAME)
+    model_id = str(model_id_attr.Get() or "") if model_id_attr else ""
+    schema_name = get_dtdl_schema_name(model_id) if is_valid_dtmi(model_id) else None
+    # Only the authored schemas are checked, the schemas of the bases are builtin
+    api_schemas: Sdf.TokenListOp = prim.GetMetadata("apiSchemas")
+    authored = api_schemas.GetAddedOrExplicitItems() if api_schemas else []
+    for applied in authored:
+        if is_dtdl_schema_name(applied) and applied != schema_name:
+            prim.RemoveAppliedSchema(applied)
+    if schema_name is None or not is_dtdl_schema_registered(model_id):
+        return False
+    if schema_name not in authored:
+        prim.AddAppliedSchema(schema_name)
+    return True
+
+
+def apply_dtdl_schemas(stage: Usd.Stage, prim_paths: list[Sdf.Path]) -> int:
+    """
+    Apply the generated schemas to the twins at the given paths, e.g. all twins of a model:
+
+        apply_dtdl_schemas(stage, get_twin_index().find_twins(model_id))
+
+    Returns the number of prims with an applied schema.
+    """
+    applied_count = 0
+    for prim_path in prim_paths:
+        prim = stage.GetPrimAtPath(prim_path)
+        if prim and apply_dtdl_schema(prim):
+            applied_count += 1
+    return applied_count
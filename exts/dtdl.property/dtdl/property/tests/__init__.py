@@ -1 +1,9 @@
-from .test_hello_world import *
\ No newline at end of file
+from .test_dtdl_attribute_widget_perf import *
+from .test_dtdl_bulk_query import *
+from .test_dtdl_bulk_query_perf import *
+from .test_dtdl_model_cache import *
+from .test_dtdl_model_resolver import *
+from .test_dtdl_model_roots import *
+from .test_dtdl_model_search import *
+from .test_dtdl_twin_index import *
+from .test_dtdl_twin_sync import *
@@ -0,0 +1,356 @@
+# NOTE:
+#   Performance regression tests for the DTDL property widget. The tests generate a large synthetic
+#   stage and model repository, drive the widget through the property window (selection changes,
+#   model id edits and repository reloads) and fail when the main thread frame times, the time
+#   spent in the widget callbacks or the number of rebuilds exceed their budget.
+#   The budgets are carb settings, so they can be changed without changing the tests, e.g.:
+#
+#       --/exts/dtdl.property/perf_tests/max_frame_ms=500
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import carb
+import carb.settings
+import omni.kit.app
+import omni.kit.commands
+import omni.kit.test
+import omni.usd
+from pxr import Sdf
+import dtdl.property
+from dtdl.property import (
+    DTDL_PATH_SETTING,
+    DTDL_ROOTS_SETTING,
+    DTDL_LAZY_RESOLVE_SETTING,
+    MODEL_ID_ATTR_NAME,
+)
+
+PERF_TESTS_SETTINGS_PREFIX = "/exts/dtdl.property/perf_tests/"
+
+# Defaults of the settings under PERF_TESTS_SETTINGS_PREFIX
+_DEFAULTS = {
+    # Size of the synthetic repository and stage
+    "model_count": 1000,
+    "chain_depth": 4,
+    "properties_per_model": 8,
+    "twin_count": 5000,
+    "selection_size": 100,
+    # Longest main thread frame while the widget reacts to a change
+    "max_frame_ms": 250.0,
+    # Longest single call of the widget callbacks
+    "max_on_new_payload_ms": 100.0,
+    "max_customize_props_layout_ms": 100.0,
+    "max_on_usd_changed_ms": 20.0,
+}
+
+# Number of frames that are measured after a change, the property window rebuilds on the next frames
+FRAMES_AFTER_CHANGE = 10
+
+MODEL_ID_FORMAT = "dtmi:com:example:perf:Model{};1"
+
+
+def _get_setting(name: str):
+    settings = carb.settings.get_settings()
+    value = settings.get(PERF_TESTS_SETTINGS_PREFIX + name)
+    return _DEFAULTS[name] if value is None else type(_DEFAULTS[name])(value)
+
+
+def _get_model_id(i: int) -> str:
+    return MODEL_ID_FORMAT.format(i)
+
+
+def _create_model(i: int, chain_depth: int, property_count: int) -> dict:
+    """A synthetic interface, every interface extends the previous one in its chain"""
+    model = {
+        "@context": "dtmi:dtdl:context;2",
+        "@id": _get_model_id(i),
+        "@type": "Interface",
+        "displayName": "Perf Model {}".format(i),
+        "contents": [
+            {
+                "@type": "Property",
+                "name": "model{}Property{}".format(i, p),
+                "schema": ("double", "string", "boolean", "integer")[p % 4],
+            }
+            for p in range(property_count)
+        ]
+        + [
+            {
+                "@type": "Telemetry",
+                "name": "model{}Telemetry".format(i),
+                "schema": "double",
+            }
+        ],
+    }
+    if i % chain_depth != 0:
+        model["extends"] = _get_model_id(i - 1)
+    return model
+
+
+def _write_models(repo_path: str, file_name: str, models: list[dict]):
+    with open(os.path.join(repo_path, file_name), "w") as f:
+        json.dump(models, f)
+
+
+class _WidgetProbe:
+    """Counts the calls of widget methods and measures how long every call takes"""
+
+    def __init__(self, widget, method_names: list[str]):
+        self.durations: dict[str, list[float]] = {}
+        for name in method_names:
+            self.durations[name] = []
+            setattr(
+                widget, name, self._wrap(getattr(widget, name), self.durations[name])
+            )
+
+    @staticmethod
+    def _wrap(fn, durations: list[float]):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                durations.append((time.perf_counter() - start) * 1000.0)
+
+        return wrapper
+
+    def count(self, name: str) -> int:
+        return len(self.durations[name])
+
+    def reset(self):
+        for durations in self.durations.values():
+            durations.clear()
+
+
+class TestDtdlAttributeWidgetPerf(omni.kit.test.AsyncTestCase):
+    # Before running each test
+    async def setUp(self):
+        self._settings = carb.settings.get_settings()
+        self._previous_settings = {
+            s: self._settings.get(s)
+            for s in (DTDL_PATH_SETTING, DTDL_ROOTS_SETTING, DTDL_LAZY_RESOLVE_SETTING)
+        }
+        self._model_count = _get_setting("model_count")
+        self._chain_depth = _get_setting("chain_depth")
+
+        # Synthetic repository, one file per chain so a change only touches one chain
+        self._repo_path = tempfile.mkdtemp(prefix="dtdl_perf_")
+        self._chains: dict[str, list[dict]] = {}
+        for i in range(self._model_count):
+            model = _create_model(
+                i, self._chain_depth, _get_setting("properties_per_model")
+            )
+            self._chains.setdefault(self._get_chain_file(i), []).append(model)
+        for file_name, models in self._chains.items():
+            _write_models(self._repo_path, file_name, models)
+
+        # Synthetic stage, the twins are created in the root layer in a single change block
+        usd_context = omni.usd.get_context()
+        await usd_context.new_stage_async()
+        self._stage = usd_context.get_stage()
+        layer = self._stage.GetRootLayer()
+        self._twin_paths: list[Sdf.Path] = []
+        with Sdf.ChangeBlock():
+            Sdf.CreatePrimInLayer(layer, "/World").specifier = Sdf.SpecifierDef
+            for i in range(_get_setting("twin_count")):
+                prim_spec = Sdf.CreatePrimInLayer(layer, "/World/Twin_{}".format(i))
+                prim_spec.specifier = Sdf.SpecifierDef
+                prim_spec.typeName = "Xform"
+                attr_spec = Sdf.AttributeSpec(
+                    prim_spec, MODEL_ID_ATTR_NAME, Sdf.ValueTypeNames.Token
+                )
+                attr_spec.default = _get_model_id(i % self._model_count)
+                self._twin_paths.append(prim_spec.path)
+
+        # Recreate the widget for the synthetic repository. The current widget is unregistered
+        # first, otherwise it reloads its repository when the settings change.
+        self._unregister_widget()
+        # Only the synthetic repository is loaded, without the additional roots of the user
+        self._settings.set(DTDL_PATH_SETTING, self._repo_path)
+        self._settings.set(DTDL_ROOTS_SETTING, "")
+        self._settings.set(DTDL_LAZY_RESOLVE_SETTING, False)
+        self._widget = self._register_widget()
+        self._probe = _WidgetProbe(
+            self._widget,
+            [
+                "on_new_payload",
+                "_customize_props_layout",
+                "_on_usd_changed",
+                "request_rebuild",
+            ],
+        )
+        # Wait for the models to be loaded on the reload thread, then let the widget handle the
+        # published snapshot
+        await asyncio.wrap_future(self._widget._load_future)
+        await self._measure_frames(2)
+        self._probe.reset()
+
+    # After running each test
+    async def tearDown(self):
+        usd_context = omni.usd.get_context()
+        usd_context.get_selection().clear_selected_prim_paths()
+        await omni.kit.app.get_app().next_update_async()
+        self._unregister_widget()
+        for setting, value in self._previous_settings.items():
+            if value is None:
+                self._settings.destroy_item(setting)
+            else:
+                self._settings.set(setting, value)
+        self._register_widget()
+        self._widget = None
+        self._probe = None
+        await usd_context.new_stage_async()
+        shutil.rmtree(self._repo_path, ignore_errors=True)
+
+    def _get_chain_file(self, i: int) -> str:
+        return "chain_{}.json".format(i // self._chain_depth)
+
+    def _get_extension(self):
+        extension = dtdl.property.dtdl_property_extension._extension_instance
+        self.assertIsNotNone(extension, "The dtdl.property extension isn't started")
+        return extension
+
+    def _unregister_widget(self):
+        """Unregister the widget of the extension, it stops watching its repository"""
+        extension = self._get_extension()
+        if extension._registered:
+            extension._unregister_widget()
+
+    def _register_widget(self):
+        """Register a new widget with the current settings, like the extension does at startup"""
+        self._unregister_widget()
+        extension = self._get_extension()
+        extension._register_widget()
+        self.assertIsNotNone(extension._widget, "The property window isn't available")
+        return extension._widget
+
+    async def _measure_frames(self, frame_count: int, pending=None) -> list[float]:
+        """
+        Measure the duration of the next frames in milliseconds. If a pending future is given, the
+        frames are measured until it's done, followed by frame_count frames.
+        """
+        app = omni.kit.app.get_app()
+        durations = []
+        remaining = frame_count
+        while remaining > 0:
+            start = time.perf_counter()
+            await app.next_update_async()
+            durations.append((time.perf_counter() - start) * 1000.0)
+            if pending is None or pending.done():
+                remaining -= 1
+        if pending is not None:
+            await pending
+        return durations
+
+    def _assert_within_budget(self, what: str, durations: list[float], budget: str):
+        worst = max(durations, default=0.0)
+        limit = _get_setting(budget)
+        carb.log_info(
+            "DTDL perf: {} worst {:.1f} ms (budget {:.1f} ms)".format(
+                what, worst, limit
+            )
+        )
+        self.assertLessEqual(
+            worst,
+            limit,
+            "{} took {:.1f} ms, the budget is {:.1f} ms ({})".format(
+                what, worst, limit, PERF_TESTS_SETTINGS_PREFIX + budget
+            ),
+        )
+
+    def _assert_callbacks_within_budget(self):
+        for name in ("on_new_payload", "_customize_props_layout", "_on_usd_changed"):
+            self._assert_within_budget(
+                name, self._probe.durations[name], "max_{}_ms".format(name.lstrip("_"))
+            )
+
+    async def _select(self, paths: list[Sdf.Path]) -> list[float]:
+        omni.usd.get_context().get_selection().set_selected_prim_paths(
+            [str(p) for p in paths], True
+        )
+        return await self._measure_frames(FRAMES_AFTER_CHANGE)
+
+    async def _reload_repo(self) -> list[float]:
+        """Reload the repository on a worker thread like the folder watcher does"""
+        loop = asyncio.get_event_loop()
+        pending = loop.run_in_executor(None, self._widget._load_dtdl_model_repo)
+        return await self._measure_frames(FRAMES_AFTER_CHANGE, pending)
+
+    @omni.kit.test.omni_test_registry(guid="7290184e-bb53-495e-ac71-9f704cfb1b8e")
+    async def test_selection_change(self):
+        frames = await self._select(self._twin_paths[0:1])
+        self.assertGreater(len(self._widget._dtdl_contents_list), 0)
+        self.assertEqual(self._probe.count("_customize_props_layout"), 1)
+
+        # Select more twins of different models, the contents of all models are combined
+        frames += await self._select(
+            self._twin_paths[0 : _get_setting("selection_size")]
+        )
+        self.assertEqual(self._probe.count("_customize_props_layout"), 2)
+
+        self._assert_within_budget("Selection change frames", frames, "max_frame_ms")
+        self._assert_callbacks_within_budget()
+
+    @omni.kit.test.omni_test_registry(guid="975a55ae-256e-489d-8b0a-c60cc047fc4c")
+    async def test_model_id_edit(self):
+        twin_path = self._twin_paths[0]
+        await self._select([twin_path])
+        self._probe.reset()
+
+        # Change to the last model of a chain, it has the contents of the whole chain
+        model_id = _get_model_id(self._chain_depth - 1)
+        model_id_attr = self._stage.GetAttributeAtPath(
+            twin_path.AppendProperty(MODEL_ID_ATTR_NAME)
+        )
+        omni.kit.commands.execute(
+            "ChangeProperty",
+            prop_path=model_id_attr.GetPath(),
+            value=model_id,
+            prev=model_id_attr.Get(),
+        )
+        frames = await self._measure_frames(FRAMES_AFTER_CHANGE)
+
+        self.assertEqual(self._widget.twin_index.get_model_id(twin_path), model_id)
+        self.assertEqual(self._probe.count("_customize_props_layout"), 1)
+        self._assert_within_budget("Model id edit frames", frames, "max_frame_ms")
+        self._assert_callbacks_within_budget()
+
+    @omni.kit.test.omni_test_registry(guid="51481681-9b3f-45e8-808d-9e7d04ddcbc6")
+    async def test_reload_unrelated_models(self):
+        # The selected twin uses the first chain, the last chain is changed
+        await self._select(self._twin_paths[0:1])
+        self._probe.reset()
+
+        file_name = self._get_chain_file(self._model_count - 1)
+        self._chains[file_name][-1]["displayName"] = "Changed"
+        _write_models(self._repo_path, file_name, self._chains[file_name])
+        frames = await self._reload_repo()
+
+        self.assertEqual(self._probe.count("request_rebuild"), 0)
+        self.assertEqual(self._probe.count("_customize_props_layout"), 0)
+        self._assert_within_budget("Unrelated reload frames", frames, "max_frame_ms")
+
+    @omni.kit.test.omni_test_registry(guid="970d0511-bc3b-4d4c-8ffa-b0087e97c775")
+    async def test_reload_selected_base_model(self):
+        # The selected twin extends the first model of the chain, which gets a new property
+        twin_path = self._twin_paths[self._chain_depth - 1]
+        await self._select([twin_path])
+        self._probe.reset()
+
+        file_name = self._get_chain_file(0)
+        self._chains[file_name][0]["contents"].append(
+            {"@type": "Property", "name": "addedProperty", "schema": "double"}
+        )
+        _write_models(self._repo_path, file_name, self._chains[file_name])
+        frames = await self._reload_repo()
+
+        self.assertIn(
+            "dtdl:addedProperty", [c.id for c in self._widget._dtdl_contents_list]
+        )
+        self.assertEqual(self._probe.count("_customize_props_layout"), 1)
+        self._assert_within_budget(
+            "Selected model reload frames", frames, "max_frame_ms"
+        )
+        self._assert_callbacks_within_budget()
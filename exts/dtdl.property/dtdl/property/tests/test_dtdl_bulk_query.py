@@ -0,0 +1,142 @@
+# NOTE:
+#   Tests of the values and aggregates of the bulk queries on a small in-memory stage. The stage
+#   isn't the stage of the USD context, so the values are always read from USD, with or without
+#   USDRT.
+import numpy as np
+import omni.kit.test
+from pxr import Usd, Sdf
+from dtdl.property import (
+    MODEL_ID_ATTR_NAME,
+    aggregate_dtdl_values,
+    group_by_ancestor,
+    query_dtdl_values,
+)
+from dtdl.property.dtdl_bulk_query import _read_values
+from dtdl.property.dtdl_twin_index import DtdlTwinIndex
+
+MODEL_ID = "dtmi:com:example:Thermostat;1"
+
+# Temperature of the twins, None for the twins without a value
+_TEMPERATURES = {
+    "/World/Floor1/T0": 1.0,
+    "/World/Floor1/T1": 3.0,
+    "/World/Floor1/T2": None,
+    "/World/Floor2/T3": 5.0,
+    "/World/Floor2/Room/T4": 7.0,
+}
+
+
+class TestDtdlBulkQuery(omni.kit.test.AsyncTestCase):
+    # Before running each test
+    async def setUp(self):
+        self._stage = Usd.Stage.CreateInMemory()
+        for (path, temperature) in _TEMPERATURES.items():
+            prim = self._create_twin(path)
+            attr = prim.CreateAttribute("dtdl:temperature", Sdf.ValueTypeNames.Double)
+            if temperature is not None:
+                attr.Set(temperature)
+            prim.CreateAttribute("dtdl:name", Sdf.ValueTypeNames.String).Set(
+                prim.GetName()
+            )
+        # A twin without the attribute
+        self._create_twin("/World/T5")
+        self._twin_index = DtdlTwinIndex()
+        self._twin_index.attach(self._stage)
+
+    # After running each test
+    async def tearDown(self):
+        self._twin_index.detach()
+        self._twin_index = None
+        self._stage = None
+
+    def _create_twin(self, path: str) -> Usd.Prim:
+        prim = self._stage.DefinePrim(path, "Xform")
+        prim.CreateAttribute(MODEL_ID_ATTR_NAME, Sdf.ValueTypeNames.Token).Set(MODEL_ID)
+        return prim
+
+    def _query(self, name: str):
+        return query_dtdl_values(
+            self._stage,
+            MODEL_ID,
+            name,
+            include_subtypes=False,
+            twin_index=self._twin_index,
+        )
+
+    @omni.kit.test.omni_test_registry(guid="6e1c9a4f-3b8d-4f27-a5e0-8d2b7c4f1a96")
+    async def test_read_values(self):
+        paths = [
+            Sdf.Path(p) for p in ("/World/Floor1/T0", "/World/Floor1/T2", "/World/T5")
+        ]
+        self.assertEqual(
+            _read_values(None, self._stage, paths, "dtdl:temperature"),
+            [1.0, None, None],
+        )
+
+        result = self._query("temperature")
+        self.assertEqual(result.attr_name, "dtdl:temperature")
+        self.assertEqual(
+            list(result.path_strings), sorted(list(_TEMPERATURES) + ["/World/T5"])
+        )
+        self.assertEqual(result.paths, [Sdf.Path(p) for p in result.path_strings])
+        self.assertEqual(result.values.dtype, np.float64)
+        # The twins without a value are NaN
+        self.assertEqual(list(result.valid), [True, True, False, True, True, False])
+        np.testing.assert_array_equal(
+            result.values, [1.0, 3.0, np.nan, 7.0, 5.0, np.nan]
+        )
+
+        # Other values are objects, they can't be aggregated
+        names = self._query("dtdl:name")
+        self.assertEqual(names.values.dtype, object)
+        self.assertEqual(list(names.values[:2]), ["T0", "T1"])
+        self.assertIsNone(names.values[-1])
+        with self.assertRaises(ValueError):
+            aggregate_dtdl_values(names)
+
+    @omni.kit.test.omni_test_registry(guid="b2f8d5a1-7c4e-4b39-9a6f-1e3d8c5b2f70")
+    async def test_aggregate(self):
+        result = self._query("temperature")
+        aggregates = aggregate_dtdl_values(
+            result, reductions=("min", "max", "mean", "sum", "count")
+        )
+        # The twins without a value are skipped
+        self.assertEqual(
+            {r: aggregates[r].tolist() for r in ("min", "max", "mean", "sum", "count")},
+            {"min": [1.0], "max": [7.0], "mean": [4.0], "sum": [16.0], "count": [4]},
+        )
+
+        floors = group_by_ancestor(result.path_strings, 2)
+        self.assertEqual(
+            list(floors),
+            [
+                "/World/Floor1",
+                "/World/Floor1",
+                "/World/Floor1",
+                "/World/Floor2",
+                "/World/Floor2",
+                "/World/T5",
+            ],
+        )
+        aggregates = aggregate_dtdl_values(result, floors)
+        # /World/T5 has no value, so it isn't a group
+        self.assertEqual(list(aggregates["group"]), ["/World/Floor1", "/World/Floor2"])
+        self.assertEqual(aggregates["min"].tolist(), [1.0, 5.0])
+        self.assertEqual(aggregates["max"].tolist(), [3.0, 7.0])
+        self.assertEqual(aggregates["mean"].tolist(), [2.0, 6.0])
+        self.assertEqual(aggregates["count"].tolist(), [2, 2])
+
+    @omni.kit.test.omni_test_registry(guid="4a7d2e9c-1f6b-4c85-b3a0-6c9e1d4f8b27")
+    async def test_group_by_ancestor(self):
+        paths = [Sdf.Path("/World/Floor2/Room/T4"), Sdf.Path("/World/T5")]
+        self.assertEqual(list(group_by_ancestor(paths, 1)), ["/World", "/World"])
+        self.assertEqual(
+            list(group_by_ancestor(paths, 3)), ["/World/Floor2/Room", "/World/T5"]
+        )
+        # Deeper than the prims, every prim is its own group
+        self.assertEqual(
+            list(group_by_ancestor(paths, 10)), ["/World/Floor2/Room/T4", "/World/T5"]
+        )
+        self.assertEqual(len(group_by_ancestor([], 2)), 0)
+        with self.assertRaises(ValueError):
+            group_by_ancestor(paths, 0)
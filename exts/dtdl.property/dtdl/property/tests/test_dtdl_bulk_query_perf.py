@@ -0,0 +1,131 @@
+# NOTE:
+#   Performance test for the bulk queries. The test queries all twins of a large synthetic stage,
+#   logs the time of the query and of the aggregation, and fails when they exceed their budget.
+#   The budget and the number of twins are carb settings, like the budgets of the widget
+#   performance tests, e.g.:
+#
+#       --/exts/dtdl.property/perf_tests/bulk_query_twin_count=1000000
+#
+#   The budget is for the values gathered from Fabric, the test is skipped without USDRT.
+import time
+import carb
+import carb.settings
+import numpy as np
+import omni.kit.test
+import omni.usd
+from pxr import Sdf
+from dtdl.property import (
+    MODEL_ID_ATTR_NAME,
+    aggregate_dtdl_values,
+    group_by_ancestor,
+    query_dtdl_values,
+)
+from dtdl.property.dtdl_bulk_query import RtUsd
+from dtdl.property.dtdl_twin_index import DtdlTwinIndex
+
+PERF_TESTS_SETTINGS_PREFIX = "/exts/dtdl.property/perf_tests/"
+
+# Defaults of the settings under PERF_TESTS_SETTINGS_PREFIX
+_DEFAULTS = {
+    "bulk_query_twin_count": 100000,
+    "bulk_query_floor_count": 100,
+    # Longest query of all twins, gathering the values from Fabric and aggregating them
+    "max_bulk_query_ms": 500.0,
+}
+
+MODEL_ID = "dtmi:com:example:perf:Thermostat;1"
+
+
+def _get_setting(name: str):
+    settings = carb.settings.get_settings()
+    value = settings.get(PERF_TESTS_SETTINGS_PREFIX + name)
+    return _DEFAULTS[name] if value is None else type(_DEFAULTS[name])(value)
+
+
+class TestDtdlBulkQueryPerf(omni.kit.test.AsyncTestCase):
+    # Before running each test
+    async def setUp(self):
+        self._twin_count = _get_setting("bulk_query_twin_count")
+        floor_count = _get_setting("bulk_query_floor_count")
+
+        # Synthetic stage, the twins are created in the root layer in a single change block
+        usd_context = omni.usd.get_context()
+        await usd_context.new_stage_async()
+        self._stage = usd_context.get_stage()
+        layer = self._stage.GetRootLayer()
+        with Sdf.ChangeBlock():
+            Sdf.CreatePrimInLayer(layer, "/World").specifier = Sdf.SpecifierDef
+            for floor in range(floor_count):
+                path = "/World/Floor_{}".format(floor)
+                Sdf.CreatePrimInLayer(layer, path).specifier = Sdf.SpecifierDef
+            for i in range(self._twin_count):
+                prim_spec = Sdf.CreatePrimInLayer(
+                    layer, "/World/Floor_{}/Twin_{}".format(i % floor_count, i)
+                )
+                prim_spec.specifier = Sdf.SpecifierDef
+                prim_spec.typeName = "Xform"
+                attr_spec = Sdf.AttributeSpec(
+                    prim_spec, MODEL_ID_ATTR_NAME, Sdf.ValueTypeNames.Token
+                )
+                attr_spec.default = MODEL_ID
+                attr_spec = Sdf.AttributeSpec(
+                    prim_spec, "dtdl:temperature", Sdf.ValueTypeNames.Double
+                )
+                attr_spec.default = float(i % 40)
+
+        # A twin index of its own, so the test doesn't depend on the model repository
+        self._twin_index = DtdlTwinIndex()
+        self._twin_index.attach(self._stage)
+
+    # After running each test
+    async def tearDown(self):
+        self._twin_index.detach()
+        self._twin_index = None
+        self._stage = None
+        await omni.usd.get_context().new_stage_async()
+
+    def _query(self):
+        return query_dtdl_values(
+            self._stage,
+            MODEL_ID,
+            "temperature",
+            include_subtypes=False,
+            twin_index=self._twin_index,
+        )
+
+    @omni.kit.test.omni_test_registry(guid="3f0a8d52-6c1e-4b7a-9e15-d2a4c8b61f07")
+    async def test_query_and_aggregate(self):
+        if RtUsd is None:
+            self.skipTest("USDRT isn't available, the values would be read from USD")
+        # The first query populates Fabric with the twins, the next queries read from Fabric
+        self._query()
+        start = time.perf_counter()
+        result = self._query()
+        query_ms = (time.perf_counter() - start) * 1000.0
+        floors = group_by_ancestor(result.path_strings, 2)
+        start = time.perf_counter()
+        aggregates = aggregate_dtdl_values(
+            result, floors, ("min", "max", "sum", "count")
+        )
+        aggregate_ms = (time.perf_counter() - start) * 1000.0
+
+        self.assertEqual(len(result), self._twin_count)
+        self.assertEqual(int(np.sum(aggregates["count"])), self._twin_count)
+        # The temperature of twin i is i % 40
+        expected = np.arange(self._twin_count, dtype=np.float64) % 40
+        self.assertEqual(float(np.sum(aggregates["sum"])), float(np.sum(expected)))
+        limit = _get_setting("max_bulk_query_ms")
+        carb.log_info(
+            "DTDL perf: bulk query of {} twins {:.1f} ms, aggregation {:.1f} ms (budget {:.1f} ms)".format(
+                self._twin_count, query_ms, aggregate_ms, limit
+            )
+        )
+        self.assertLessEqual(
+            query_ms + aggregate_ms,
+            limit,
+            "The bulk query took {:.1f} ms, the budget is {:.1f} ms ({})".format(
+                query_ms + aggregate_ms,
+                limit,
+                PERF_TESTS_SETTINGS_PREFIX + "max_bulk_query_ms",
+            ),
+        )
@@ -0,0 +1,141 @@
+# NOTE:
+#   Tests of the LRU cache of the extended model data. The models are small in-memory interfaces,
+#   the sources are plain dicts like the models of a DtdlModelRoot.
+import omni.kit.test
+from dtdl.compiler import compact_dtdl_model
+from dtdl.property.dtdl_model_cache import DtdlModelCache
+
+
+def _model(model_id: str, extends=None, contents=()) -> dict:
+    model = {"@id": model_id, "@type": "Interface"}
+    if extends is not None:
+        model["extends"] = extends
+    model["contents"] = [
+        {"@type": "Property", "name": name, "schema": "double"} for name in contents
+    ]
+    return model
+
+
+def _property_ids(model_data) -> list[str]:
+    return [p.id for p in model_data.properties]
+
+
+class TestDtdlModelCache(omni.kit.test.AsyncTestCase):
+    def _create_cache(self, max_entries: int = 1000, max_contents: int = 0):
+        model_cache = DtdlModelCache(max_entries, max_contents)
+        model_cache.add_models(
+            [
+                _model("dtmi:test:A;1", contents=["a1", "a2"]),
+                _model("dtmi:test:B;1", contents=["b1", "b2"]),
+                _model("dtmi:test:C;1", contents=["c1"]),
+                _model("dtmi:test:Big;1", contents=["x{}".format(i) for i in range(5)]),
+            ]
+        )
+        return model_cache
+
+    @omni.kit.test.omni_test_registry(guid="8d3f1a6c-2e7b-4c95-a0d4-6b9e1f3c7a28")
+    async def test_max_entries(self):
+        model_cache = self._create_cache(max_entries=2)
+        for model_id in ("dtmi:test:A;1", "dtmi:test:B;1", "dtmi:test:A;1"):
+            model_cache[model_id]
+        # B is the least recently used model when C is added
+        model_cache["dtmi:test:C;1"]
+        self.assertEqual(
+            list(model_cache._cache.keys()), ["dtmi:test:A;1", "dtmi:test:C;1"]
+        )
+        stats = model_cache.stats
+        self.assertEqual((stats.hits, stats.misses, stats.evictions), (1, 3, 1))
+        self.assertEqual(stats.hit_rate, 0.25)
+
+        model_cache["dtmi:test:B;1"]
+        self.assertEqual(
+            list(model_cache._cache.keys()), ["dtmi:test:C;1", "dtmi:test:B;1"]
+        )
+        self.assertEqual((stats.hits, stats.misses, stats.evictions), (1, 4, 2))
+        # The models that aren't cached are still in the index
+        self.assertEqual(len(model_cache), 4)
+        self.assertIn("dtmi:test:A;1", model_cache)
+
+    @omni.kit.test.omni_test_registry(guid="f2a7c4e9-5b1d-4e38-9c6a-3d8b0e2f5a71")
+    async def test_max_contents(self):
+        model_cache = self._create_cache(max_contents=4)
+        model_cache["dtmi:test:A;1"]
+        model_cache["dtmi:test:B;1"]
+        self.assertEqual(model_cache._cached_contents, 4)
+        model_cache["dtmi:test:C;1"]
+        self.assertEqual(
+            list(model_cache._cache.keys()), ["dtmi:test:B;1", "dtmi:test:C;1"]
+        )
+        self.assertEqual(model_cache._cached_contents, 3)
+        # The most recently used model is kept, even if it exceeds the bound on its own
+        model_cache["dtmi:test:Big;1"]
+        self.assertEqual(list(model_cache._cache.keys()), ["dtmi:test:Big;1"])
+        self.assertEqual(model_cache._cached_contents, 5)
+        self.assertEqual(model_cache.stats.evictions, 3)
+
+    @omni.kit.test.omni_test_registry(guid="4b9e2d7a-c6f1-4a83-8e5b-1f7d3a9c2e60")
+    async def test_read_only(self):
+        model_cache = self._create_cache()
+        model_cache.set_read_only()
+        with self.assertRaises(TypeError):
+            model_cache.add_models([_model("dtmi:test:D;1")])
+        # Copies can be changed, without changing the read-only cache
+        model_copy = model_cache.copy()
+        model_copy.add_models([_model("dtmi:test:D;1")])
+        self.assertIn("dtmi:test:D;1", model_copy)
+        self.assertNotIn("dtmi:test:D;1", model_cache)
+        self.assertIs(model_copy.stats, model_cache.stats)
+
+    @omni.kit.test.omni_test_registry(guid="c7e1a3f5-9d2b-4f64-b8a0-5e3c7d1f9b42")
+    async def test_invalidate_subtypes(self):
+        model_cache = self._create_cache()
+        model_cache.add_models(
+            [
+                _model("dtmi:test:Derived;1", "dtmi:test:A;1", ["d"]),
+                _model("dtmi:test:Leaf;1", "dtmi:test:Derived;1", ["l"]),
+            ]
+        )
+        leaf = model_cache["dtmi:test:Leaf;1"]
+        self.assertEqual(leaf.bases, ["dtmi:test:Derived;1", "dtmi:test:A;1"])
+        self.assertEqual(
+            _property_ids(leaf), ["dtdl:l", "dtdl:d", "dtdl:a1", "dtdl:a2"]
+        )
+        b = model_cache["dtmi:test:B;1"]
+
+        # Changing a base drops the models that extend it, directly or indirectly
+        model_cache.add_models([_model("dtmi:test:A;1", contents=["a3"])])
+        self.assertNotIn("dtmi:test:Leaf;1", model_cache._cache)
+        self.assertIs(model_cache["dtmi:test:B;1"], b)
+        leaf = model_cache["dtmi:test:Leaf;1"]
+        self.assertEqual(_property_ids(leaf), ["dtdl:l", "dtdl:d", "dtdl:a3"])
+
+    @omni.kit.test.omni_test_registry(guid="1e6b8f3d-7a4c-4d29-9f5e-2c0a6b8d4e17")
+    async def test_with_sources(self):
+        base = compact_dtdl_model(_model("dtmi:test:Base;1", contents=["b"]))
+        other = compact_dtdl_model(_model("dtmi:test:Other;1", contents=["o"]))
+        source = {"dtmi:test:Base;1": base, "dtmi:test:Other;1": other}
+        model_cache = DtdlModelCache(sources=[source])
+        # Added models take precedence over the sources
+        model_cache.add_models(
+            [_model("dtmi:test:Derived;1", "dtmi:test:Base;1", ["d"])]
+        )
+        derived = model_cache["dtmi:test:Derived;1"]
+        other_data = model_cache["dtmi:test:Other;1"]
+
+        # The reloaded source has a new version of Base, Other is the same interface
+        reloaded = {
+            "dtmi:test:Base;1": compact_dtdl_model(
+                _model("dtmi:test:Base;1", contents=["b2"])
+            ),
+            "dtmi:test:Other;1": other,
+        }
+        new_cache = model_cache.with_sources(
+            [reloaded], ["dtmi:test:Base;1", "dtmi:test:Other;1"]
+        )
+        self.assertIs(new_cache["dtmi:test:Other;1"], other_data)
+        self.assertEqual(
+            _property_ids(new_cache["dtmi:test:Derived;1"]), ["dtdl:d", "dtdl:b2"]
+        )
+        # The original cache still uses the previous source
+        self.assertIs(model_cache["dtmi:test:Derived;1"], derived)
+        self.assertEqual(_property_ids(derived), ["dtdl:d", "dtdl:b"])
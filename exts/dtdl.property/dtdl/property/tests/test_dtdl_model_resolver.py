@@ -0,0 +1,122 @@
+# NOTE:
+#   Tests of the lazy model resolver on two temporary folders with the DTDL model repository
+#   layout. The missing models expire after a fraction of a second, so the retries are fast.
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+import omni.kit.test
+from dtdl.compiler import dtmi_to_path
+from dtdl.property import dtdl_model_resolver
+from dtdl.property.dtdl_model_resolver import DtdlModelResolver
+
+LEAF = "dtmi:test:Leaf;1"
+MID = "dtmi:test:Mid;1"
+BASE = "dtmi:test:Base;1"
+MISSING = "dtmi:test:Missing;1"
+
+MISSING_TTL = 0.2
+
+
+def _model(model_id: str, extends=None, contents=()) -> dict:
+    model = {"@context": "dtmi:dtdl:context;3", "@id": model_id, "@type": "Interface"}
+    if extends is not None:
+        model["extends"] = extends
+    model["contents"] = [
+        {"@type": "Property", "name": name, "schema": "double"} for name in contents
+    ]
+    return model
+
+
+def _content_names(model: object) -> list[str]:
+    return [c["name"] for c in model["contents"]]
+
+
+class TestDtdlModelResolver(omni.kit.test.AsyncTestCase):
+    # Before running each test
+    async def setUp(self):
+        self._folder = tempfile.mkdtemp(prefix="dtdl_resolver_test")
+        self._first = os.path.join(self._folder, "first")
+        self._second = os.path.join(self._folder, "second")
+        # Mid and Base are only in the second root, Base is overridden by the first root
+        self._write(self._first, _model(LEAF, MID, ["leaf"]))
+        self._write(self._first, _model(BASE, contents=["first"]))
+        self._write(self._second, _model(MID, BASE, ["mid"]))
+        self._write(self._second, _model(BASE, contents=["second"]))
+        self._resolver = DtdlModelResolver([self._first, self._second], MISSING_TTL)
+        self._carb_patch = mock.patch.object(dtdl_model_resolver, "carb")
+        self._carb = self._carb_patch.start()
+
+    # After running each test
+    async def tearDown(self):
+        self._carb_patch.stop()
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def _write(self, root: str, model: dict) -> str:
+        file_path = os.path.join(root, dtmi_to_path(model["@id"]))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as f:
+            json.dump(model, f)
+        return file_path
+
+    @omni.kit.test.omni_test_registry(guid="b3d7e1a9-4f2c-4a68-9c15-8e0f6a2d4b71")
+    async def test_resolve_closure(self):
+        resolved = {m["@id"]: m for m in self._resolver.resolve([LEAF])}
+        self.assertEqual(set(resolved.keys()), {LEAF, MID, BASE})
+        # The first root that has the file of a model wins
+        self.assertEqual(_content_names(resolved[BASE]), ["first"])
+        self.assertEqual(_content_names(resolved[MID]), ["mid"])
+        # Resolved models aren't fetched again
+        self.assertEqual(self._resolver.resolve([LEAF, MID]), [])
+        self._carb.log_warn.assert_not_called()
+
+    @omni.kit.test.omni_test_registry(guid="5e9a2c6f-8d1b-4e37-a4f0-1c7b3e9d5a82")
+    async def test_missing_model(self):
+        self.assertEqual(self._resolver.resolve([MISSING]), [])
+        self.assertEqual(self._carb.log_warn.call_count, 1)
+        self.assertIn(MISSING, self._carb.log_warn.call_args[0][0])
+
+        # The missing model isn't looked up again until it expires
+        self._write(self._second, _model(MISSING, contents=["found"]))
+        self.assertEqual(self._resolver.resolve([MISSING]), [])
+        os.remove(os.path.join(self._second, dtmi_to_path(MISSING)))
+        await asyncio.sleep(MISSING_TTL * 1.5)
+
+        # The retry is only logged at info level
+        self.assertEqual(self._resolver.resolve([MISSING]), [])
+        self.assertEqual(self._carb.log_warn.call_count, 1)
+        self.assertEqual(self._carb.log_info.call_count, 1)
+
+        # Refresh retries the expired missing models
+        self._write(self._second, _model(MISSING, contents=["found"]))
+        self.assertEqual(self._resolver.refresh(), [])
+        await asyncio.sleep(MISSING_TTL * 1.5)
+        refreshed = self._resolver.refresh()
+        self.assertEqual([m["@id"] for m in refreshed], [MISSING])
+        self.assertEqual(self._carb.log_warn.call_count, 1)
+
+    @omni.kit.test.omni_test_registry(guid="9c4f1b7e-2a6d-4f83-b0e5-6d3a8c1f7e49")
+    async def test_refresh(self):
+        self._resolver.resolve([LEAF])
+        with mock.patch.object(
+            self._resolver, "_read_file", wraps=self._resolver._read_file
+        ) as read_file:
+            # Nothing changed, so no file is read
+            self.assertEqual(self._resolver.refresh(), [])
+            read_file.assert_not_called()
+
+            # Only the changed file is read, the size changes with the contents
+            mid_file = self._write(self._second, _model(MID, BASE, ["mid", "more"]))
+            refreshed = self._resolver.refresh()
+            self.assertEqual([m["@id"] for m in refreshed], [MID])
+            self.assertEqual(_content_names(refreshed[0]), ["mid", "more"])
+            self.assertEqual(read_file.call_count, 1)
+            self.assertEqual(
+                os.path.normpath(read_file.call_args[0][0]), os.path.normpath(mid_file)
+            )
+
+            # The version is remembered, the file isn't read again
+            self.assertEqual(self._resolver.refresh(), [])
+            self.assertEqual(read_file.call_count, 1)
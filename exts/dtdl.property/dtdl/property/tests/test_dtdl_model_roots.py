@@ -0,0 +1,145 @@
+# NOTE:
+#   Tests of the precedence of the model roots: the DTDL path, a folder and a bundle as additional
+#   roots, all in a temporary folder. The roots are loaded like the widget loads them, as the
+#   sources of the model cache of a snapshot.
+import json
+import os
+import shutil
+import tempfile
+import omni.kit.test
+from dtdl.compiler import (
+    DtdlBundleModel,
+    DtdlModelBundle,
+    compile_dtdl_files,
+    list_dtdl_files,
+    write_dtdl_bundle,
+)
+from dtdl.property.dtdl_model_cache import DtdlModelCache
+from dtdl.property.dtdl_model_root import DtdlModelRoot, get_dtdl_root_paths
+from dtdl.property.dtdl_model_snapshot import DtdlRepoDiff, DtdlRepoSnapshot
+
+ROOM = "dtmi:com:example:Room;1"
+THERMOSTAT = "dtmi:com:example:Thermostat;1"
+BUILDING = "dtmi:com:example:Building;1"
+
+
+def _model(model_id: str, contents=()) -> dict:
+    return {
+        "@context": "dtmi:dtdl:context;3",
+        "@id": model_id,
+        "@type": "Interface",
+        "contents": [
+            {"@type": "Property", "name": name, "schema": "double"} for name in contents
+        ],
+    }
+
+
+def _property_ids(model_data) -> list[str]:
+    return [p.id for p in model_data.properties]
+
+
+class TestDtdlModelRoots(omni.kit.test.AsyncTestCase):
+    # Before running each test
+    async def setUp(self):
+        self._folder = tempfile.mkdtemp(prefix="dtdl_roots_test")
+        self._project = os.path.join(self._folder, "project")
+        self._shared = os.path.join(self._folder, "shared")
+        self._write(self._project, "room.json", _model(ROOM, ["project"]))
+        self._write(self._shared, "room.json", _model(ROOM, ["shared"]))
+        self._write(self._shared, "thermostat.json", _model(THERMOSTAT, ["temp"]))
+        # The bundle defines the room as well, and a model of its own
+        ontology = os.path.join(self._folder, "ontology")
+        self._write(ontology, "room.json", _model(ROOM, ["bundle"]))
+        self._write(ontology, "building.json", _model(BUILDING, ["name"]))
+        self._bundle = os.path.join(self._folder, "ontology.dtdlbundle")
+        write_dtdl_bundle(
+            compile_dtdl_files(list_dtdl_files(ontology), workers=1), self._bundle
+        )
+        self._model_roots: list[DtdlModelRoot] = []
+        self._version = 0
+
+    # After running each test
+    async def tearDown(self):
+        for model_root in self._model_roots:
+            if isinstance(model_root.models, DtdlModelBundle):
+                model_root.models.close()
+        self._model_roots = []
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def _write(self, folder: str, file_name: str, model_json: object):
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, file_name), "w") as f:
+            json.dump(model_json, f)
+
+    def _publish(
+        self, changed_ids: set[str], models: DtdlModelCache
+    ) -> DtdlRepoSnapshot:
+        """Publish the models of the roots in a new snapshot, like the widget does"""
+        self._version += 1
+        model_repo = models.with_sources(
+            [model_root.models for model_root in self._model_roots], changed_ids
+        )
+        return DtdlRepoSnapshot(self._version, model_repo)
+
+    def _load(self, additional_roots: str) -> DtdlRepoSnapshot:
+        root_paths = get_dtdl_root_paths(self._project, additional_roots)
+        self._model_roots = [DtdlModelRoot(p) for p in root_paths]
+        changed_ids = set().union(*(r.load() for r in self._model_roots))
+        return self._publish(changed_ids, DtdlModelCache())
+
+    @omni.kit.test.omni_test_registry(guid="6a2c9e4f-1d7b-4b58-8e3a-f0c5d2b7a914")
+    async def test_root_paths(self):
+        # The DTDL path comes first, duplicates and empty roots are skipped
+        self.assertEqual(
+            get_dtdl_root_paths(
+                self._project,
+                " {} ;{};;{}".format(self._shared, self._bundle, self._project),
+            ),
+            [self._project, self._shared, self._bundle],
+        )
+        self.assertEqual(get_dtdl_root_paths(self._project, None), [self._project])
+
+    @omni.kit.test.omni_test_registry(guid="d84b1f6e-3c9a-4e27-b5d1-7a2e8c4f0b63")
+    async def test_precedence(self):
+        snapshot = self._load("{};{}".format(self._shared, self._bundle))
+        models = snapshot.models
+        # The DTDL path wins over the additional roots
+        self.assertEqual(_property_ids(models[ROOM]), ["dtdl:project"])
+        self.assertEqual(_property_ids(models[THERMOSTAT]), ["dtdl:temp"])
+        # The bundle is loaded next to the folders
+        self.assertIsInstance(models.raw_index[BUILDING], DtdlBundleModel)
+        self.assertEqual(_property_ids(models[BUILDING]), ["dtdl:name"])
+        self.assertEqual(set(models), {ROOM, THERMOSTAT, BUILDING})
+
+        # The additional roots win in the order they are listed, once the DTDL path's room is gone
+        snapshot = self._load("{};{}".format(self._bundle, self._shared))
+        os.remove(os.path.join(self._project, "room.json"))
+        project_root = self._model_roots[0]
+        snapshot = self._publish(project_root.load(), snapshot.models)
+        self.assertIsInstance(snapshot.models.raw_index[ROOM], DtdlBundleModel)
+        self.assertEqual(_property_ids(snapshot.models[ROOM]), ["dtdl:bundle"])
+
+    @omni.kit.test.omni_test_registry(guid="2f7e5a1c-8b4d-4c96-a3e0-9d6b1f8c5e27")
+    async def test_overridden_change(self):
+        snapshot = self._load(self._shared)
+        self.assertEqual(_property_ids(snapshot.models[ROOM]), ["dtdl:project"])
+        shared_root = self._model_roots[1]
+
+        # The room of the shared root is overridden by the DTDL path, changing it changes nothing
+        self._write(self._shared, "room.json", _model(ROOM, ["shared", "changed"]))
+        self.assertTrue(shared_root.has_changed())
+        changed_ids = shared_root.load()
+        self.assertIn(ROOM, changed_ids)
+        new_snapshot = self._publish(changed_ids, snapshot.models)
+        diff = DtdlRepoDiff.compute(snapshot, new_snapshot)
+        self.assertTrue(diff.is_empty(), diff)
+        self.assertEqual(_property_ids(new_snapshot.models[ROOM]), ["dtdl:project"])
+
+        # A change of a model that isn't overridden is in the diff
+        self._write(
+            self._shared, "thermostat.json", _model(THERMOSTAT, ["temp", "setPoint"])
+        )
+        next_snapshot = self._publish(shared_root.load(), new_snapshot.models)
+        diff = DtdlRepoDiff.compute(new_snapshot, next_snapshot)
+        self.assertEqual(diff.changed, {THERMOSTAT: frozenset(("setPoint",))})
+        self.assertEqual(diff.affected, frozenset((THERMOSTAT,)))
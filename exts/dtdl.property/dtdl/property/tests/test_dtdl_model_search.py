@@ -0,0 +1,83 @@
+# NOTE:
+#   Tests of the search index of the model picker, on a few in-memory interfaces.
+import omni.kit.test
+from dtdl.property.dtdl_model_search import (
+    DtdlModelSearchIndex,
+    get_dtdl_model_display_name,
+)
+
+BUILDING = "dtmi:com:example:Building;1"
+CONFERENCE_ROOM = "dtmi:com:example:ConferenceRoom;1"
+ROOM = "dtmi:com:example:Room;1"
+THERMOSTAT = "dtmi:com:example:Thermostat;1"
+
+_RAW_INDEX = {
+    ROOM: {"@id": ROOM, "displayName": "Room"},
+    CONFERENCE_ROOM: {"@id": CONFERENCE_ROOM, "displayName": "Conference Room"},
+    THERMOSTAT: {"@id": THERMOSTAT, "displayName": {"en": "Thermostat"}},
+    BUILDING: {"@id": BUILDING},
+}
+
+
+class TestDtdlModelSearch(omni.kit.test.AsyncTestCase):
+    # Before running each test
+    async def setUp(self):
+        self._search_index = DtdlModelSearchIndex(_RAW_INDEX)
+
+    def _search(self, query: str, model_ids: frozenset[str] = None) -> list[str]:
+        return [
+            self._search_index.entries[i][0]
+            for i in self._search_index.search(query, model_ids)
+        ]
+
+    @omni.kit.test.omni_test_registry(guid="7b2e9d4a-1c6f-4a85-b3e7-0f8d2a5c9e61")
+    async def test_entries(self):
+        self.assertEqual(len(self._search_index), 4)
+        # The entries are sorted by model id, models without a display name show their id
+        self.assertEqual(
+            self._search_index.entries,
+            [
+                (BUILDING, BUILDING),
+                (CONFERENCE_ROOM, "Conference Room"),
+                (ROOM, "Room"),
+                (THERMOSTAT, "Thermostat"),
+            ],
+        )
+        self.assertEqual(
+            get_dtdl_model_display_name({"@id": ROOM, "displayName": {"de": "Raum"}}),
+            ROOM,
+        )
+
+    @omni.kit.test.omni_test_registry(guid="e4a8c1f6-9b3d-4e72-a5c0-3d7f1b9e6a24")
+    async def test_prefix_ranking(self):
+        # The prefix match comes first, even though ConferenceRoom comes first by model id
+        self.assertEqual(self._search("room"), [ROOM, CONFERENCE_ROOM])
+        self.assertEqual(self._search(" Conf"), [CONFERENCE_ROOM])
+        # Model ids are matched too, in model id order
+        self.assertEqual(
+            self._search("dtmi:com:example:"),
+            [BUILDING, CONFERENCE_ROOM, ROOM, THERMOSTAT],
+        )
+        self.assertEqual(
+            self._search(""), [BUILDING, CONFERENCE_ROOM, ROOM, THERMOSTAT]
+        )
+
+    @omni.kit.test.omni_test_registry(guid="2c6f0a8e-5d1b-4b39-9e4a-8a1c7d3f5b90")
+    async def test_substring(self):
+        self.assertEqual(self._search("mostat"), [THERMOSTAT])
+        self.assertEqual(self._search("ence ro"), [CONFERENCE_ROOM])
+        self.assertEqual(self._search("example:room;"), [ROOM])
+        self.assertEqual(self._search("kitchen"), [])
+        # Queries without trigrams only match prefixes, they would have to scan every entry
+        self.assertEqual(self._search("ro"), [ROOM])
+        self.assertEqual(self._search("t"), [THERMOSTAT])
+        self.assertEqual(self._search("mo"), [])
+
+    @omni.kit.test.omni_test_registry(guid="a9d3e7b1-6f2c-4c58-8b0d-4e1a9f6c2d73")
+    async def test_model_ids(self):
+        rooms = frozenset((ROOM, CONFERENCE_ROOM))
+        self.assertEqual(self._search("", rooms), [CONFERENCE_ROOM, ROOM])
+        self.assertEqual(
+            self._search("room", frozenset((CONFERENCE_ROOM,))), [CONFERENCE_ROOM]
+        )
+        self.assertEqual(self._search("thermo", rooms), [])
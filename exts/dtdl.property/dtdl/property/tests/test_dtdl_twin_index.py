@@ -0,0 +1,191 @@
+# NOTE:
+#   Tests of the incremental updates of the twin index. The twins are edited, renamed and removed
+#   in an in-memory stage, the index has to follow the USD notices without being attached again.
+import omni.kit.test
+from pxr import Usd, Sdf
+from dtdl.property import MODEL_ID_ATTR_NAME
+from dtdl.property.dtdl_twin_index import DtdlTwinIndex
+
+ROOM = "dtmi:com:example:Room;1"
+CONFERENCE_ROOM = "dtmi:com:example:ConferenceRoom;1"
+THERMOSTAT = "dtmi:com:example:Thermostat;1"
+
+# ConferenceRoom extends Room
+SUBTYPES = {
+    ROOM: frozenset((ROOM, CONFERENCE_ROOM)),
+    CONFERENCE_ROOM: frozenset((CONFERENCE_ROOM,)),
+    THERMOSTAT: frozenset((THERMOSTAT,)),
+}
+
+
+def _paths(*paths: str) -> set[Sdf.Path]:
+    return set(Sdf.Path(p) for p in paths)
+
+
+class TestDtdlTwinIndex(omni.kit.test.AsyncTestCase):
+    # Before running each test
+    async def setUp(self):
+        self._stage = Usd.Stage.CreateInMemory()
+        self._stage.DefinePrim("/World")
+        self._create_twin("/World/Floor1/Room1", ROOM)
+        self._create_twin("/World/Floor1/Conference1", CONFERENCE_ROOM)
+        self._create_twin("/World/Floor1/Room1/Thermostat1", THERMOSTAT)
+        self._create_twin("/World/Floor2/Room2", ROOM)
+        self._stage.DefinePrim("/World/Floor2/Lamp", "Xform")
+        self._twin_index = DtdlTwinIndex()
+        self._twin_index.attach(self._stage)
+        self._twin_index.set_subtypes(SUBTYPES)
+
+    # After running each test
+    async def tearDown(self):
+        self._twin_index.detach()
+        self._twin_index = None
+        self._stage = None
+
+    def _create_twin(self, path: str, model_id: str) -> Usd.Prim:
+        prim = self._stage.DefinePrim(path, "Xform")
+        prim.CreateAttribute(MODEL_ID_ATTR_NAME, Sdf.ValueTypeNames.Token).Set(model_id)
+        return prim
+
+    def _assert_twins(self, model_id: str, with_subtypes: set, without_subtypes: set):
+        self.assertEqual(set(self._twin_index.find_twins(model_id)), with_subtypes)
+        self.assertEqual(
+            set(self._twin_index.find_twins(model_id, include_subtypes=False)),
+            without_subtypes,
+        )
+
+    @omni.kit.test.omni_test_registry(guid="0b8f6a1e-7d2c-4e59-a3f4-5c1d9e8b2a61")
+    async def test_find_twins(self):
+        self._assert_twins(
+            ROOM,
+            _paths(
+                "/World/Floor1/Room1",
+                "/World/Floor1/Conference1",
+                "/World/Floor2/Room2",
+            ),
+            _paths("/World/Floor1/Room1", "/World/Floor2/Room2"),
+        )
+        self._assert_twins(
+            CONFERENCE_ROOM,
+            _paths("/World/Floor1/Conference1"),
+            _paths("/World/Floor1/Conference1"),
+        )
+        self.assertEqual(
+            self._twin_index.find_twins("dtmi:com:example:Unknown;1"), set()
+        )
+
+    @omni.kit.test.omni_test_registry(guid="6e2d4c8a-1f3b-4a7e-9d05-b8c3f1a7e294")
+    async def test_edit_model_id(self):
+        # Looking up the twins first fills the query cache, the edits have to clear it
+        self._twin_index.find_twins(ROOM)
+        self._stage.GetAttributeAtPath("/World/Floor2/Room2.dtdl:modelId").Set(
+            CONFERENCE_ROOM
+        )
+        self._assert_twins(
+            ROOM,
+            _paths(
+                "/World/Floor1/Room1",
+                "/World/Floor1/Conference1",
+                "/World/Floor2/Room2",
+            ),
+            _paths("/World/Floor1/Room1"),
+        )
+        self._assert_twins(
+            CONFERENCE_ROOM,
+            _paths("/World/Floor1/Conference1", "/World/Floor2/Room2"),
+            _paths("/World/Floor1/Conference1", "/World/Floor2/Room2"),
+        )
+
+        # Creating the attribute adds a twin, removing it removes the twin again
+        lamp = self._stage.GetPrimAtPath("/World/Floor2/Lamp")
+        lamp.CreateAttribute(MODEL_ID_ATTR_NAME, Sdf.ValueTypeNames.Token).Set(
+            THERMOSTAT
+        )
+        self._assert_twins(
+            THERMOSTAT,
+            _paths("/World/Floor1/Room1/Thermostat1", "/World/Floor2/Lamp"),
+            _paths("/World/Floor1/Room1/Thermostat1", "/World/Floor2/Lamp"),
+        )
+        lamp.RemoveProperty(MODEL_ID_ATTR_NAME)
+        self._assert_twins(
+            THERMOSTAT,
+            _paths("/World/Floor1/Room1/Thermostat1"),
+            _paths("/World/Floor1/Room1/Thermostat1"),
+        )
+        self.assertIsNone(self._twin_index.get_model_id(Sdf.Path("/World/Floor2/Lamp")))
+
+    @omni.kit.test.omni_test_registry(guid="c41a7e93-5b2f-4d86-8e1c-3f9a6d2b7e05")
+    async def test_rename(self):
+        edit = Sdf.BatchNamespaceEdit()
+        edit.Add("/World/Floor1", "/World/Level1")
+        self.assertTrue(self._stage.GetRootLayer().Apply(edit))
+
+        self._assert_twins(
+            ROOM,
+            _paths(
+                "/World/Level1/Room1",
+                "/World/Level1/Conference1",
+                "/World/Floor2/Room2",
+            ),
+            _paths("/World/Level1/Room1", "/World/Floor2/Room2"),
+        )
+        self._assert_twins(
+            THERMOSTAT,
+            _paths("/World/Level1/Room1/Thermostat1"),
+            _paths("/World/Level1/Room1/Thermostat1"),
+        )
+        self.assertIsNone(
+            self._twin_index.get_model_id(Sdf.Path("/World/Floor1/Room1"))
+        )
+        self.assertEqual(
+            self._twin_index.get_model_id(Sdf.Path("/World/Level1/Room1")), ROOM
+        )
+
+    @omni.kit.test.omni_test_registry(guid="9a3e5f17-c8d2-4b6a-a0e4-7d1b3c5f9e82")
+    async def test_remove_subtree(self):
+        self._stage.RemovePrim("/World/Floor1")
+        self._assert_twins(
+            ROOM, _paths("/World/Floor2/Room2"), _paths("/World/Floor2/Room2")
+        )
+        self._assert_twins(CONFERENCE_ROOM, set(), set())
+        self._assert_twins(THERMOSTAT, set(), set())
+        self.assertEqual(set(self._twin_index.paths), _paths("/World/Floor2/Room2"))
+        # The removed subtree doesn't lead to twins anymore
+        self.assertNotIn(Sdf.Path("/World/Floor1"), self._twin_index._children)
+        self.assertEqual(
+            self._twin_index._children[Sdf.Path("/World")], _paths("/World/Floor2")
+        )
+
+        # Removing the last twin removes all paths that led to it
+        self._stage.RemovePrim("/World/Floor2/Room2")
+        self.assertEqual(set(self._twin_index.paths), set())
+        self.assertEqual(self._twin_index._children, {})
+
+    @omni.kit.test.omni_test_registry(guid="2d7c9b4e-6a1f-4e38-b5d2-8f0e3a9c1b76")
+    async def test_add_subtree(self):
+        # Prims that are added in a single change block are indexed from the resynced root
+        layer = self._stage.GetRootLayer()
+        with Sdf.ChangeBlock():
+            Sdf.CreatePrimInLayer(layer, "/World/Floor3").specifier = Sdf.SpecifierDef
+            for i in range(3):
+                prim_spec = Sdf.CreatePrimInLayer(
+                    layer, "/World/Floor3/Conference{}".format(i)
+                )
+                prim_spec.specifier = Sdf.SpecifierDef
+                prim_spec.typeName = "Xform"
+                attr_spec = Sdf.AttributeSpec(
+                    prim_spec, MODEL_ID_ATTR_NAME, Sdf.ValueTypeNames.Token
+                )
+                attr_spec.default = CONFERENCE_ROOM
+        conference_rooms = _paths(
+            "/World/Floor1/Conference1",
+            "/World/Floor3/Conference0",
+            "/World/Floor3/Conference1",
+            "/World/Floor3/Conference2",
+        )
+        self._assert_twins(CONFERENCE_ROOM, conference_rooms, conference_rooms)
+        self._assert_twins(
+            ROOM,
+            conference_rooms | _paths("/World/Floor1/Room1", "/World/Floor2/Room2"),
+            _paths("/World/Floor1/Room1", "/World/Floor2/Room2"),
+        )
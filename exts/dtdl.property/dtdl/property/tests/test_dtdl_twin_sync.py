@@ -0,0 +1,202 @@
+# NOTE:
+#   Tests of the twin sync against a stand-in for the twin service, an http.server in the test
+#   process that records the JSON patches. The repository snapshot is replaced by a snapshot
+#   with a single model, so the tests don't depend on the models of the extension.
+import asyncio
+import http.server
+import json
+import threading
+from types import SimpleNamespace
+from unittest import mock
+import omni.kit.test
+import omni.usd
+from pxr import Sdf
+from dtdl.property import MODEL_ID_ATTR_NAME
+from dtdl.property import dtdl_twin_sync
+from dtdl.property.dtdl_twin_sync import DtdlTwinSync
+
+MODEL_ID = "dtmi:com:example:Thermostat;1"
+
+_SNAPSHOT = SimpleNamespace(
+    models={
+        MODEL_ID: SimpleNamespace(
+            properties=[
+                SimpleNamespace(id="dtdl:temp"),
+                SimpleNamespace(id="dtdl:setPointTemp"),
+            ]
+        )
+    }
+)
+
+
+class _TwinServiceHandler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive connections, like the twin service
+    protocol_version = "HTTP/1.1"
+
+    def do_PATCH(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        status = self.server.twin_service.on_patch(self.path, json.loads(body))
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _TwinService:
+    """Records the patches, responds with the given statuses and then with 204"""
+
+    def __init__(self):
+        self.patches: list[tuple[str, list]] = []
+        self.statuses: list[int] = []
+        # Cleared to hold the responses, e.g. to fill the queue of the senders
+        self.respond = threading.Event()
+        self.respond.set()
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), _TwinServiceHandler
+        )
+        self._server.daemon_threads = True
+        self._server.twin_service = self
+        self.endpoint = "http://127.0.0.1:{}".format(self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def on_patch(self, path: str, operations: list) -> int:
+        with self._lock:
+            self.patches.append((path, operations))
+        self.respond.wait(10.0)
+        with self._lock:
+            return self.statuses.pop(0) if len(self.statuses) > 0 else 204
+
+    def get_patches(self) -> list[tuple[str, list]]:
+        with self._lock:
+            return list(self.patches)
+
+    def close(self):
+        self.respond.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TestDtdlTwinSync(omni.kit.test.AsyncTestCase):
+    # Before running each test
+    async def setUp(self):
+        self._snapshot_patch = mock.patch.object(
+            dtdl_twin_sync, "get_repo_snapshot", return_value=_SNAPSHOT
+        )
+        self._snapshot_patch.start()
+        usd_context = omni.usd.get_context()
+        await usd_context.new_stage_async()
+        self._stage = usd_context.get_stage()
+        self._service = _TwinService()
+        self._twin_sync: DtdlTwinSync = None
+
+    # After running each test
+    async def tearDown(self):
+        self._service.respond.set()
+        if self._twin_sync is not None:
+            self._twin_sync.stop()
+            self._twin_sync = None
+        self._service.close()
+        self._snapshot_patch.stop()
+        self._stage = None
+        await omni.usd.get_context().new_stage_async()
+
+    def _start(self, **kwargs):
+        # The edits are flushed by the tests, not periodically
+        self._twin_sync = DtdlTwinSync(self._service.endpoint, 3600.0, **kwargs)
+        self._twin_sync.start()
+
+    def _create_twin(self, name: str):
+        prim = self._stage.DefinePrim("/World/" + name, "Xform")
+        prim.CreateAttribute(MODEL_ID_ATTR_NAME, Sdf.ValueTypeNames.Token).Set(MODEL_ID)
+        prim.CreateAttribute("dtdl:temp", Sdf.ValueTypeNames.Double)
+        return prim
+
+    async def _wait_for_patches(self, count: int) -> list[tuple[str, list]]:
+        for _ in range(200):
+            if len(self._service.get_patches()) >= count:
+                break
+            await asyncio.sleep(0.05)
+        patches = self._service.get_patches()
+        self.assertEqual(len(patches), count, patches)
+        return patches
+
+    @omni.kit.test.omni_test_registry(guid="5c2e8f14-9a7d-4b3e-8f61-2d0c7a9e4b53")
+    async def test_coalesce_edits(self):
+        prim = self._create_twin("Thermostat1")
+        self._start()
+        temp = prim.GetAttribute("dtdl:temp")
+        for value in range(10):
+            temp.Set(float(value))
+        # The model id isn't sent, and attributes that aren't properties aren't either
+        prim.CreateAttribute("dtdl:notAProperty", Sdf.ValueTypeNames.Int).Set(1)
+        self.assertEqual(self._twin_sync.flush(), 1)
+        patches = await self._wait_for_patches(1)
+        self.assertEqual(
+            patches[0],
+            (
+                "/digitaltwins/Thermostat1",
+                [{"op": "add", "path": "/temp", "value": 9.0}],
+            ),
+        )
+        # Unchanged values aren't sent again
+        temp.Set(9.0)
+        self.assertEqual(self._twin_sync.flush(), 0)
+
+    @omni.kit.test.omni_test_registry(guid="e7a1b3d9-4c6f-4e28-a5d0-9b8f2c1e6a37")
+    async def test_retry(self):
+        prim = self._create_twin("Thermostat1")
+        self._start()
+        self._service.statuses = [503]
+        prim.GetAttribute("dtdl:temp").Set(21.5)
+        self._twin_sync.flush()
+        # The same patch is sent again after the retry delay
+        patches = await self._wait_for_patches(2)
+        self.assertEqual(patches[0], patches[1])
+        self.assertEqual(patches[1][1], [{"op": "add", "path": "/temp", "value": 21.5}])
+
+    @omni.kit.test.omni_test_registry(guid="1f9d6c2a-8b4e-4a73-b0c5-7e3a5d8f2c96")
+    async def test_remove_attribute(self):
+        prim = self._create_twin("Thermostat1")
+        self._start()
+        prim.GetAttribute("dtdl:temp").Set(21.5)
+        self._twin_sync.flush()
+        await self._wait_for_patches(1)
+        prim.RemoveProperty("dtdl:temp")
+        self.assertEqual(self._twin_sync.flush(), 1)
+        patches = await self._wait_for_patches(2)
+        self.assertEqual(patches[1][1], [{"op": "remove", "path": "/temp"}])
+
+    @omni.kit.test.omni_test_registry(guid="a4b8e2f7-3d1c-4f96-9e2a-6c5b0d7f1e84")
+    async def test_full_queue(self):
+        prims = [self._create_twin("Thermostat{}".format(i)) for i in range(3)]
+        # A single sender with room for a single patch
+        self._start(connections=1, max_queued=1)
+        self._service.respond.clear()
+        prims[0].GetAttribute("dtdl:temp").Set(1.0)
+        self._twin_sync.flush()
+        # The sender waits for the response of the first patch, the queue is empty again
+        await self._wait_for_patches(1)
+        prims[1].GetAttribute("dtdl:temp").Set(2.0)
+        prims[2].GetAttribute("dtdl:temp").Set(3.0)
+        # One patch fits in the queue, the edits of the other twin stay pending
+        self.assertEqual(self._twin_sync.flush(), 1)
+        self.assertEqual(len(self._twin_sync._dirty), 1)
+        (pending_path,) = self._twin_sync._dirty.keys()
+        pending = self._stage.GetPrimAtPath(pending_path)
+        # The pending edits are coalesced with the next edits
+        pending.GetAttribute("dtdl:temp").Set(4.0)
+        self._service.respond.set()
+        await self._wait_for_patches(2)
+        self.assertEqual(self._twin_sync.flush(), 1)
+        patches = await self._wait_for_patches(3)
+        self.assertEqual(
+            patches[2],
+            (
+                "/digitaltwins/" + pending.GetName(),
+                [{"op": "add", "path": "/temp", "value": 4.0}],
+            ),
+        )